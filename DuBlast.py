@@ -21,6 +21,7 @@
 import maya.api.OpenMaya as om # pylint: disable=import-error
 
 from dublast import DuBlastCmd, VENDOR, VERSION
+from dublast.dumaf import rendering
 
 def maya_useNewAPI():
     """
@@ -40,3 +41,5 @@ def uninitializePlugin( obj ):
     plugin = om.MFnPlugin(obj, VENDOR, VERSION)
 
     plugin.deregisterCommand( DuBlastCmd.name )
+    # The scene cache callbacks would call the unloaded code
+    rendering.remove_scene_cache_callbacks()
@@ -0,0 +1,150 @@
+"""
+Playblasts a list of scenes one after another in a single mayapy session.
+
+Usage:
+    mayapy -m dublast.batch [options] scene1.mb scene2.mb...
+"""
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either VERSION 3
+#  of the License, or (at your option) any later VERSION.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+import os
+import sys
+import argparse
+import traceback
+
+def getArgParser():
+    """The command line arguments"""
+    parser = argparse.ArgumentParser(prog='dublast.batch', description="Playblasts Maya scenes without UI.")
+    parser.add_argument('scenes', nargs='+', help="The scene files to playblast")
+    parser.add_argument('-c', '--camera', default='', help="The camera to look through, the current one by default")
+    parser.add_argument('-xc', '--extra-camera', action='append', default=[], help="Another camera to capture at the same time (repeatable); needs a viewport, it can't be used in mayapy")
+    parser.add_argument('-cs', '--contact-sheet', action='store_true', help="Tiles all the cameras in a single video; needs a viewport, it can't be used in mayapy")
+    parser.add_argument('-s', '--size', type=float, default=0.5, help="The size, relative to the render resolution")
+    parser.add_argument('-cm', '--comment', default='', help="A comment added to the HUD and the file name")
+    parser.add_argument('--no-hud', dest='hud', action='store_false', help="Don't show the HUD")
+    parser.add_argument('-bi', '--burn-in', action='store_true', help="Draws the HUD on the frames instead of the viewport (needs NumPy)")
+    parser.add_argument('-lb', '--letterbox', type=float, default=0.0, help="With --burn-in: the aspect ratio of the letterbox (2.39...), 0 for none")
+    parser.add_argument('-sf', '--safe-frames', action='store_true', help="With --burn-in: draws the action and title safe frames")
+    parser.add_argument('-tn', '--thumbnail', action='store_true', help="Creates a thumbnail too")
+    parser.add_argument('-o', '--output-dir', default='', help="The folder for the playblasts, next to the scenes by default")
+    parser.add_argument('-op', '--output-path', default='', help="The playblast file path without extension, when there's a single scene")
+    parser.add_argument('-st', '--start-time', type=float, default=None, help="The first frame, the start of the playback range by default")
+    parser.add_argument('-et', '--end-time', type=float, default=None, help="The last frame, the end of the playback range by default")
+    parser.add_argument('-str', '--stride', type=int, default=1, help="Captures only every N frames (on twos, fours...), each one is held for N frames")
+    parser.add_argument('-em', '--encoding-mode', default='sequence', choices=('sequence', 'pipeline', 'stream'), help="When to encode the frames; stream needs a viewport, it can't be used in mayapy")
+    parser.add_argument('-pr', '--preset', default='review-h264', help="The encoding preset: review-h264, intra-mjpeg, prores-proxy, ffv1, or auto for the fastest one")
+    parser.add_argument('-stg', '--staging', default='auto', choices=('auto', 'ram', 'fast', 'temp'), help="Where to write the temporary frames: in RAM, in $DUBLAST_STAGING_DIR, or in the temp folder")
+    parser.add_argument('-uc', '--use-cache', action='store_true', help="Keeps the frames in a cache, and renders again only the changed frames")
+    parser.add_argument('-df', '--dirty-frame', type=int, action='append', default=[], help="With --use-cache: a frame to render again even if it's cached (repeatable)")
+    parser.add_argument('-fe', '--fast-evaluation', action='store_true', help="Uses the parallel evaluation manager and cached playback while capturing")
+    return parser
+
+def getFrameRange(options):
+    """The frame range from the command line, None to use the playback range"""
+    from maya import cmds # pylint: disable=import-error,import-outside-toplevel
+
+    if options.start_time is None and options.end_time is None:
+        return None
+    return (
+        options.start_time if options.start_time is not None else cmds.playbackOptions(q=True,minTime=True),
+        options.end_time if options.end_time is not None else cmds.playbackOptions(q=True,maxTime=True)
+        )
+
+def blastCurrentScene(scene, options):
+    """Playblasts the current scene (opened from scene) with the options from the command line.
+    Returns the result of dublast.functions.blast"""
+    from dublast.functions import blast, getCacheKey # pylint: disable=import-outside-toplevel
+
+    outputPath = options.output_path
+    if outputPath == '' and options.output_dir != '':
+        sceneName = os.path.splitext(os.path.basename(scene))[0]
+        if options.comment != '':
+            sceneName = sceneName + '_' + options.comment
+        outputPath = options.output_dir + '/' + sceneName
+
+    cacheKey = None
+    if options.use_cache:
+        cacheKey = getCacheKey(size=options.size, hud=options.hud, comment=options.comment)
+
+    return blast(
+        camera=options.camera,
+        size=options.size,
+        comment=options.comment,
+        hud=options.hud,
+        thumbnail=options.thumbnail,
+        outputPath=outputPath,
+        frameRange=getFrameRange(options),
+        mode=options.encoding_mode,
+        cacheKey=cacheKey,
+        extraCameras=options.extra_camera,
+        contactSheet=options.contact_sheet,
+        fastEvaluation=options.fast_evaluation,
+        preset=options.preset,
+        stagingBackend=options.staging,
+        stride=options.stride,
+        burnIn=options.burn_in,
+        letterbox=options.letterbox,
+        safeFrames=options.safe_frames,
+        dirtyFrames=options.dirty_frame,
+        )
+
+def blastScene(scene, options):
+    """Opens the scene and playblasts it with the options from the command line.
+    Returns the result of dublast.functions.blast"""
+    from maya import cmds # pylint: disable=import-error,import-outside-toplevel
+
+    cmds.file(scene, open=True, force=True, prompt=False)
+    return blastCurrentScene(scene, options)
+
+def run(scenes, options):
+    """Playblasts all the scenes. Returns the list of the scenes which failed"""
+    failed = []
+    for scene in scenes:
+        print("Playblasting " + scene)
+        try:
+            blastScene(scene, options)
+        except Exception: # pylint: disable=broad-except
+            traceback.print_exc()
+            failed.append(scene)
+    return failed
+
+def main(argv=None):
+    """Runs the batch from the command line"""
+    parser = getArgParser()
+    options = parser.parse_args(argv)
+    if options.output_path != '' and len(options.scenes) > 1:
+        parser.error("--output-path can be used with a single scene only.")
+    # mayapy has no viewport to capture from
+    if options.encoding_mode == 'stream':
+        parser.error("--encoding-mode stream captures the viewport, which mayapy doesn't have: use sequence or pipeline.")
+    if options.extra_camera or options.contact_sheet:
+        parser.error("--extra-camera and --contact-sheet capture the viewport, which mayapy doesn't have: playblast each camera with --camera.")
+
+    import maya.standalone # pylint: disable=import-error,import-outside-toplevel
+    maya.standalone.initialize(name='python')
+    try:
+        failed = run(options.scenes, options)
+    finally:
+        maya.standalone.uninitialize()
+
+    for scene in failed:
+        print("Failed: " + scene)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
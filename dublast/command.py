@@ -19,19 +19,49 @@ The Maya command
 #
 #======================= END GPL LICENSE BLOCK ========================
 
-import os
-
 import maya.cmds as cmds # pylint: disable=import-error
 import maya.mel as mel # pylint: disable=import-error
 import maya.api.OpenMaya as om # pylint: disable=import-error
 
-from dublast.functions import createPlayblast, createThumbnail, check_update
+from dublast.functions import blast, check_update, createProfiler, getTimeSliderRange, getCacheKey
 from dublast.dumaf.ui import getMayaWindow
-from dublast.dumaf.paths import baseName
 from dublast.ui_previewDialog import PreviewDialog
 
+# Flags: (short name, long name, argument type)
+FLAGS = (
+    ('-c', '-camera', om.MSyntax.kString),
+    ('-s', '-size', om.MSyntax.kDouble),
+    ('-cm', '-comment', om.MSyntax.kString),
+    ('-hud', '-headsUpDisplay', om.MSyntax.kBoolean),
+    ('-tn', '-thumbnail', om.MSyntax.kBoolean),
+    ('-pb', '-playblast', om.MSyntax.kBoolean),
+    ('-o', '-outputPath', om.MSyntax.kString),
+    ('-st', '-startTime', om.MSyntax.kDouble),
+    ('-et', '-endTime', om.MSyntax.kDouble),
+    ('-em', '-encodingMode', om.MSyntax.kString),
+    ('-bg', '-background', om.MSyntax.kBoolean),
+    ('-shw', '-show', om.MSyntax.kBoolean),
+    ('-xc', '-extraCamera', om.MSyntax.kString),
+    ('-cs', '-contactSheet', om.MSyntax.kBoolean),
+    ('-fe', '-fastEvaluation', om.MSyntax.kBoolean),
+    ('-pr', '-preset', om.MSyntax.kString),
+    ('-stg', '-staging', om.MSyntax.kString),
+    ('-tsr', '-timeSliderRange', om.MSyntax.kBoolean),
+    ('-str', '-stride', om.MSyntax.kLong),
+    ('-tp', '-twoPass', om.MSyntax.kBoolean),
+    ('-bi', '-burnIn', om.MSyntax.kBoolean),
+    ('-lb', '-letterbox', om.MSyntax.kDouble),
+    ('-sf', '-safeFrames', om.MSyntax.kBoolean),
+    ('-uc', '-useCache', om.MSyntax.kBoolean),
+    ('-df', '-dirtyFrame', om.MSyntax.kLong),
+)
+# Flags which can be used several times
+MULTI_USE_FLAGS = ('-xc', '-df')
+
 class DuBlastCmd( om.MPxCommand ):
-    """The maya dublast command"""
+    """The maya dublast command.
+    Without flags, shows the preview dialog.
+    With any flag (or in batch mode), playblasts without any UI."""
     name = "dublast"
 
     def __init__(self):
@@ -46,13 +76,94 @@ class DuBlastCmd( om.MPxCommand ):
     def createSyntax():
         """Creates the MEL syntax"""
         syntax = om.MSyntax()
+        for flag in FLAGS:
+            syntax.addFlag( *flag )
+        for flag in MULTI_USE_FLAGS:
+            syntax.makeFlagMultiUse( flag )
         return syntax
 
     def doIt(self, args):
         """Runs the command"""
+        argData = om.MArgDatabase(self.syntax(), args)
+        headless = cmds.about(batch=True)
+        for flag in FLAGS:
+            if argData.isFlagSet(flag[0]):
+                headless = True
+                break
+
+        if headless:
+            self.setResult( self.blast(argData) )
+        else:
+            self.showDialog()
+
+    def blast(self, argData):
+        """Playblasts without UI, using the flags. Returns the playblast path"""
+        def flag(shortName, default):
+            if not argData.isFlagSet(shortName):
+                return default
+            if isinstance(default, bool):
+                return argData.flagArgumentBool(shortName, 0)
+            if isinstance(default, int):
+                return argData.flagArgumentInt(shortName, 0)
+            if isinstance(default, float):
+                return argData.flagArgumentDouble(shortName, 0)
+            return argData.flagArgumentString(shortName, 0)
+
+        extraCameras = []
+        for i in range(argData.numberOfFlagUses('-xc')):
+            extraCameras.append( argData.getFlagArgumentList('-xc', i).asString(0) )
+
+        cacheKey = None
+        dirtyFrames = []
+        if flag('-uc', False):
+            cacheKey = getCacheKey(size=flag('-s', 0.5), hud=flag('-hud', True), comment=flag('-cm', ''))
+            for i in range(argData.numberOfFlagUses('-df')):
+                dirtyFrames.append( argData.getFlagArgumentList('-df', i).asInt(0) )
+
+        frameRange = None
+        if flag('-tsr', False):
+            frameRange = getTimeSliderRange()
+        if argData.isFlagSet('-st') or argData.isFlagSet('-et'):
+            frameRange = (
+                flag('-st', cmds.playbackOptions(q=True,minTime=True)),
+                flag('-et', cmds.playbackOptions(q=True,maxTime=True))
+                )
+
+        result = blast(
+            camera=flag('-c', ''),
+            size=flag('-s', 0.5),
+            comment=flag('-cm', ''),
+            hud=flag('-hud', True),
+            thumbnail=flag('-tn', False),
+            playblast=flag('-pb', True),
+            outputPath=flag('-o', ''),
+            frameRange=frameRange,
+            mode=flag('-em', 'sequence'),
+            background=flag('-bg', False),
+            cacheKey=cacheKey,
+            show=flag('-shw', False),
+            extraCameras=extraCameras,
+            contactSheet=flag('-cs', False),
+            fastEvaluation=flag('-fe', False),
+            preset=flag('-pr', 'review-h264'),
+            stagingBackend=flag('-stg', 'auto'),
+            stride=flag('-str', 1),
+            twoPass=flag('-tp', False),
+            burnIn=flag('-bi', False),
+            letterbox=flag('-lb', 0.0),
+            safeFrames=flag('-sf', False),
+            dirtyFrames=dirtyFrames,
+            )
+        return result['playblast']
+
+    def showDialog(self):
+        """Shows the preview dialog, and playblasts"""
+
+        profiler = createProfiler()
 
         # Check updates for the plugin
-        check_update()
+        with profiler.stage('updateCheck'):
+            check_update()
 
         # Check file
         currentFilePath = cmds.file( q=True, sn=True )
@@ -67,60 +178,49 @@ class DuBlastCmd( om.MPxCommand ):
         prevCam = cmds.lookThru( q=True )
 
         # show UI
-        dialog = PreviewDialog( getMayaWindow() )
-        result = dialog.exec_()
+        with profiler.stage('dialog'):
+            dialog = PreviewDialog( getMayaWindow() )
+            result = dialog.exec_()
         if not result:
             return
 
         # Options
-        comment = dialog.comment()
-        cam = dialog.camera()
-        size = dialog.getSize()
-        hud = dialog.showHUD()
+        encodingMode = dialog.encodingMode()
         thumbnail = dialog.thumbnail()
-        pb = dialog.playblast()
-
-        # Set the cam
-        cmds.lookThru( cam )
-
-        # Remove all current HUD
-        currentHuds = cmds.headsUpDisplay(listHeadsUpDisplays=True)
-        if currentHuds:
-            for hud in currentHuds:
-                cmds.headsUpDisplay(hud, remove=True)
-        # Add ours
-        if hud:
-            camName = baseName(cam)
-            focalLength = str(round(cmds.getAttr(cam + '.focalLength'))) + ' mm'
-            if cmds.keyframe(cam, at='focalLength', query=True, keyframeCount=True):
-                focalLength = 'Animated'
-
-            if comment != '':
-                cmds.headsUpDisplay('DuComment',section=5, block=0, blockSize='small', ba='left', label='Comment : ' + comment, labelFontSize='small')
-            cmds.headsUpDisplay('DuCurrentFrame',section=0, block=0, blockSize='large', label='Frame ',pre='currentFrame', labelFontSize='large',dfs='large')
-            cmds.headsUpDisplay('DuCam',section=7, block=0, blockSize='large', label='Camera: ' + camName, labelFontSize='large')
-            cmds.headsUpDisplay('DuFocalLength',section=9, block=0, blockSize='large', label='Focal Length: ' + focalLength,labelFontSize='large')
-
-        # Save path
-        pbFilePath = os.path.dirname(currentFilePath)
-        pbFileName = os.path.basename(currentFilePath)
-        pbFileName = ".".join( pbFileName.split(".")[0:-1])
-        if comment != "":
-            pbFileName = pbFileName + "_" + comment
-
-        if thumbnail:
-            tnFilePath = pbFilePath + '/' + pbFileName + '.png'
+        extraCameras = dialog.extraCameras()
+        cacheKey = None
+        if dialog.useCache():
+            cacheKey = getCacheKey(**dialog.renderOptions())
+
+        if thumbnail or encodingMode == 'stream' or extraCameras:
             # Attempt to set window size
+            # (frames are read from the viewport when streaming)
             dialog.setWindowSize()
-            createThumbnail(tnFilePath)
-            print("Thumbnail saved: " + tnFilePath)
 
-        if pb:
-            # Extension
-            filePath = pbFilePath + '/' + pbFileName + '.mp4'
-            cmds.refresh()
-            createPlayblast(filePath, size)
-            print("Playblast saved: " + filePath)
+        blast(
+            camera=dialog.camera(),
+            size=dialog.getSize(),
+            comment=dialog.comment(),
+            hud=dialog.showHUD(),
+            thumbnail=thumbnail,
+            playblast=dialog.playblast(),
+            mode=encodingMode,
+            background=dialog.background(),
+            cacheKey=cacheKey,
+            show=True,
+            extraCameras=extraCameras,
+            contactSheet=dialog.contactSheet(),
+            fastEvaluation=dialog.fastEvaluation(),
+            profiler=profiler,
+            preset=dialog.preset(),
+            frameRange=dialog.frameRange(),
+            stride=dialog.stride(),
+            twoPass=dialog.twoPass(),
+            burnIn=dialog.burnIn(),
+            letterbox=dialog.letterbox(),
+            safeFrames=dialog.safeFrames(),
+            dirtyFrames=dialog.dirtyFrames(),
+            )
 
         # Hide window
         dialog.hideRenderer()
@@ -130,9 +230,3 @@ class DuBlastCmd( om.MPxCommand ):
         cmds.setAttr('hardwareRenderingGlobals.ssaoEnable',currentAO)
         cmds.lookThru( prevCam )
         mel.eval("lookThroughModelPanel " + prevCam + " modelPanel4;")
-
-        # Remove all current HUD
-        currentHuds = cmds.headsUpDisplay(listHeadsUpDisplays=True)
-        if currentHuds:
-            for hud in currentHuds:
-                cmds.headsUpDisplay(hud, remove=True)
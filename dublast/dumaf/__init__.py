@@ -1,5 +1,5 @@
 from .hotkeys import HotKey
-from .nodes import Node
+from .nodes import Node, HandleNode, NodeList
 from . import paths
 from .scene import Scene
 from . import sets
@@ -2,12 +2,16 @@
 
 import maya.cmds as cmds # pylint: disable=import-error
 from math import floor, ceil
+from array import array
 
 FRAMERATES=( '2 fps','3 fps','4 fps','5 fps','6 fps','8 fps','10 fps','12 fps','15 fps','16 fps','20 fps','23.976 fps','24 fps','25 fps','29.97 fps','29.97 df','30 fps',
     '40 fps','47.952 fps','48 fps','50 fps','59.94 fps','60 fps','75 fps','80 fps','90 fps',
     '100 fps','120 fps','125 fps','150 fps','200 fps','240 fps','250 fps','300 fps','375 fps','400 fps','500 fps','600 fps','750 fps',
     '1200 fps','1500 fps','2000 fps','3000 fps','6000 fps','44100 fps','48000 fps' )
 
+# The animation curves driven by the time; the other ones (driven keys) are driven by another attribute
+TIME_CURVE_TYPES = ('animCurveTL', 'animCurveTA', 'animCurveTU', 'animCurveTT')
+
 def removeAll():
     keys = cmds.ls(type='animCurveTL') + cmds.ls(type='animCurveTA') + cmds.ls(type='animCurveTU')
     for key in keys:
@@ -63,3 +67,24 @@ def set_framerate(fps):
     cmds.playbackOptions(minTime=min_time)
     cmds.playbackOptions(maxTime=max_time)
     cmds.currentTime( current_time )
+
+def sample_attribute(plug, frames):
+    '''
+    Returns the values of an attribute at all the frames, as an array of floats,
+    and True if it's animated.
+    Static attributes are read with a single getAttr, and attributes driven by a time animation curve
+    with a single keyframe -eval; other connections (driven keys, expressions, constraints...)
+    need a getAttr per frame.
+    '''
+    frames = list(frames)
+    sources = cmds.listConnections(plug, source=True, destination=False, skipConversionNodes=True) or []
+    if not sources:
+        return array('d', [cmds.getAttr(plug)]) * len(frames), False
+
+    # The input of the curve may be connected to a time warp
+    if cmds.objectType(sources[0]) in TIME_CURVE_TYPES and not cmds.listConnections(sources[0] + '.input', source=True, destination=False):
+        values = cmds.keyframe(plug, query=True, eval=True, time=[ (f, f) for f in frames ]) or []
+        if len(values) == len(frames):
+            return array('d', values), True
+
+    return array('d', [ cmds.getAttr(plug, time=f) for f in frames ]), True
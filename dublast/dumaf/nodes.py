@@ -20,7 +20,10 @@
 """A wrapper class for maya nodes"""
 
 import re
+import time
+import binascii
 import maya.cmds as cmds  # pylint: disable=import-error
+import maya.api.OpenMaya as om  # pylint: disable=import-error
 from .paths import baseName
 
 class Node():
@@ -63,15 +66,52 @@ class Node():
 
     # <== Static ==>
 
+    @staticmethod
+    def from_uuid(uuid):
+        """Returns the Node of a UUID, without checking if it exists"""
+        node = Node.__new__(Node)
+        node.__uuid = uuid # pylint: disable=unused-private-member
+        return node
+
+    @staticmethod
+    def get_uuids(node_paths_or_uuids):
+        """Returns the UUIDs of the nodes, with only two cmds.ls calls for all of them.
+        Raises a ValueError if one of them doesn't exist"""
+        uuids = [ None ] * len(node_paths_or_uuids)
+        names = []
+        indices = []
+        for i, node in enumerate(node_paths_or_uuids):
+            if isinstance(node, Node):
+                uuids[i] = node.uuid()
+            else:
+                names.append(node)
+                indices.append(i)
+        if names:
+            # For some reason, Maya returns the short names if queried with uuid,
+            # We need to get the full paths first...
+            paths = cmds.ls(names, long=True)
+            nameUuids = cmds.ls(paths, uuid=True) if len(paths) == len(names) else []
+            if len(nameUuids) != len(names):
+                # Missing, duplicated or ambiguous names:
+                # resolve them one by one, as the constructor does
+                nameUuids = [ Node(name).uuid() for name in names ]
+            for i, uuid in zip(indices, nameUuids):
+                uuids[i] = uuid
+        return uuids
+
     @staticmethod
     def get_nodes(node_paths_or_uuids):
         """Returns a list of Nodes"""
         if node_paths_or_uuids is None:
             return []
-        nodes = []
-        for nodePath in node_paths_or_uuids:
-            nodes.append(Node(nodePath))
-        return nodes
+        return [ Node.from_uuid(uuid) for uuid in Node.get_uuids(list(node_paths_or_uuids)) ]
+
+    @staticmethod
+    def get_node_list(node_paths_or_uuids):
+        """Returns a NodeList, which is more compact than a list of Nodes"""
+        if node_paths_or_uuids is None:
+            return NodeList()
+        return NodeList(Node.get_uuids(list(node_paths_or_uuids)))
 
     @staticmethod
     def get_create_group(group_name, parent_node=None):
@@ -118,20 +158,59 @@ class Node():
             nodes = parent_node.children(transform_only=True)
 
         for testNode in nodes:
-            if not testNode.isGroup():
+            if not testNode.is_group():
                 continue
-            if not testNode.hasChildren():
+            if not testNode.has_children():
                 emptyGroups.append(testNode)
         return emptyGroups
 
     @staticmethod
     def remove_empty_groups(parent_node=None):
-        """Removes all empty groups from the scene or the given parent node"""
-        emptyGroups = Node.get_empty_groups(parent_node)
-        while len(emptyGroups) > 0:
-            for group in emptyGroups:
-                group.remove()
-            emptyGroups = Node.get_empty_groups(parent_node)
+        """Removes all empty groups from the scene or the given parent node,
+        including the groups which become empty when their empty children are removed.
+        The DAG is walked once, and the groups are deleted with a single cmds.delete.
+        Locked and referenced groups are kept.
+        Returns the number of groups removed."""
+        it = om.MItDag()
+        if parent_node is not None:
+            selectionList = om.MSelectionList()
+            selectionList.add(Node(parent_node).path())
+            it.reset(selectionList.getDagPath(0))
+
+        # The nodes in depth-first order, parents first
+        paths = []
+        parents = []
+        empty = []
+        # The indices of the ancestors of the current node
+        ancestors = []
+        while not it.isDone():
+            dagPath = it.getPath()
+            length = dagPath.length()
+            while ancestors and paths[ancestors[-1]].length() >= length:
+                ancestors.pop()
+            parents.append(ancestors[-1] if ancestors else -1)
+            fn = om.MFnDagNode(dagPath)
+            empty.append(
+                not (parent_node is not None and len(paths) == 0) and # Not the parent node
+                fn.typeName == 'transform' and
+                dagPath.numberOfShapesDirectlyBelow() == 0 and
+                not fn.isFromReferencedFile and
+                not fn.isLocked
+                )
+            ancestors.append(len(paths))
+            paths.append(dagPath)
+            it.next()
+
+        # Children first: a node which is kept keeps its parent
+        for i in reversed(range(len(paths))):
+            if not empty[i] and parents[i] >= 0:
+                empty[parents[i]] = False
+
+        # Delete only the top empty groups, with their children
+        groups = [ paths[i].fullPathName() for i in range(len(paths)) if empty[i] and (parents[i] < 0 or not empty[parents[i]]) ]
+        if groups:
+            cmds.delete(groups)
+        return sum(empty)
 
     @staticmethod
     def lock_hidden_nodes(parent_node=None):
@@ -239,7 +318,7 @@ class Node():
             )
         if children is None:
             return []
-        return Node.get_nodes(children)
+        return self.get_nodes(children)
 
     def create_root_controller(self, crtl_name):
         """Creates and returns a curve to be used as a controller for this node"""
@@ -266,7 +345,7 @@ class Node():
         cv4 = ( xmin - margin, 0, zmax + margin)
         cv5 = cv1
         controller = cmds.curve( d=1, p=[cv1, cv2, cv3, cv4, cv5], k=(0,1,2,3,4), name=crtl_name)
-        controller = Node(controller)
+        controller = type(self)(controller)
         # Parent the node
         self.parent_to(controller)
         return controller
@@ -279,7 +358,7 @@ class Node():
         if recursive:
             children = self.children()
             for child in children:
-                child = Node(child)
+                child = type(self)(child)
                 child.delete_history(recursive=False)
 
         shapes = self.shapes()
@@ -362,7 +441,7 @@ class Node():
         if recursive:
             children = self.children()
             for child in children:
-                child = Node(child)
+                child = type(self)(child)
                 if not child.is_empty(recursive=True):
                     return False
             return True
@@ -416,7 +495,7 @@ class Node():
             children = cmds.listRelatives(node_path, type='transform', ad=True)
             if children:
                 for child in children:
-                    child = Node(child)
+                    child = type(self)(child)
                     if not child.is_transform_locked():
                         return False
 
@@ -438,7 +517,7 @@ class Node():
         """Keeps all shapes (self and children) only if they're in the type list"""
         children = self.children(transform_only=True)
         for child in children:
-            child = Node(child)
+            child = type(self)(child)
             if child.shape_type() not in types_list:
                 child.remove_shape()
         if self.shape_type() not in types_list:
@@ -511,7 +590,7 @@ class Node():
         prnt = cmds.listRelatives(node_path, p=True, f=True)
 
         if prnt is not None:
-            return Node(prnt[0])
+            return type(self)(prnt[0])
 
         return None
 
@@ -532,7 +611,7 @@ class Node():
             if toWorld:
                 cmds.parent(nodePath, world=True)
             else:
-                parent = Node(parent)
+                parent = type(self)(parent)
                 parentPath = parent.path()
                 cmds.parent(nodePath, parentPath, relative=rel)
         except Exception:
@@ -581,7 +660,7 @@ class Node():
     def remove_empty(self, recursive=True):
         """Removes all empty groups"""
         for child in self.children():
-            child = Node(child)
+            child = type(self)(child)
             if child.is_empty(recursive):
                 child.remove()
         if self.is_empty(recursive):
@@ -595,7 +674,7 @@ class Node():
         if recursive:
             children = self.children(transform_only=True)
             for child in children:
-                child = Node(child)
+                child = type(self)(child)
                 shapes = child.shapes()
                 if len(shapes) > 1:
                     for shape in shapes[1:]:
@@ -614,7 +693,7 @@ class Node():
         """Removes all hidden children"""
         children = self.children()
         for child in reversed(children):
-            child = Node(child)
+            child = type(self)(child)
             if child.is_hidden():
                 child.remove()
 
@@ -622,7 +701,7 @@ class Node():
         """Removes all shapes (self and children) if they're on of these types"""
         children = self.children(transform_only=True)
         for child in children:
-            child = Node(child)
+            child = type(self)(child)
             if child.shape_type() in types_list:
                 child.remove_shape()
         if self.shape_type() in types_list:
@@ -671,7 +750,7 @@ class Node():
         nodePath = self.path()
         # The shapes of this node
         shapePaths = cmds.listRelatives(nodePath,s=True,f=True)
-        return Node.get_nodes(shapePaths)
+        return self.get_nodes(shapePaths)
 
     def shape(self):
         """Gets the main shape of this node"""
@@ -716,3 +795,327 @@ class Node():
     def uuid(self):
         """Returns the uuid of this node"""
         return self.__uuid
+
+class NodeList():
+    """A compact list of Nodes: the UUIDs are packed in a single byte array,
+    and the Nodes (of node_class) are created only when they're read."""
+
+    __slots__ = ('_uuids', '_node_class')
+
+    # The size of a packed UUID, in bytes
+    UUID_SIZE = 16
+
+    def __init__(self, uuids=(), node_class=Node):
+        self._uuids = bytearray()
+        self._node_class = node_class
+        for uuid in uuids:
+            self.append(uuid)
+
+    @staticmethod
+    def pack(uuid):
+        """Packs a Maya UUID string to 16 bytes"""
+        return binascii.unhexlify(uuid.replace('-', ''))
+
+    @staticmethod
+    def unpack(data):
+        """Unpacks 16 bytes to a Maya UUID string"""
+        h = binascii.hexlify(data).decode('ascii').upper()
+        return '-'.join( (h[0:8], h[8:12], h[12:16], h[16:20], h[20:32]) )
+
+    def append(self, node_or_uuid):
+        """Adds a Node or a UUID"""
+        if isinstance(node_or_uuid, Node):
+            node_or_uuid = node_or_uuid.uuid()
+        self._uuids.extend( NodeList.pack(node_or_uuid) )
+
+    def uuid(self, index):
+        """Returns the UUID at the index"""
+        if index < 0:
+            index = index + len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("NodeList index out of range")
+        start = index * NodeList.UUID_SIZE
+        return NodeList.unpack( bytes(self._uuids[start:start + NodeList.UUID_SIZE]) )
+
+    def uuids(self):
+        """Returns all the UUIDs"""
+        return [ self.uuid(i) for i in range(len(self)) ]
+
+    def paths(self):
+        """Returns the full paths of all the nodes, with a single cmds.ls call"""
+        if len(self) == 0:
+            return []
+        return cmds.ls(self.uuids(), long=True)
+
+    def __len__(self):
+        return len(self._uuids) // NodeList.UUID_SIZE
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return NodeList( [ self.uuid(i) for i in range(*index.indices(len(self))) ], self._node_class )
+        if self._node_class is Node:
+            return Node.from_uuid(self.uuid(index))
+        return self._node_class(self.uuid(index))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+class HandleNode(Node):
+    """A Node which keeps an MObjectHandle instead of the UUID.
+    The path is read from the handle, without any cmds query,
+    and it stays valid when the node is renamed or reparented.
+    Same API as Node; the nodes it returns are HandleNodes too."""
+
+    def __init__(self, node_path): # pylint: disable=super-init-not-called
+
+        if isinstance(node_path, HandleNode):
+            # Copy constructor
+            self.__handle = om.MObjectHandle(node_path.mobject())
+            return
+        if isinstance(node_path, om.MObject):
+            self.__handle = om.MObjectHandle(node_path)
+            return
+        if isinstance(node_path, Node):
+            node_path = node_path.path()
+
+        selectionList = om.MSelectionList()
+        try:
+            selectionList.add(node_path)
+        except RuntimeError:
+            # May be a UUID
+            try:
+                selectionList.add(om.MUuid(node_path))
+            except (RuntimeError, ValueError, TypeError):
+                pass
+        if selectionList.length() == 0:
+            raise ValueError("Sorry, the node '" + str(node_path) + "' doesn't exist.")
+        self.__handle = om.MObjectHandle(selectionList.getDependNode(0))
+
+    # <== Static ==>
+
+    @staticmethod
+    def get_nodes(node_paths_or_uuids):
+        """Returns a list of HandleNodes"""
+        if node_paths_or_uuids is None:
+            return []
+        return [ HandleNode(node) for node in node_paths_or_uuids ]
+
+    @staticmethod
+    def get_node_list(node_paths_or_uuids):
+        """Returns a NodeList of HandleNodes"""
+        if node_paths_or_uuids is None:
+            return NodeList(node_class=HandleNode)
+        return NodeList([ node.uuid() for node in HandleNode.get_nodes(node_paths_or_uuids) ], HandleNode)
+
+    # <== Public ==>
+
+    def mobject(self):
+        """Returns the MObject of the node (a null MObject if it's been deleted)"""
+        if not self.__handle.isValid():
+            return om.MObject()
+        return self.__handle.object()
+
+    def dag_path(self):
+        """Returns the MDagPath of the node, or None if it's not a DAG node or it's been deleted"""
+        obj = self.mobject()
+        if obj.isNull() or not obj.hasFn(om.MFn.kDagNode):
+            return None
+        return om.MDagPath.getAPathTo(obj)
+
+    def children(self, recursive=True, transform_only=False):
+        """Gets the children of this node"""
+        dagPath = self.dag_path()
+        if dagPath is None:
+            return []
+        children = []
+        if recursive:
+            it = om.MItDag()
+            it.reset(dagPath)
+            # Skip the node itself
+            it.next()
+            while not it.isDone():
+                obj = it.currentItem()
+                if not transform_only or obj.hasFn(om.MFn.kTransform):
+                    children.append(HandleNode(obj))
+                it.next()
+        else:
+            for i in range(dagPath.childCount()):
+                obj = dagPath.child(i)
+                if not transform_only or obj.hasFn(om.MFn.kTransform):
+                    children.append(HandleNode(obj))
+        return children
+
+    def exists(self):
+        """Checks if this node still exists in the scene"""
+        return self.__handle.isValid()
+
+    def has_children(self):
+        """Checks if the nodes has any children"""
+        dagPath = self.dag_path()
+        if dagPath is None:
+            return False
+        for i in range(dagPath.childCount()):
+            if dagPath.child(i).hasFn(om.MFn.kTransform):
+                return True
+        return False
+
+    def has_parent(self):
+        """Checks if the node has a parent"""
+        dagPath = self.dag_path()
+        if dagPath is None:
+            return False
+        return dagPath.length() > 1
+
+    def is_group(self):
+        """Check if the node is a group (does not have any shape)"""
+        if not self.is_transform():
+            return False
+        return self.dag_path().numberOfShapesDirectlyBelow() == 0
+
+    def is_transform(self):
+        """Checks if this is a transform node"""
+        obj = self.mobject()
+        if obj.isNull():
+            return False
+        return om.MFnDependencyNode(obj).typeName == 'transform'
+
+    def name(self, keep_namespace = False):
+        """Returns the name of the node"""
+        obj = self.mobject()
+        if obj.isNull():
+            return ''
+        nodeName = om.MFnDependencyNode(obj).name()
+        if not keep_namespace:
+            nodeName = nodeName.split(':')[-1]
+        return nodeName
+
+    def parent(self):
+        """Gets the parent node"""
+        dagPath = self.dag_path()
+        if dagPath is None or dagPath.length() <= 1:
+            return None
+        dagPath.pop()
+        return HandleNode(dagPath.node())
+
+    def path(self):
+        """Returns the full path for the node"""
+        obj = self.mobject()
+        if obj.isNull():
+            return ''
+        if obj.hasFn(om.MFn.kDagNode):
+            return om.MDagPath.getAPathTo(obj).fullPathName()
+        return om.MFnDependencyNode(obj).name()
+
+    def shapes(self):
+        """Gets all the shapes of this node"""
+        dagPath = self.dag_path()
+        if dagPath is None:
+            return []
+        shapes = []
+        for i in range(dagPath.childCount()):
+            obj = dagPath.child(i)
+            if obj.hasFn(om.MFn.kShape):
+                shapes.append(HandleNode(obj))
+        return shapes
+
+    def uuid(self):
+        """Returns the uuid of this node"""
+        obj = self.mobject()
+        if obj.isNull():
+            return ''
+        return om.MFnDependencyNode(obj).uuid().asString()
+
+class CountingCmds():
+    """Stands in for maya.cmds in this module, and counts the calls"""
+
+    def __init__(self, maya_cmds):
+        self.count = 0
+        self._cmds = maya_cmds
+
+    def __getattr__(self, name):
+        func = getattr(self._cmds, name)
+        def counted(*args, **kwargs):
+            self.count = self.count + 1
+            return func(*args, **kwargs)
+        return counted
+
+def benchmark_backends(node_count=10000, depth=4):
+    """Compares the cmds calls and the time taken by Node and HandleNode
+    to wrap node_count nodes, in hierarchies of depth groups,
+    and to read their path, name, parent and children.
+    This replaces the current scene: run it in mayapy.
+    Returns the (cmds calls, time) by class name."""
+    global cmds # pylint: disable=global-statement,invalid-name
+    cmds.file(new=True, force=True)
+    paths = []
+    parent = None
+    for i in range(node_count):
+        if i % depth == 0:
+            parent = None
+        if parent is None:
+            parent = cmds.group(empty=True, name='node' + str(i))
+        else:
+            parent = cmds.group(empty=True, name='node' + str(i), parent=parent)
+        paths.append(parent)
+    paths = cmds.ls(paths, long=True)
+
+    mayaCmds = cmds
+    results = {}
+    for nodeClass in (Node, HandleNode):
+        counter = CountingCmds(mayaCmds)
+        cmds = counter
+        try:
+            t = time.time()
+            for node in nodeClass.get_nodes(paths):
+                node.path()
+                node.name()
+                node.parent()
+                node.children(recursive=False)
+                node.is_group()
+            results[nodeClass.__name__] = (counter.count, time.time() - t)
+        finally:
+            cmds = mayaCmds
+        print("%s: %i cmds calls, %.2f s" % (nodeClass.__name__, counter.count, results[nodeClass.__name__][1]))
+    return results
+
+def benchmark_remove_empty_groups(chain_count=50, depth=40):
+    """Compares the cmds calls and the time taken to remove the empty groups
+    by scanning the scene again until there's no empty group left,
+    and with Node.remove_empty_groups, in a scene with chain_count chains of depth nested groups;
+    one chain out of two ends with a locator, and is kept.
+    This replaces the current scene: run it in mayapy.
+    Returns the (cmds calls, time) by method."""
+    global cmds # pylint: disable=global-statement,invalid-name
+    mayaCmds = cmds
+
+    def create_scene():
+        mayaCmds.file(new=True, force=True)
+        for i in range(chain_count):
+            parent = mayaCmds.group(empty=True, name='chain' + str(i))
+            for d in range(1, depth):
+                parent = mayaCmds.group(empty=True, name='chain' + str(i) + '_' + str(d), parent=parent)
+            if i % 2 == 0:
+                mayaCmds.parent(mayaCmds.spaceLocator()[0], parent)
+
+    def rescan():
+        emptyGroups = Node.get_empty_groups()
+        while len(emptyGroups) > 0:
+            for group in emptyGroups:
+                group.remove()
+            emptyGroups = Node.get_empty_groups()
+
+    results = {}
+    for method, func in (('rescan', rescan), ('single pass', Node.remove_empty_groups)):
+        create_scene()
+        counter = CountingCmds(mayaCmds)
+        cmds = counter
+        try:
+            t = time.time()
+            func()
+            results[method] = (counter.count, time.time() - t)
+        finally:
+            cmds = mayaCmds
+        print("%s: %i cmds calls, %.2f s, %i transforms left" % (
+            method, counter.count, results[method][1], len(cmds.ls(type='transform')) ) )
+    return results
@@ -1,7 +1,17 @@
 # -*- coding: utf-8 -*-
 """Rendering functions"""
 
+import time
 from maya import cmds
+from maya import mel
+import maya.api.OpenMaya as om # pylint: disable=import-error
+
+# The scene queries cached for the session, until the scene changes (see get_cached)
+_SCENE_CACHE = {}
+# The callback ids which invalidate the cache
+_SCENE_CALLBACKS = []
+# The attribute changed callbacks of the nodes used by the cached queries, by key
+_NODE_CALLBACKS = {}
 
 def set_renderable_camera(camera):
     cameras = cmds.ls(type='camera')
@@ -38,4 +48,181 @@ def get_ortho_cameras():
         camera = cmds.listRelatives(camera, parent=True, f=True, type='transform')[0]
         if cmds.camera(camera, orthographic=True, query=True):
             orthoCameras.append(camera)
-    return orthoCameras
\ No newline at end of file
+    return orthoCameras
+
+def get_camera_index():
+    """Lists all the cameras in a single pass with OpenMaya, instead of several cmds queries per camera.
+    Returns a list of dicts, one per camera shape, in the order of cmds.ls(type='camera'):
+    'path' (the full path of the transform), 'shape' (the full path of the shape),
+    'renderable', 'orthographic' and 'focalLength'."""
+    cameras = []
+    it = om.MItDependencyNodes(om.MFn.kCamera)
+    while not it.isDone():
+        dagPath = om.MDagPath.getAPathTo(it.thisNode())
+        fn = om.MFnCamera(dagPath)
+        shape = dagPath.fullPathName()
+        dagPath.pop()
+        cameras.append({
+            'path': dagPath.fullPathName(),
+            'shape': shape,
+            'renderable': fn.findPlug('renderable', False).asBool(),
+            'orthographic': fn.isOrtho(),
+            'focalLength': fn.focalLength,
+        })
+        it.next()
+    return cameras
+
+def split_camera_index(cameras):
+    """Returns the renderable, persp and ortho camera paths of a camera index (see get_camera_index),
+    like get_renderable_cameras, get_persp_cameras and get_ortho_cameras"""
+    renderableCameras = [ camera['path'] for camera in cameras if camera['renderable'] ]
+    perspCameras = [ camera['path'] for camera in cameras if not camera['orthographic'] ]
+    orthoCameras = [ camera['path'] for camera in cameras if camera['orthographic'] ]
+    return renderableCameras, perspCameras, orthoCameras
+
+def clear_scene_cache(key=None):
+    """Forgets the cached scene query (see get_cached), or all of them if key is None"""
+    # This may be called by the callbacks themselves,
+    # they're removed when the query runs again
+    if key is None:
+        _SCENE_CACHE.clear()
+    else:
+        _SCENE_CACHE.pop(key, None)
+
+def _clear_all(*args): # pylint: disable=unused-argument
+    clear_scene_cache()
+
+def _clear_cameras(*args): # pylint: disable=unused-argument
+    clear_scene_cache('cameras')
+
+def _clear_audio(*args): # pylint: disable=unused-argument
+    clear_scene_cache('audio')
+
+def _clear_names(*args): # pylint: disable=unused-argument
+    # The cameras and the audio nodes are cached by name
+    clear_scene_cache('cameras')
+    clear_scene_cache('audio')
+
+def _clear_resolution(*args): # pylint: disable=unused-argument
+    clear_scene_cache('resolution')
+
+def _clear_framerate(*args): # pylint: disable=unused-argument
+    clear_scene_cache('framerate')
+
+def _add_scene_callbacks():
+    """Registers the callbacks which invalidate the cache, once per session"""
+    if _SCENE_CALLBACKS:
+        return
+    for message in (
+        om.MSceneMessage.kAfterOpen,
+        om.MSceneMessage.kAfterNew,
+        om.MSceneMessage.kAfterImport,
+        om.MSceneMessage.kAfterLoadReference,
+        om.MSceneMessage.kAfterUnloadReference,
+        om.MSceneMessage.kAfterRemoveReference,
+        ):
+        _SCENE_CALLBACKS.append( om.MSceneMessage.addCallback(message, _clear_all) )
+    for nodeType, callback in (('camera', _clear_cameras), ('audio', _clear_audio)):
+        _SCENE_CALLBACKS.append( om.MDGMessage.addNodeAddedCallback(callback, nodeType) )
+        _SCENE_CALLBACKS.append( om.MDGMessage.addNodeRemovedCallback(callback, nodeType) )
+    # The camera paths change when any node is renamed or reparented, the audio node names when they're renamed
+    _SCENE_CALLBACKS.append( om.MNodeMessage.addNameChangedCallback(om.MObject.kNullObj, _clear_names) )
+    _SCENE_CALLBACKS.append( om.MDagMessage.addAllDagChangesCallback(_clear_cameras) )
+    _SCENE_CALLBACKS.append( om.MEventMessage.addEventCallback('timeUnitChanged', _clear_framerate) )
+
+def _add_attribute_callback(key, node, callback):
+    """Registers an attribute changed callback on the node (by name) for the cached query"""
+    selectionList = om.MSelectionList()
+    selectionList.add(node)
+    _NODE_CALLBACKS.setdefault(key, []).append(
+        om.MNodeMessage.addAttributeChangedCallback(selectionList.getDependNode(0), callback) )
+
+def _remove_attribute_callbacks(key):
+    callbacks = _NODE_CALLBACKS.pop(key, [])
+    if callbacks:
+        om.MMessage.removeCallbacks(callbacks)
+
+def remove_scene_cache_callbacks():
+    """Removes the callbacks and clears the cache, before unloading the plugin"""
+    clear_scene_cache()
+    for key in list(_NODE_CALLBACKS):
+        _remove_attribute_callbacks(key)
+    if _SCENE_CALLBACKS:
+        om.MMessage.removeCallbacks(_SCENE_CALLBACKS)
+        del _SCENE_CALLBACKS[:]
+
+def get_cached(key, query):
+    """Returns the result of query(), cached until the scene changes.
+    The callbacks only watch the keys used here: 'cameras', 'resolution', 'framerate' and 'audio'"""
+    if key in _SCENE_CACHE:
+        return _SCENE_CACHE[key]
+    _add_scene_callbacks()
+    _remove_attribute_callbacks(key)
+    result = query()
+    _SCENE_CACHE[key] = result
+    return result
+
+def _index_cameras():
+    cameras = get_camera_index()
+    # Renderable, orthographic or focal length changes
+    for camera in cameras:
+        _add_attribute_callback('cameras', camera['shape'], _clear_cameras)
+    return cameras
+
+def _get_resolution():
+    _add_attribute_callback('resolution', 'defaultResolution', _clear_resolution)
+    return ( cmds.getAttr('defaultResolution.width'), cmds.getAttr('defaultResolution.height') )
+
+def get_cached_camera_index():
+    """The camera index (see get_camera_index), cached until cameras change"""
+    return get_cached('cameras', _index_cameras)
+
+def get_cached_resolution():
+    """The (width, height) render resolution, cached until it changes"""
+    return get_cached('resolution', _get_resolution)
+
+def get_cached_framerate():
+    """The framerate, cached until the time unit changes"""
+    # It's not in cmds
+    return get_cached('framerate', lambda: mel.eval('float $fps = `currentTimeUnitToFPS`'))
+
+def get_cached_audio_nodes():
+    """The audio nodes, cached until audio nodes are added or removed"""
+    return get_cached('audio', lambda: cmds.ls(type='audio'))
+
+def benchmark_camera_index(camera_count=300, rig_depth=3):
+    """Compares get_camera_index with get_renderable_cameras, get_persp_cameras and get_ortho_cameras
+    in a new scene with camera_count cameras, each one at the bottom of a rig of rig_depth groups.
+    This replaces the current scene: run it in mayapy.
+    Returns the times in seconds, by method"""
+    cmds.file(new=True, force=True)
+    for i in range(camera_count):
+        parent = None
+        for d in range(rig_depth):
+            if parent is None:
+                parent = cmds.group(empty=True, name='rig' + str(i) + '_' + str(d))
+            else:
+                parent = cmds.group(empty=True, name='rig' + str(i) + '_' + str(d), parent=parent)
+        camera = cmds.camera()[0]
+        cmds.parent(camera, parent)
+        if i % 3 == 0:
+            cmds.setAttr(camera + '.orthographic', True)
+        if i % 5 == 0:
+            cmds.setAttr(camera + '.renderable', True)
+
+    t = time.time()
+    queried = ( get_renderable_cameras(), get_persp_cameras(), get_ortho_cameras() )
+    queryTime = time.time() - t
+
+    t = time.time()
+    indexed = split_camera_index( get_camera_index() )
+    indexTime = time.time() - t
+
+    if queried != indexed:
+        print("The camera index differs from the queried cameras!")
+    print("%i cameras: cmds queries %.3f s, camera index %.3f s (x%.1f)" % (
+        camera_count + 4, queryTime, indexTime, queryTime / max(indexTime, 1e-6) ) )
+    return {
+        'queries': queryTime,
+        'index': indexTime,
+    }
@@ -20,7 +20,7 @@ from PySide2.QtCore import ( # pylint: disable=no-name-in-module,import-error
     QUrl
 )
 from .utils import getModulePath
-from .rendering import get_ortho_cameras, get_persp_cameras, get_renderable_cameras
+from .rendering import get_cached_camera_index, split_camera_index
 from .paths import baseName
 
 ICON_PATH = getModulePath() + "/icons/"
@@ -41,9 +41,7 @@ def update_cam_combobox(combobox):
     """Sets the list of cameras in the scene in a QComboBox"""
     combobox.clear()
 
-    renderableCameras = get_renderable_cameras()
-    perspCameras =  get_persp_cameras()
-    orthoCameras = get_ortho_cameras()
+    renderableCameras, perspCameras, orthoCameras = split_camera_index( get_cached_camera_index() )
 
     numRenderCam = len(renderableCameras)
     if numRenderCam > 0:
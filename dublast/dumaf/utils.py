@@ -2,37 +2,92 @@
 
 from time import time
 import os
+import json
+import threading
 from inspect import getsourcefile
+import maya.utils # pylint: disable=import-error
 from maya import cmds # pylint: disable=import-error
 from dublast.dupyf import updater
 
+# The update checks running, by tool name
+_UPDATE_THREADS = {}
+
 def getModulePath():
     """Gets the folder containing the module"""
     return os.path.dirname( os.path.abspath(getsourcefile(lambda:0))  )
 
-def checkUpdate( toolName, toolVersion, language="en", preRelease=False, discreet=True ):
-    """Checks if an update is available for the tool"""
-    from .ui import UpdateDialog
+def checkUpdate( toolName, toolVersion, language="en", preRelease=False, discreet=True, background=True ):
+    """Checks if an update is available for the tool.
+    If background is True, the server is called from a thread and this returns immediately;
+    the result is shown later from the main thread, and cached in the optionVars."""
+
+    # Never in batch mode, and only one check at a time
+    if cmds.about(batch=True):
+        return
+    thread = _UPDATE_THREADS.get(toolName)
+    if thread is not None and thread.is_alive():
+        return
 
     # if discreet, only once a day
     if discreet:
         now = time()
         latest = cmds.optionVar(q='dumaf-latestupdate-' + toolName)
         if now - latest < 86400:
+            # Remind the last known update, without calling the server
+            info = getLastUpdateInfo( toolName )
+            if info is not None and info.get("update") and info.get("version") != toolVersion:
+                print("An update is available for " + toolName + ": " + str(info.get("version", "")))
             return
 
+    # Set now, so that the next calls don't wait for the server
+    cmds.optionVar(intValue=('dumaf-latestupdate-' + toolName, time()))
+    hostVersion = cmds.about(majorVersion=True) + "." + cmds.about(minorVersion=True) + "." + cmds.about(patchVersion=True)
 
-    info = updater.checkUpdate(
-        "http://api.rxlab.io",
-        toolName,
-        toolVersion,
-        "Maya",
-        cmds.about(majorVersion=True) + "." + cmds.about(minorVersion=True) + "." + cmds.about(patchVersion=True),
-        preRelease,
-        language
-        )
+    def run():
+        info = updater.checkUpdate(
+            "http://api.rxlab.io",
+            toolName,
+            toolVersion,
+            "Maya",
+            hostVersion,
+            preRelease,
+            language
+            )
+        if background:
+            maya.utils.executeDeferred( showUpdate, info, toolName, toolVersion, discreet )
+        else:
+            showUpdate( info, toolName, toolVersion, discreet )
 
-    cmds.optionVar(intValue=('dumaf-latestupdate-' + toolName, time()))
+    if not background:
+        run()
+        return
+
+    thread = threading.Thread(target=run)
+    # Don't keep Maya open while waiting for the server
+    thread.daemon = True
+    _UPDATE_THREADS[toolName] = thread
+    thread.start()
+
+def getLastUpdateInfo( toolName ):
+    """Returns the info of the last successful update check, or None"""
+    if not cmds.optionVar(exists='dumaf-updateinfo-' + toolName):
+        return None
+    try:
+        return json.loads( cmds.optionVar(q='dumaf-updateinfo-' + toolName) )
+    except ValueError:
+        return None
+
+def showUpdate( info, toolName, toolVersion, discreet=True ):
+    """Stores the update info and shows it. Must be called from the main thread."""
+    from .ui import UpdateDialog
+
+    if info is None:
+        print("Can't check updates for " + toolName + ", the server can't be reached.")
+        # Try again next time
+        cmds.optionVar(intValue=('dumaf-latestupdate-' + toolName, 0))
+        return
+
+    cmds.optionVar(stringValue=('dumaf-updateinfo-' + toolName, json.dumps(info)))
 
     if not info["update"]:
         if not discreet:
@@ -49,4 +104,4 @@ def checkUpdate( toolName, toolVersion, language="en", preRelease=False, discree
     dialog.exec_()
 
 if __name__ == "__main__":
-    checkUpdate( "Ramses-Maya", "0.0.1", discreet=False)
+    checkUpdate( "Ramses-Maya", "0.0.1", discreet=False, background=False)
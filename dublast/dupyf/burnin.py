@@ -0,0 +1,252 @@
+"""Draws the burn-ins (texts, letterbox, safe frames) on raw RGBA frames with NumPy.
+NumPy is optional: check isAvailable() first."""
+
+import sys
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# A 5x7 pixels font, one int per row, upper case only
+FONT = {
+    '0': (0b01110, 0b10001, 0b10011, 0b10101, 0b11001, 0b10001, 0b01110),
+    '1': (0b00100, 0b01100, 0b00100, 0b00100, 0b00100, 0b00100, 0b01110),
+    '2': (0b01110, 0b10001, 0b00001, 0b00010, 0b00100, 0b01000, 0b11111),
+    '3': (0b11111, 0b00010, 0b00100, 0b00010, 0b00001, 0b10001, 0b01110),
+    '4': (0b00010, 0b00110, 0b01010, 0b10010, 0b11111, 0b00010, 0b00010),
+    '5': (0b11111, 0b10000, 0b11110, 0b00001, 0b00001, 0b10001, 0b01110),
+    '6': (0b00110, 0b01000, 0b10000, 0b11110, 0b10001, 0b10001, 0b01110),
+    '7': (0b11111, 0b00001, 0b00010, 0b00100, 0b01000, 0b01000, 0b01000),
+    '8': (0b01110, 0b10001, 0b10001, 0b01110, 0b10001, 0b10001, 0b01110),
+    '9': (0b01110, 0b10001, 0b10001, 0b01111, 0b00001, 0b00010, 0b01100),
+    'A': (0b01110, 0b10001, 0b10001, 0b10001, 0b11111, 0b10001, 0b10001),
+    'B': (0b11110, 0b10001, 0b10001, 0b11110, 0b10001, 0b10001, 0b11110),
+    'C': (0b01110, 0b10001, 0b10000, 0b10000, 0b10000, 0b10001, 0b01110),
+    'D': (0b11100, 0b10010, 0b10001, 0b10001, 0b10001, 0b10010, 0b11100),
+    'E': (0b11111, 0b10000, 0b10000, 0b11110, 0b10000, 0b10000, 0b11111),
+    'F': (0b11111, 0b10000, 0b10000, 0b11110, 0b10000, 0b10000, 0b10000),
+    'G': (0b01110, 0b10001, 0b10000, 0b10111, 0b10001, 0b10001, 0b01111),
+    'H': (0b10001, 0b10001, 0b10001, 0b11111, 0b10001, 0b10001, 0b10001),
+    'I': (0b01110, 0b00100, 0b00100, 0b00100, 0b00100, 0b00100, 0b01110),
+    'J': (0b00111, 0b00010, 0b00010, 0b00010, 0b00010, 0b10010, 0b01100),
+    'K': (0b10001, 0b10010, 0b10100, 0b11000, 0b10100, 0b10010, 0b10001),
+    'L': (0b10000, 0b10000, 0b10000, 0b10000, 0b10000, 0b10000, 0b11111),
+    'M': (0b10001, 0b11011, 0b10101, 0b10101, 0b10001, 0b10001, 0b10001),
+    'N': (0b10001, 0b10001, 0b11001, 0b10101, 0b10011, 0b10001, 0b10001),
+    'O': (0b01110, 0b10001, 0b10001, 0b10001, 0b10001, 0b10001, 0b01110),
+    'P': (0b11110, 0b10001, 0b10001, 0b11110, 0b10000, 0b10000, 0b10000),
+    'Q': (0b01110, 0b10001, 0b10001, 0b10001, 0b10101, 0b10010, 0b01101),
+    'R': (0b11110, 0b10001, 0b10001, 0b11110, 0b10100, 0b10010, 0b10001),
+    'S': (0b01111, 0b10000, 0b10000, 0b01110, 0b00001, 0b00001, 0b11110),
+    'T': (0b11111, 0b00100, 0b00100, 0b00100, 0b00100, 0b00100, 0b00100),
+    'U': (0b10001, 0b10001, 0b10001, 0b10001, 0b10001, 0b10001, 0b01110),
+    'V': (0b10001, 0b10001, 0b10001, 0b10001, 0b10001, 0b01010, 0b00100),
+    'W': (0b10001, 0b10001, 0b10001, 0b10101, 0b10101, 0b10101, 0b01010),
+    'X': (0b10001, 0b10001, 0b01010, 0b00100, 0b01010, 0b10001, 0b10001),
+    'Y': (0b10001, 0b10001, 0b10001, 0b01010, 0b00100, 0b00100, 0b00100),
+    'Z': (0b11111, 0b00001, 0b00010, 0b00100, 0b01000, 0b10000, 0b11111),
+    ' ': (0, 0, 0, 0, 0, 0, 0),
+    ':': (0, 0b01100, 0b01100, 0, 0b01100, 0b01100, 0),
+    '.': (0, 0, 0, 0, 0, 0b01100, 0b01100),
+    ',': (0, 0, 0, 0, 0b01100, 0b00100, 0b01000),
+    '-': (0, 0, 0, 0b11111, 0, 0, 0),
+    '_': (0, 0, 0, 0, 0, 0, 0b11111),
+    '+': (0, 0b00100, 0b00100, 0b11111, 0b00100, 0b00100, 0),
+    '=': (0, 0, 0b11111, 0, 0b11111, 0, 0),
+    '/': (0, 0b00001, 0b00010, 0b00100, 0b01000, 0b10000, 0),
+    '(': (0b00010, 0b00100, 0b01000, 0b01000, 0b01000, 0b00100, 0b00010),
+    ')': (0b01000, 0b00100, 0b00010, 0b00010, 0b00010, 0b00100, 0b01000),
+    '#': (0b01010, 0b01010, 0b11111, 0b01010, 0b11111, 0b01010, 0b01010),
+    '%': (0b11000, 0b11001, 0b00010, 0b00100, 0b01000, 0b10011, 0b00011),
+    "'": (0b01100, 0b00100, 0b01000, 0, 0, 0, 0),
+    '?': (0b01110, 0b10001, 0b00001, 0b00010, 0b00100, 0, 0b00100),
+}
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+# Space between the glyphs and around the texts, in font pixels
+GLYPH_SPACING = 1
+# The font pixel size is the frame height divided by this
+FONT_SCALE_DIVIDER = 270
+# The safe frames, relative to the frame size
+ACTION_SAFE = 0.93
+TITLE_SAFE = 0.8
+
+def isAvailable():
+    """Checks if NumPy can be imported"""
+    return numpy is not None
+
+def getTimecode(frame, framerate):
+    """The HH:MM:SS:FF (non-drop frame) timecode of a frame number"""
+    fps = max(1, int(round(framerate)))
+    frame = int(frame)
+    ff = frame % fps
+    seconds = frame // fps
+    return "%02i:%02i:%02i:%02i" % (seconds // 3600, (seconds // 60) % 60, seconds % 60, ff)
+
+class BurnIn():
+    """Draws texts, letterbox and safe frames on raw frames of a given size.
+    The static parts are prepared once, and the per-frame texts are cached,
+    so drawing a frame only needs a few array operations.
+    The layout is relative to the frame height, it doesn't depend on the resolution.
+    letterbox is the aspect ratio to mask (2.39 for scope), 0 for none;
+    if hud is False, only the letterbox and the safe frames are drawn.
+    frameTexts overrides the static texts at some frames: {frame: {'focalLength': '50 mm'}}."""
+
+    def __init__(self, width, height, bottomUp=True, comment='', camera='', focalLength='', framerate=24.0,
+            letterbox=0.0, safeFrames=False, hud=True, frameTexts=None, pixelSize=4):
+        if numpy is None:
+            raise ImportError("NumPy is needed for the burn-ins.")
+        self.width = width
+        self.height = height
+        self.bottomUp = bottomUp
+        self.framerate = framerate
+        self.pixelSize = pixelSize
+        self.hud = hud
+        self.scale = max(1, int(round(height / float(FONT_SCALE_DIVIDER))))
+        self.margin = self.scale * 4
+        self._texts = {}
+        self._glyphs = {}
+
+        # The static texts, by position
+        self.comment = comment
+        self.camera = camera
+        self.focalLength = focalLength
+        self.frameTexts = frameTexts or {}
+
+        # The rows hidden by the letterbox
+        self._letterbox = 0
+        if letterbox > 0 and width / float(height) < letterbox:
+            self._letterbox = int(round((height - width / letterbox) / 2.0))
+        # The safe frame lines, as a (height, width) mask.
+        # Not flat indices: the image may be a flipped view, which can't be reshaped in place
+        self._safeFrameMask = None
+        if safeFrames:
+            self._safeFrameMask = numpy.zeros((height, width), dtype=bool)
+            for ratio in (ACTION_SAFE, TITLE_SAFE):
+                self._drawRectangle(self._safeFrameMask, ratio)
+
+    def _drawRectangle(self, mask, ratio):
+        w = int(self.width * ratio)
+        h = int(self.height * ratio)
+        x0 = (self.width - w) // 2
+        y0 = (self.height - h) // 2
+        thickness = max(1, self.scale // 2)
+        mask[y0:y0+thickness, x0:x0+w] = True
+        mask[y0+h-thickness:y0+h, x0:x0+w] = True
+        mask[y0:y0+h, x0:x0+thickness] = True
+        mask[y0:y0+h, x0+w-thickness:x0+w] = True
+
+    def _glyph(self, char):
+        """The scaled mask of a character"""
+        glyph = self._glyphs.get(char)
+        if glyph is not None:
+            return glyph
+        rows = FONT.get(char, FONT['?'])
+        # Shift left to add the spacing on the right
+        bits = numpy.array([ [ ((row << GLYPH_SPACING) >> (GLYPH_WIDTH + GLYPH_SPACING - 1 - x)) & 1 for x in range(GLYPH_WIDTH + GLYPH_SPACING) ] for row in rows ], dtype=bool)
+        glyph = numpy.repeat(numpy.repeat(bits, self.scale, axis=0), self.scale, axis=1)
+        self._glyphs[char] = glyph
+        return glyph
+
+    def textMask(self, text):
+        """The mask of a text, cached"""
+        text = text.upper()
+        mask = self._texts.get(text)
+        if mask is not None:
+            return mask
+        if text == '':
+            mask = numpy.zeros((GLYPH_HEIGHT * self.scale, 0), dtype=bool)
+        else:
+            mask = numpy.hstack([ self._glyph(c) for c in text ])
+        # Keep only the texts of the last frames
+        if len(self._texts) > 256:
+            self._texts.clear()
+        self._texts[text] = mask
+        return mask
+
+    def _drawText(self, image, text, section):
+        """Draws the text in one of the HUD sections:
+        0 to 4 from left to right at the top, 5 to 9 at the bottom"""
+        if text == '':
+            return
+        pad = self.scale * GLYPH_SPACING
+        # Clip the text which doesn't fit in the frame
+        mask = self.textMask(text)[:max(0, self.height - 2 * pad), :max(0, self.width - 2 * pad)]
+        h, w = mask.shape
+        if h <= 0 or w <= 0:
+            return
+        column = section % 5
+        if column == 0:
+            x = self.margin
+        elif column == 4:
+            x = self.width - self.margin - w
+        else:
+            x = (self.width * (2 * column + 1)) // 10 - w // 2
+        if section < 5:
+            y = self.margin + self._letterbox
+        else:
+            y = self.height - self.margin - h - self._letterbox
+        x = max(pad, min(x, self.width - w - pad))
+        y = max(pad, min(y, self.height - h - pad))
+
+        # Darken the background, then draw the text in white
+        background = image[y-pad:y+h+pad, x-pad:x+w+pad, :3]
+        background >>= 1
+        region = image[y:y+h, x:x+w]
+        region[mask] = 255
+
+    def draw(self, image, frame, texts=None):
+        """Draws on the (height, width, pixelSize) image array, top row first.
+        texts can override the static texts ('comment', 'camera', 'focalLength') for this frame."""
+        frameTexts = self.frameTexts.get(int(frame))
+        if frameTexts:
+            frameTexts = dict(frameTexts)
+            frameTexts.update(texts or {})
+            texts = frameTexts
+        texts = texts or {}
+        if self._letterbox > 0:
+            image[:self._letterbox] = 0
+            image[self.height-self._letterbox:] = 0
+        if self._safeFrameMask is not None:
+            image[self._safeFrameMask, :3] = 255 - (image[self._safeFrameMask, :3] >> 1)
+        if not self.hud:
+            return
+        self._drawText(image, "Frame " + str(int(frame)), 0)
+        self._drawText(image, getTimecode(frame, self.framerate), 4)
+        comment = texts.get('comment', self.comment)
+        if comment != '':
+            self._drawText(image, "Comment: " + comment, 5)
+        camera = texts.get('camera', self.camera)
+        if camera != '':
+            self._drawText(image, "Camera: " + camera, 7)
+        focalLength = texts.get('focalLength', self.focalLength)
+        if focalLength != '':
+            self._drawText(image, "Focal length: " + focalLength, 9)
+
+    def apply(self, frame, frameNumber, texts=None):
+        """Draws the burn-ins on a raw frame (bytes). Returns the new raw frame."""
+        image = numpy.frombuffer(frame, dtype=numpy.uint8).reshape(self.height, self.width, self.pixelSize).copy()
+        # Draw top row first
+        self.draw(image[::-1] if self.bottomUp else image, frameNumber, texts)
+        return image.tobytes()
+
+def benchmark(width=1920, height=1080, frameCount=100):
+    """Measures the time to draw the burn-ins on frames of this size.
+    Returns the time per frame, in ms."""
+    burnIn = BurnIn(width, height, comment="Benchmark", camera="shotCam", focalLength="35 mm",
+        letterbox=2.39, safeFrames=True)
+    frame = bytes(width * height * 4)
+    t = time.time()
+    for f in range(frameCount):
+        burnIn.apply(frame, f + 1001)
+    msPerFrame = (time.time() - t) * 1000.0 / frameCount
+    print("Burn-ins %ix%i: %.2f ms/frame" % (width, height, msPerFrame))
+    return msPerFrame
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        benchmark(int(sys.argv[1]), int(sys.argv[2]))
+    else:
+        benchmark()
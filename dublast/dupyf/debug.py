@@ -1,4 +1,8 @@
+import os
+import json
 import time
+import threading
+from contextlib import contextmanager
 
 class Logger( ):
     """Logs messages to the console (and on file)"""
@@ -8,4 +12,137 @@ class Logger( ):
     def log( self, log = "", time_start = 0 ):
         """Logs a message"""
         t = time.time() - time_start
-        print( " ".join( [ self.toolName , " (%.2f s):" % t , log ] ) )
\ No newline at end of file
+        print( " ".join( [ self.toolName , " (%.2f s):" % t , log ] ) )
+
+class FrameTimings( ):
+    """Collects the time spent evaluating and drawing each frame"""
+
+    def __init__( self ):
+        self.frames = []
+
+    def add( self, frame, evaluationTime, drawTime ):
+        """Records the timings of a frame"""
+        self.frames.append( (frame, evaluationTime, drawTime) )
+
+    def summary( self ):
+        """Returns the totals, means and max of the timings, as a dict"""
+        count = len(self.frames)
+        if count == 0:
+            return { 'frames': 0 }
+        evaluationTimes = [ f[1] for f in self.frames ]
+        drawTimes = [ f[2] for f in self.frames ]
+        return {
+            'frames': count,
+            'evaluationTotal': sum(evaluationTimes),
+            'evaluationMean': sum(evaluationTimes) / count,
+            'evaluationMax': max(evaluationTimes),
+            'drawTotal': sum(drawTimes),
+            'drawMean': sum(drawTimes) / count,
+            'drawMax': max(drawTimes),
+        }
+
+    def report( self, toolName = "" ):
+        """Prints the summary"""
+        s = self.summary()
+        if s['frames'] == 0:
+            return
+        total = s['evaluationTotal'] + s['drawTotal']
+        print( "%s %i frames: evaluation %.2f s (%.1f ms/frame, max %.1f ms), draw %.2f s (%.1f ms/frame, max %.1f ms), evaluation is %i%% of the capture time." % (
+            toolName,
+            s['frames'],
+            s['evaluationTotal'], s['evaluationMean'] * 1000, s['evaluationMax'] * 1000,
+            s['drawTotal'], s['drawMean'] * 1000, s['drawMax'] * 1000,
+            round( s['evaluationTotal'] / total * 100 ) if total > 0 else 0
+            ) )
+
+def getSize( path, since = 0 ):
+    """The size in bytes of a file, or of all the files in a folder,
+    counting only the files modified since the given time"""
+    if os.path.isfile( path ):
+        if os.path.getmtime( path ) < since:
+            return 0
+        return os.path.getsize( path )
+    size = 0
+    for root, _, files in os.walk( path ):
+        for f in files:
+            try:
+                stat = os.stat( os.path.join( root, f ) )
+            except OSError:
+                continue
+            if stat.st_mtime >= since:
+                size = size + stat.st_size
+    return size
+
+class StageProfiler( Logger ):
+    """Records the wall time, CPU time and bytes written by each stage of a process.
+    The CPU time includes the (finished) child processes, like ffmpeg, when the OS reports it."""
+
+    def __init__( self, toolName = "", info = None, reportFile = "", historyFile = "" ):
+        self.toolName = toolName
+        self.info = dict( info or {} )
+        self.reportFile = reportFile
+        self.historyFile = historyFile
+        self.stages = []
+        self.startTime = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage( self, name, outputPath = "" ):
+        """Times the code in the with block.
+        outputPath is the file or folder written by the stage, to count the bytes."""
+        t = time.time()
+        cpu = os.times()
+        try:
+            yield
+        finally:
+            wallTime = time.time() - t
+            cpuEnd = os.times()
+            s = {
+                'name': name,
+                'start': t - self.startTime,
+                'wallTime': wallTime,
+                'cpuTime': (cpuEnd[0] - cpu[0]) + (cpuEnd[1] - cpu[1]),
+                'childCpuTime': (cpuEnd[2] - cpu[2]) + (cpuEnd[3] - cpu[3]),
+                # The folders may contain older files
+                'bytesWritten': getSize( outputPath, t ) if outputPath != "" else 0,
+            }
+            with self._lock:
+                self.stages.append( s )
+            if self.toolName != "":
+                self.log( name, t )
+
+    def toDict( self ):
+        """Returns the info and the stages, as a dict"""
+        with self._lock:
+            stages = list( self.stages )
+        return {
+            'date': time.strftime( '%Y-%m-%dT%H:%M:%S', time.localtime( self.startTime ) ),
+            'info': self.info,
+            'totalTime': time.time() - self.startTime,
+            'stages': stages,
+        }
+
+    def writeReport( self, filePath ):
+        """Writes the JSON report"""
+        with open( filePath, 'w' ) as f:
+            json.dump( self.toDict(), f, indent=4 )
+
+    def appendHistory( self, historyFile, maxEntries = 1000 ):
+        """Appends the report to a JSON lines file, keeping only the last maxEntries"""
+        lines = []
+        if os.path.isfile( historyFile ):
+            with open( historyFile, 'r' ) as f:
+                lines = [ l for l in f.read().splitlines() if l.strip() != "" ]
+        lines.append( json.dumps( self.toDict() ) )
+        lines = lines[-maxEntries:]
+        tmpFile = historyFile + '.tmp'
+        with open( tmpFile, 'w' ) as f:
+            f.write( "\n".join( lines ) + "\n" )
+        os.replace( tmpFile, historyFile )
+
+    def save( self ):
+        """Writes the report to reportFile and appends it to historyFile, if they're set"""
+        if self.reportFile != "":
+            self.writeReport( self.reportFile )
+        if self.historyFile != "":
+            self.appendHistory( self.historyFile )
@@ -0,0 +1,702 @@
+"""Builds and runs ffmpeg command lines"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Environment variable: the path to the ffmpeg binary, if it's not in the plugin folder
+FFMPEG_VAR = 'DUBLAST_FFMPEG'
+
+# The capabilities of the ffmpeg binaries already probed in this session, by path
+_CAPABILITIES = {}
+
+def getCacheFolder():
+    """The per-user cache folder of DuBlast"""
+    if sys.platform == 'win32':
+        folder = os.environ.get('LOCALAPPDATA', '')
+    elif sys.platform == 'darwin':
+        folder = os.path.expanduser('~/Library/Caches')
+    else:
+        folder = os.environ.get('XDG_CACHE_HOME', '') or os.path.expanduser('~/.cache')
+    if folder == '' or folder.startswith('~'):
+        folder = tempfile.gettempdir()
+    return os.path.join(folder, 'DuBlast')
+
+# The file where the capabilities of the ffmpeg binaries are cached, for the current user
+CAPABILITIES_FILE = os.path.join(getCacheFolder(), 'ffmpeg.json')
+
+# The encoding preset used by default.
+# All presets use intra frames only, so encoded segments can be joined without re-encoding.
+DEFAULT_PRESET = 'review-h264'
+
+PRESETS = {
+    'review-h264': {
+        'label': "H.264 (review)",
+        'description': "Small files which play everywhere.",
+        'encoder': 'libx264',
+        'format': 'mp4',
+        'extension': '.mp4',
+        'videoArgs': [
+            '-c:v', 'h264', # Codec
+            '-level', '3.0', # Compatibility
+            '-crf', '25', # "Bad" quality
+            '-preset', 'ultrafast', # We're in a hurry to playblast!
+            '-tune', 'fastdecode', # It needs to be easy to play
+            '-profile:v', 'baseline', # Compatibility
+            '-x264opts', 'b_pyramid=0', # Needed to decode in Adobe Apps
+            '-pix_fmt', 'yuv420p', # Because ffmpeg does 422 by default, which causes compatibility issues
+            '-g', '1', # Intra frames for frame by frame playback
+        ],
+        'audioArgs': [],
+    },
+    'intra-mjpeg': {
+        'label': "Motion JPEG (scrubbing)",
+        'description': "Fast to encode and to scrub, but bigger files.",
+        'encoder': 'mjpeg',
+        'format': 'mov',
+        'extension': '.mov',
+        'videoArgs': [
+            '-c:v', 'mjpeg',
+            '-q:v', '4',
+            '-pix_fmt', 'yuvj420p',
+        ],
+        'audioArgs': [
+            '-c:a', 'pcm_s16le',
+        ],
+    },
+    'prores-proxy': {
+        'label': "ProRes Proxy",
+        'description': "For editing software.",
+        'encoder': 'prores_ks',
+        'format': 'mov',
+        'extension': '.mov',
+        'videoArgs': [
+            '-c:v', 'prores_ks',
+            '-profile:v', '0', # Proxy
+            '-pix_fmt', 'yuv422p10le',
+        ],
+        'audioArgs': [
+            '-c:a', 'pcm_s16le',
+        ],
+    },
+    'ffv1': {
+        'label': "FFV1 (lossless archive)",
+        'description': "Lossless, for archives.",
+        'encoder': 'ffv1',
+        'format': 'matroska',
+        'extension': '.mkv',
+        'videoArgs': [
+            '-c:v', 'ffv1',
+            '-level', '3',
+            '-g', '1', # Intra frames
+            '-slices', '16', # Multithreaded encoding
+            '-pix_fmt', 'yuv444p', # No chroma subsampling: lossless from the RGB frames
+        ],
+        'audioArgs': [
+            '-c:a', 'flac',
+        ],
+    },
+}
+
+# Segmented encoding: never split the range in segments shorter than this
+SEGMENT_MIN_FRAMES = 100
+# Segmented encoding: number of threads used by each ffmpeg worker
+SEGMENT_THREADS = 4
+
+def getBinaryName(name):
+    """The file name of an executable on this system"""
+    if sys.platform == 'win32':
+        return name + '.exe'
+    return name
+
+def findBinary(name, pluginFolder=''):
+    """Finds an ffmpeg executable (ffmpeg, ffplay, ffprobe):
+    in the plugin folder, then next to the $DUBLAST_FFMPEG binary, then in the PATH.
+    Returns an empty string if it can't be found."""
+    fileName = getBinaryName(name)
+    candidates = []
+    if pluginFolder != '':
+        candidates.append( os.path.join(pluginFolder, fileName) )
+    envFile = os.environ.get(FFMPEG_VAR, '')
+    if envFile != '':
+        if name == 'ffmpeg':
+            candidates.append( envFile )
+        candidates.append( os.path.join(os.path.dirname(envFile), fileName) )
+    for candidate in candidates:
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return shutil.which(fileName) or ''
+
+def _loadCapabilitiesFile():
+    """Reads the capabilities cached on disk, by binary path"""
+    if not os.path.isfile(CAPABILITIES_FILE):
+        return {}
+    try:
+        with open(CAPABILITIES_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _saveCapabilities(ffmpegFile, capabilities):
+    """Updates the capabilities of the binary, in the session and on disk"""
+    _CAPABILITIES[ffmpegFile] = capabilities
+    cached = _loadCapabilitiesFile()
+    cached[ffmpegFile] = capabilities
+    tmpFile = CAPABILITIES_FILE + '.' + str(os.getpid())
+    try:
+        os.makedirs(os.path.dirname(CAPABILITIES_FILE), exist_ok=True)
+        with open(tmpFile, 'w') as f:
+            json.dump(cached, f, indent=4)
+        os.replace(tmpFile, CAPABILITIES_FILE)
+    except OSError:
+        pass
+
+def getBinaryStamp(ffmpegFile):
+    """Identifies a version of the binary, from its modification time and size"""
+    try:
+        stat = os.stat(ffmpegFile)
+    except OSError:
+        return ''
+    return str(stat.st_mtime) + ':' + str(stat.st_size)
+
+def getCapabilities(ffmpegFile):
+    """Probes the encoders and hardware accelerations available in this ffmpeg binary.
+    The result is cached for the session, and on disk until the binary changes.
+    Returns a dict with the 'encoders' and 'hwaccels' lists."""
+    capabilities = _CAPABILITIES.get(ffmpegFile)
+    if capabilities is not None:
+        return capabilities
+
+    stamp = getBinaryStamp(ffmpegFile)
+    capabilities = _loadCapabilitiesFile().get(ffmpegFile)
+    if capabilities is not None and capabilities.get('stamp') == stamp:
+        _CAPABILITIES[ffmpegFile] = capabilities
+        return capabilities
+
+    capabilities = {
+        'stamp': stamp,
+        'encoders': [],
+        'hwaccels': [],
+    }
+    try:
+        output = subprocess.check_output([ffmpegFile, '-hide_banner', '-encoders'], stderr=subprocess.DEVNULL)
+        capabilities['encoders'] = parseEncoders(output.decode('utf-8', 'replace'))
+        output = subprocess.check_output([ffmpegFile, '-hide_banner', '-hwaccels'], stderr=subprocess.DEVNULL)
+        # The first line is a title
+        capabilities['hwaccels'] = [ l.strip() for l in output.decode('utf-8', 'replace').splitlines()[1:] if l.strip() != '' ]
+    except (OSError, subprocess.CalledProcessError):
+        # Don't cache the failure on disk
+        _CAPABILITIES[ffmpegFile] = capabilities
+        return capabilities
+    _saveCapabilities(ffmpegFile, capabilities)
+    return capabilities
+
+def parseEncoders(output):
+    """Lists the encoder names from the output of ffmpeg -encoders"""
+    encoders = []
+    started = False
+    for line in output.splitlines():
+        line = line.strip()
+        # The list starts after a ------ line
+        if line.startswith('---'):
+            started = True
+            continue
+        if not started or line == '':
+            continue
+        words = line.split()
+        if len(words) >= 2:
+            encoders.append(words[1])
+    return encoders
+
+def hasEncoder(ffmpegFile, encoder):
+    """Checks if ffmpeg can use this encoder"""
+    return encoder in getCapabilities(ffmpegFile)['encoders']
+
+def getPreset(name):
+    """Returns the preset, or the default one if it doesn't exist"""
+    return PRESETS.get(name, PRESETS[DEFAULT_PRESET])
+
+def getExtension(name):
+    """The file extension (with the dot) of the files encoded with the preset"""
+    return getPreset(name)['extension']
+
+def getAvailablePresets(encoders):
+    """Lists the names of the presets which can be used with these ffmpeg encoders"""
+    return [ name for name, preset in PRESETS.items() if preset['encoder'] in encoders ]
+
+def getPresetStamp(name):
+    """Identifies the options of the preset, to know if a cached test is still valid"""
+    p = getPreset(name)
+    return ' '.join([p['format']] + p['videoArgs'] + p['audioArgs'])
+
+def testPreset(ffmpegFile, name):
+    """Encodes a couple of synthetic frames with the preset,
+    to check that this ffmpeg accepts all of its options (not only the encoder)."""
+    tempDir = tempfile.mkdtemp()
+    filePath = tempDir + '/test' + getExtension(name)
+    try:
+        process = subprocess.Popen([
+            ffmpegFile,
+            '-loglevel', 'error',
+            '-y',
+            '-f', 'lavfi', '-i', 'testsrc2=size=64x64:rate=24',
+            '-frames:v', '2',
+            ] + getEncodingArgs(filePath, name), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        process.communicate()
+        return process.returncode == 0 and os.path.isfile(filePath)
+    except OSError:
+        return False
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+def canUsePreset(ffmpegFile, name):
+    """Checks if this ffmpeg has the encoder of the preset and accepts its options.
+    The test encode is run once, and cached with the capabilities of the binary."""
+    capabilities = getCapabilities(ffmpegFile)
+    if getPreset(name)['encoder'] not in capabilities['encoders']:
+        return False
+    stamp = getPresetStamp(name)
+    tested = capabilities.get('presets', {}).get(name)
+    if tested is not None and tested.get('stamp') == stamp:
+        return tested['ok']
+    ok = testPreset(ffmpegFile, name)
+    capabilities = dict(capabilities)
+    capabilities['presets'] = dict(capabilities.get('presets', {}))
+    capabilities['presets'][name] = {
+        'stamp': stamp,
+        'ok': ok,
+    }
+    _saveCapabilities(ffmpegFile, capabilities)
+    return ok
+
+def removeOutput(filePath):
+    """Removes the previous version of the output file before encoding,
+    so a failed encoding doesn't leave an old file which looks like the result"""
+    try:
+        os.remove(filePath)
+    except OSError:
+        # Missing, or locked: then ffmpeg will fail too, and report it
+        pass
+
+def getErrorMessage(returnCode, stderr, maxLines=10):
+    """The message reporting a failed ffmpeg process, with the end of its error output"""
+    if isinstance(stderr, bytes):
+        stderr = stderr.decode('utf-8', 'replace')
+    lines = [ l for l in (stderr or '').splitlines() if l.strip() != '' ]
+    message = "ffmpeg failed (exit code " + str(returnCode) + ")"
+    if lines:
+        message = message + ":\n" + "\n".join(lines[-maxLines:])
+    return message
+
+def waitProcess(process):
+    """Waits for the ffmpeg process to finish. Returns its (stdout, stderr) output.
+    Raises a RuntimeError with the end of the error output if it failed."""
+    output = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(getErrorMessage(process.returncode, output[1]))
+    return output
+
+def getSoundArgs(soundFile):
+    """The ffmpeg arguments to add the sound file as the second input"""
+    if soundFile == '':
+        return []
+    return [
+        '-i', soundFile,
+        '-map', '0:v:0', # map video to video
+        '-map', '1:a:0', # map audio to audio
+        '-b:a', '131072', # "Bad" quality
+    ]
+
+def getEncodingArgs(filePath, preset=DEFAULT_PRESET):
+    """The ffmpeg arguments used to encode the playblast to filePath"""
+    p = getPreset(preset)
+    return [ '-f', p['format'] ] + p['videoArgs'] + p['audioArgs'] + [
+        filePath # Output file
+    ]
+
+def getStrideArgs(framerate, stride):
+    """The input framerate and the video filter to hold each input frame for stride frames.
+    Returns (input framerate, filter), the filter is an empty string if stride is 1."""
+    if stride <= 1:
+        return str(framerate), ''
+    return str(framerate / float(stride)), 'fps=' + str(framerate)
+
+def getSequenceArgs(ffmpegFile, imageFile, startFrame, framerate, filePath, soundFile='', frameCount=0, threads=0, preset=DEFAULT_PRESET, stride=1):
+    """The ffmpeg command line to transcode the frame sequence, see encodeSequence.
+    All the inputs come first: the output options placed before an input would apply to that input."""
+    inputFramerate, strideFilter = getStrideArgs(framerate, stride)
+    ffmpegArgs = [
+        ffmpegFile,
+        '-loglevel', 'error', # limit output to errors
+        '-y', # overwrite
+        '-start_number', str(int(startFrame)),
+        '-framerate', inputFramerate,
+        '-i', imageFile.replace('####', "%5d"), # Image file
+    ]
+    ffmpegArgs = ffmpegArgs + getSoundArgs(soundFile)
+    if strideFilter != '':
+        ffmpegArgs = ffmpegArgs + ['-vf', strideFilter]
+    if frameCount > 0:
+        ffmpegArgs = ffmpegArgs + ['-frames:v', str(frameCount * max(1, stride))]
+    if threads > 0:
+        ffmpegArgs = ffmpegArgs + ['-threads', str(threads)]
+    return ffmpegArgs + getEncodingArgs(filePath, preset)
+
+def encodeSequence(ffmpegFile, imageFile, startFrame, framerate, filePath, soundFile='', frameCount=0, threads=0, preset=DEFAULT_PRESET, stride=1):
+    """Launches ffmpeg to transcode the frame sequence. Returns the (running) process.
+    imageFile is the sequence file name with #### for the frame number.
+    With a stride, each image is held for stride frames (animation on twos, fours...)."""
+    ffmpegArgs = getSequenceArgs(ffmpegFile, imageFile, startFrame, framerate, filePath, soundFile, frameCount, threads, preset, stride)
+    removeOutput(filePath)
+    return subprocess.Popen(ffmpegArgs,shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE) # Launch!
+
+def encodeRawStream(ffmpegFile, inputSize, framerate, outputSize, filePath, soundFile='', pixelFormat='rgba', bottomUp=True, preset=DEFAULT_PRESET, stride=1):
+    """Launches ffmpeg to encode raw frames written to its stdin. Returns the (running) process.
+    inputSize and outputSize are (width, height) tuples; bottomUp flips the frames.
+    With a stride, each frame is held for stride frames."""
+    inputFramerate, strideFilter = getStrideArgs(framerate, stride)
+    ffmpegArgs = [
+        ffmpegFile,
+        '-loglevel', 'error', # limit output to errors
+        '-y', # overwrite
+        '-f', 'rawvideo', # Raw frames from stdin
+        '-pix_fmt', pixelFormat,
+        '-s', str(inputSize[0]) + 'x' + str(inputSize[1]),
+        '-framerate', inputFramerate,
+        '-i', '-',
+    ]
+    ffmpegArgs = ffmpegArgs + getSoundArgs(soundFile)
+    videoFilter = 'scale=' + str(outputSize[0]) + ':' + str(outputSize[1])
+    if bottomUp:
+        videoFilter = 'vflip,' + videoFilter
+    if strideFilter != '':
+        videoFilter = videoFilter + ',' + strideFilter
+    ffmpegArgs = ffmpegArgs + [
+        '-vf', videoFilter,
+    ]
+    ffmpegArgs = ffmpegArgs + getEncodingArgs(filePath, preset)
+
+    removeOutput(filePath)
+    return subprocess.Popen(ffmpegArgs, shell=False, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE) # Launch!
+
+def decodeSequence(ffmpegFile, imageFile, startFrame, frameCount, pixelFormat='rgba'):
+    """Launches ffmpeg to decode the frame sequence to raw frames (top row first) on its stdout.
+    Returns the (running) process."""
+    ffmpegArgs = [
+        ffmpegFile,
+        '-loglevel', 'error', # limit output to errors
+        '-start_number', str(int(startFrame)),
+        '-i', imageFile.replace('####', "%5d"), # Image file
+        '-frames:v', str(frameCount),
+        '-f', 'rawvideo',
+        '-pix_fmt', pixelFormat,
+        '-',
+    ]
+    return subprocess.Popen(ffmpegArgs, shell=False, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) # Launch!
+
+def getAudioClip(sound, startTime, endTime):
+    """Computes the part of a sound played between startTime and endTime (in seconds).
+    sound is a dict with the 'file', the 'offset' where it starts in the timeline,
+    and the 'sourceStart' and 'sourceEnd' times to play from the file, in seconds.
+    Returns a (trim start, trim end, delay) tuple in seconds, or None if it's not played."""
+    clipStart = sound['offset']
+    clipEnd = clipStart + sound['sourceEnd'] - sound['sourceStart']
+    if clipEnd <= startTime or clipStart >= endTime:
+        return None
+    trimStart = sound['sourceStart'] + max(0.0, startTime - clipStart)
+    trimEnd = sound['sourceStart'] + min(endTime, clipEnd) - clipStart
+    return (trimStart, trimEnd, max(0.0, clipStart - startTime))
+
+def mixAudio(ffmpegFile, sounds, startTime, endTime, filePath):
+    """Mixes the parts of the sounds played between startTime and endTime (in seconds)
+    to a wav file, with ffmpeg filters. See getAudioClip for the sounds.
+    Returns filePath, or an empty string if no sound is played in this range,
+    or if the sounds can't be mixed: then the playblast is made without sound."""
+    inputArgs = []
+    filters = []
+    for sound in sounds:
+        clip = getAudioClip(sound, startTime, endTime)
+        if clip is None:
+            continue
+        i = len(filters)
+        inputArgs = inputArgs + ['-i', sound['file']]
+        filters.append('[%i:a]atrim=start=%.6f:end=%.6f,asetpts=PTS-STARTPTS,adelay=%i:all=1[a%i]' % (
+            i, clip[0], clip[1], round(clip[2] * 1000), i) )
+    if not filters:
+        return ''
+
+    mix = ''.join( '[a%i]' % i for i in range(len(filters)) )
+    if len(filters) > 1:
+        # Don't scale the inputs down: they're mostly silence padded by adelay
+        mix = mix + 'amix=inputs=%i:duration=longest:normalize=0,' % len(filters)
+    else:
+        mix = mix + 'anull,'
+    # Pad with silence to the full duration
+    filters.append(mix + 'apad[aout]')
+
+    ffmpegArgs = [
+        ffmpegFile,
+        '-loglevel', 'error', # limit output to errors
+        '-y', # overwrite
+    ]
+    ffmpegArgs = ffmpegArgs + inputArgs + [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[aout]',
+        '-t', '%.6f' % (endTime - startTime),
+        '-c:a', 'pcm_s16le',
+        '-ar', '48000',
+        filePath
+    ]
+    process = subprocess.Popen(ffmpegArgs, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, err = process.communicate()
+    if process.returncode != 0:
+        print("Warning: the sound can't be mixed, the playblast has no sound. " + getErrorMessage(process.returncode, err))
+        return ''
+    return filePath
+
+def tileFrames(frames, width, height, columns, rows, bottomUp=True, pixelSize=4):
+    """Tiles raw frames of the same size in a grid, the first frame at the top left.
+    The missing tiles are black. Returns the raw grid frame."""
+    lineSize = width * pixelSize
+    blackLine = bytes(lineSize)
+    gridRows = range(rows)
+    if bottomUp:
+        # The last row of tiles comes first
+        gridRows = reversed(gridRows)
+    lines = []
+    for gridRow in gridRows:
+        tiles = []
+        for column in range(columns):
+            i = gridRow * columns + column
+            tiles.append(frames[i] if i < len(frames) else None)
+        for y in range(height):
+            start = y * lineSize
+            for tile in tiles:
+                if tile is None:
+                    lines.append(blackLine)
+                else:
+                    lines.append(tile[start:start+lineSize])
+    return b''.join(lines)
+
+def concatSegments(ffmpegFile, segmentFiles, filePath, soundFile='', preset=DEFAULT_PRESET):
+    """Joins the video segments without re-encoding them.
+    That's safe because all frames are intra frames.
+    Raises a RuntimeError if ffmpeg fails, see waitProcess."""
+    listFile = os.path.splitext(segmentFiles[0])[0] + '_concat.txt'
+    with open(listFile, 'w') as f:
+        for segmentFile in segmentFiles:
+            f.write("file '" + segmentFile.replace('\\', '/') + "'\n")
+
+    ffmpegArgs = [
+        ffmpegFile,
+        '-loglevel', 'error', # limit output to errors
+        '-y', # overwrite
+        '-f', 'concat',
+        '-safe', '0', # Absolute paths in the list
+        '-i', listFile,
+    ]
+    ffmpegArgs = ffmpegArgs + getSoundArgs(soundFile)
+    p = getPreset(preset)
+    ffmpegArgs = ffmpegArgs + [
+        '-c:v', 'copy', # Already encoded
+        '-f', p['format'],
+    ] + p['audioArgs'] + [
+        filePath
+    ]
+    removeOutput(filePath)
+    ffmpegProcess = subprocess.Popen(ffmpegArgs,shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE) # Launch!
+    return waitProcess(ffmpegProcess)
+
+def getSegmentCount(frameCount, cpuCount=None):
+    """How many segments to encode in parallel for this number of frames.
+    Returns 1 if the range is too short to be worth splitting."""
+    if cpuCount is None:
+        cpuCount = os.cpu_count() or 1
+    numWorkers = max(1, cpuCount // SEGMENT_THREADS)
+    return max(1, min(numWorkers, frameCount // SEGMENT_MIN_FRAMES))
+
+def splitRange(startFrame, endFrame, numSegments):
+    """Splits the frame range in numSegments (start, end) ranges of (nearly) the same length"""
+    frameCount = endFrame - startFrame + 1
+    numSegments = max(1, min(numSegments, frameCount))
+    ranges = []
+    start = startFrame
+    for i in range(numSegments):
+        length = frameCount // numSegments
+        if i < frameCount % numSegments:
+            length = length + 1
+        ranges.append((start, start + length - 1))
+        start = start + length
+    return ranges
+
+def encodeSegmented(ffmpegFile, imageFile, startFrame, endFrame, framerate, filePath, soundFile='', numSegments=0, segmentDir=None, preset=DEFAULT_PRESET, stride=1):
+    """Encodes the frame sequence in segments, with one ffmpeg worker per segment,
+    and joins them with the concat demuxer.
+    If numSegments is 0, it is chosen from the number of frames and CPU cores.
+    The segments are written in segmentDir, by default next to the frames.
+    With a stride, each image is held for stride frames, see encodeSequence.
+    Returns the ffmpeg output of the last step; raises a RuntimeError if a step fails."""
+    frameCount = endFrame - startFrame + 1
+    if numSegments <= 0:
+        numSegments = getSegmentCount(frameCount)
+
+    if numSegments == 1:
+        # Older frames may follow the range when the folder is reused
+        return waitProcess(encodeSequence(ffmpegFile, imageFile, startFrame, framerate, filePath, soundFile, frameCount, preset=preset, stride=stride))
+
+    cpuCount = os.cpu_count() or 1
+    threads = max(1, cpuCount // numSegments)
+    if segmentDir is None:
+        segmentDir = os.path.dirname(imageFile)
+
+    def encodeSegment(i, segmentRange):
+        segmentFile = segmentDir + '/' + 'segment' + str(i).zfill(5) + getExtension(preset)
+        process = encodeSequence(
+            ffmpegFile,
+            imageFile,
+            segmentRange[0],
+            framerate,
+            segmentFile,
+            frameCount=segmentRange[1] - segmentRange[0] + 1,
+            threads=threads,
+            preset=preset,
+            stride=stride
+            )
+        waitProcess(process)
+        return segmentFile
+
+    ranges = splitRange(startFrame, endFrame, numSegments)
+    # The threads are only waiting for the ffmpeg processes
+    with ThreadPoolExecutor(max_workers=numSegments) as pool:
+        segmentFiles = list(pool.map(encodeSegment, range(len(ranges)), ranges))
+
+    return concatSegments(ffmpegFile, segmentFiles, filePath, soundFile, preset)
+
+def benchmarkSegmented(ffmpegFile, lengths=(100, 500, 1000, 3000), size='960x540', framerate=24):
+    """Compares the single process encoding with the segmented one.
+    Encodes a synthetic jpg sequence for each length and prints the timings.
+    Returns a list of (length, single time, segmented time, number of segments)."""
+    tempDir = tempfile.mkdtemp()
+    imageFile = tempDir + '/' + 'bench.####.jpg'
+    results = []
+    try:
+        # Generate the longest sequence once
+        subprocess.check_call([
+            ffmpegFile,
+            '-loglevel', 'error',
+            '-f', 'lavfi',
+            '-i', 'testsrc2=size=' + size + ':rate=' + str(framerate),
+            '-frames:v', str(max(lengths)),
+            '-q:v', '5',
+            '-start_number', '1',
+            imageFile.replace('####', '%5d')
+            ])
+
+        for length in lengths:
+            singleFile = tempDir + '/single.mp4'
+            t = time.time()
+            encodeSequence(ffmpegFile, imageFile, 1, framerate, singleFile, frameCount=length).communicate()
+            singleTime = time.time() - t
+
+            segmentedFile = tempDir + '/segmented.mp4'
+            numSegments = max(2, getSegmentCount(length))
+            t = time.time()
+            encodeSegmented(ffmpegFile, imageFile, 1, length, framerate, segmentedFile, numSegments=numSegments)
+            segmentedTime = time.time() - t
+
+            print("%5i frames: single %6.2f s, %2i segments %6.2f s (x%.2f)" % (
+                length, singleTime, numSegments, segmentedTime, singleTime / segmentedTime) )
+            results.append((length, singleTime, segmentedTime, numSegments))
+    finally:
+        shutil.rmtree(tempDir)
+
+    return results
+
+def measureSSIM(ffmpegFile, filePath, source, frameCount):
+    """Compares the encoded file with the lavfi source it was encoded from.
+    Returns the mean SSIM (1.0 is lossless), or 0.0 if it can't be measured."""
+    process = subprocess.Popen([
+        ffmpegFile,
+        '-hide_banner', '-nostats',
+        '-i', filePath,
+        '-f', 'lavfi', '-i', source,
+        # Output options, after all the inputs
+        '-frames:v', str(frameCount),
+        '-lavfi', '[0:v]format=yuv444p[a];[1:v]format=yuv444p[b];[a][b]ssim',
+        '-f', 'null', '-'
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, err = process.communicate()
+    match = re.search(r'All:([0-9.]+)', err.decode('utf-8', 'replace'))
+    if match is None:
+        return 0.0
+    return float(match.group(1))
+
+def benchmarkPresets(ffmpegFile, names=None, size='960x540', frameCount=48, framerate=24):
+    """Encodes a synthetic clip with each preset available in this ffmpeg.
+    Returns a dict with the encoding 'time', the 'ssim' and the file 'size' for each preset name;
+    the presets which fail to encode, or whose quality can't be measured, are not listed."""
+    if names is None:
+        names = getAvailablePresets(getCapabilities(ffmpegFile)['encoders'])
+    source = 'testsrc2=size=' + size + ':rate=' + str(framerate)
+    tempDir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for name in names:
+            filePath = tempDir + '/bench' + getExtension(name)
+            ffmpegArgs = [
+                ffmpegFile,
+                '-loglevel', 'error',
+                '-y',
+                '-f', 'lavfi', '-i', source,
+                '-frames:v', str(frameCount),
+            ] + getEncodingArgs(filePath, name)
+            t = time.time()
+            process = subprocess.Popen(ffmpegArgs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            process.communicate()
+            encodingTime = time.time() - t
+            if process.returncode != 0 or not os.path.isfile(filePath):
+                continue
+            ssim = measureSSIM(ffmpegFile, filePath, source, frameCount)
+            if ssim <= 0.0:
+                # The quality can't be measured, don't rank this preset
+                continue
+            results[name] = {
+                'time': encodingTime,
+                'ssim': ssim,
+                'size': os.path.getsize(filePath),
+            }
+            print("%-14s %6.2f s, SSIM %.4f, %8i KB" % (
+                name, encodingTime, results[name]['ssim'], results[name]['size'] // 1024) )
+    finally:
+        shutil.rmtree(tempDir)
+    return results
+
+def selectFastestPreset(ffmpegFile, qualityFloor=0.95, refresh=False):
+    """Returns the name of the fastest preset on this machine with an SSIM above qualityFloor.
+    The benchmark is run once, and cached with the capabilities of the binary."""
+    capabilities = getCapabilities(ffmpegFile)
+    benchmark = capabilities.get('benchmark')
+    # Older versions could cache a benchmark without any quality measured
+    if not benchmark or refresh or not any( result['ssim'] > 0.0 for result in benchmark.values() ):
+        benchmark = benchmarkPresets(ffmpegFile)
+        # Don't cache a failed benchmark, try again next time
+        if benchmark:
+            capabilities = dict(capabilities)
+            capabilities['benchmark'] = benchmark
+            _saveCapabilities(ffmpegFile, capabilities)
+    candidates = [ (result['time'], name) for name, result in benchmark.items() if result['ssim'] >= qualityFloor ]
+    if not candidates:
+        return DEFAULT_PRESET
+    return min(candidates)[1]
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[2] == 'presets':
+        print( "Fastest: " + selectFastestPreset( sys.argv[1], refresh=True ) )
+    else:
+        benchmarkSegmented( sys.argv[1] if len(sys.argv) > 1 else 'ffmpeg' )
@@ -0,0 +1,132 @@
+"""A persistent cache of rendered frames, to re-render only what has changed"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+def hashFile(filePath):
+    """Returns the sha1 of the file contents"""
+    h = hashlib.sha1()
+    with open(filePath, 'rb') as f:
+        for block in iter(lambda: f.read(1048576), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def changedRange(oldKeys, newKeys, startFrame, endFrame):
+    """Returns the (start, end) range affected by the differences
+    between two lists of keys, or None if they're the same.
+    The keys are tuples starting with the time; the range extends to the
+    neighbouring keys, as they're interpolated with the changed ones."""
+    changed = set(oldKeys).symmetric_difference(newKeys)
+    if not changed:
+        return None
+    changedTimes = [ k[0] for k in changed ]
+    first = min(changedTimes)
+    last = max(changedTimes)
+    allTimes = [ k[0] for k in oldKeys ] + [ k[0] for k in newKeys ]
+    before = [ t for t in allTimes if t < first ]
+    after = [ t for t in allTimes if t > last ]
+    # Before the first key and after the last one, the curve is extrapolated
+    rangeStart = max(before) if before else startFrame
+    rangeEnd = min(after) if after else endFrame
+    return (max(startFrame, rangeStart), min(endFrame, rangeEnd))
+
+class FrameCache():
+    """The frames rendered for a given key (scene, camera, options...).
+    A manifest stores the content hash of each frame,
+    and the signature of the animation when it was rendered."""
+
+    def __init__(self, key, rootDir=None):
+        if rootDir is None:
+            rootDir = tempfile.gettempdir() + '/dublast_cache'
+        self.key = key
+        self.folder = rootDir + '/' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+        self.imageFile = self.folder + '/' + 'dublast'
+        self._manifestFile = self.folder + '/' + 'manifest.json'
+        self._frames = {}
+        self._curves = {}
+        self.load()
+
+    def load(self):
+        """Reads the manifest"""
+        if not os.path.isfile(self._manifestFile):
+            return
+        try:
+            with open(self._manifestFile, 'r') as f:
+                manifest = json.load(f)
+        except ValueError:
+            return
+        if manifest.get('key') != self.key:
+            return
+        self._frames = manifest.get('frames', {})
+        self._curves = { c: [ tuple(k) for k in keys ] for c, keys in manifest.get('curves', {}).items() }
+
+    def save(self):
+        """Writes the manifest"""
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        with open(self._manifestFile, 'w') as f:
+            json.dump({
+                'key': self.key,
+                'frames': self._frames,
+                'curves': self._curves
+                }, f)
+
+    def framePath(self, frame):
+        """The file of a frame"""
+        return self.imageFile + '.' + str(int(frame)).zfill(5) + '.jpg'
+
+    def isValid(self, frame):
+        """Checks if the frame is in the cache and its file has not been altered"""
+        info = self._frames.get(str(int(frame)))
+        if info is None:
+            return False
+        filePath = self.framePath(frame)
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            return False
+        if stat.st_size == info['size'] and stat.st_mtime == info['mtime']:
+            return True
+        # The file was touched, check its content
+        return hashFile(filePath) == info['hash']
+
+    def dirtyFrames(self, startFrame, endFrame, curves, frames=()):
+        """Lists the frames to render again:
+        the ones missing from the cache, the ones affected by the
+        animation curves changes, and the given frames."""
+        dirty = set( int(f) for f in frames )
+        for curve in set(curves).union(self._curves):
+            r = changedRange(self._curves.get(curve, []), curves.get(curve, []), startFrame, endFrame)
+            if r is not None:
+                dirty.update( range(int(r[0]), int(r[1]) + 1) )
+        for frame in range(startFrame, endFrame + 1):
+            if frame not in dirty and not self.isValid(frame):
+                dirty.add(frame)
+        return sorted( f for f in dirty if startFrame <= f <= endFrame )
+
+    def update(self, frames, curves):
+        """Stores the hashes of the (re-)rendered frames and the new animation signature.
+        The cached frames affected by the animation changes which were not rendered again
+        (outside of the blasted range) are dropped, as the new signature doesn't match them anymore."""
+        rendered = set( int(f) for f in frames )
+        for curve in set(curves).union(self._curves):
+            r = changedRange(self._curves.get(curve, []), curves.get(curve, []), float('-inf'), float('inf'))
+            if r is None:
+                continue
+            for key in list(self._frames):
+                if r[0] <= int(key) <= r[1] and int(key) not in rendered:
+                    del self._frames[key]
+        for frame in frames:
+            filePath = self.framePath(frame)
+            if not os.path.isfile(filePath):
+                continue
+            stat = os.stat(filePath)
+            self._frames[str(int(frame))] = {
+                'hash': hashFile(filePath),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+            }
+        self._curves = dict(curves)
+        self.save()
@@ -0,0 +1,286 @@
+"""Chooses where to write the temporary frames: in RAM, on a fast drive, or in the temp folder"""
+
+import os
+import sys
+import time
+import shutil
+import getpass
+import tempfile
+import threading
+
+# Environment variable: a folder on a fast local drive (SSD) for the temporary frames
+FAST_DIR_VAR = 'DUBLAST_STAGING_DIR'
+# Environment variable: the maximum memory to use for the temporary frames, in MB
+MEMORY_BUDGET_VAR = 'DUBLAST_MEMORY_BUDGET'
+
+# The RAM-backed folder (tmpfs)
+RAM_DIR = '/dev/shm'
+# The part of the available memory which can be used when there's no budget set
+MEMORY_BUDGET_RATIO = 0.25
+# The average size of a playblast jpg frame, in bytes per pixel
+JPG_BYTES_PER_PIXEL = 1.5
+# Always keep this free space on the drives, in bytes
+MIN_FREE_SPACE = 1024 * 1024 * 1024
+
+# The maximum size of a staging pool on disk, in bytes, before evicting the old slots
+POOL_MAX_SIZE = 4 * 1024 * 1024 * 1024
+# The file locking a slot
+LOCK_FILE = '.lock'
+# Locks older than this are ignored, in seconds
+STALE_LOCK_TIME = 12 * 3600
+
+# The backends, from the fastest
+BACKENDS = ('ram', 'fast', 'temp')
+
+def estimateBytes(width, height, frameCount, bytesPerPixel=JPG_BYTES_PER_PIXEL):
+    """Estimates the size of the temporary frames"""
+    return int(width * height * frameCount * bytesPerPixel)
+
+def getAvailableMemory():
+    """The memory available for new data, in bytes, or 0 if it can't be read"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def getMemoryBudget():
+    """The maximum memory to use for the temporary frames, in bytes:
+    $DUBLAST_MEMORY_BUDGET (in MB), or a part of the available memory."""
+    budget = os.environ.get(MEMORY_BUDGET_VAR, '')
+    if budget != '':
+        try:
+            return int(float(budget) * 1024 * 1024)
+        except ValueError:
+            pass
+    return int(getAvailableMemory() * MEMORY_BUDGET_RATIO)
+
+def getFreeSpace(folder):
+    """The free space on the drive of the folder, in bytes, or 0 if it doesn't exist"""
+    try:
+        return shutil.disk_usage(folder).free
+    except OSError:
+        return 0
+
+def getBackendFolder(backend):
+    """The root folder of the backend, or an empty string if it's not available on this system"""
+    if backend == 'ram':
+        if os.path.isdir(RAM_DIR) and os.access(RAM_DIR, os.W_OK):
+            return RAM_DIR
+        return ''
+    if backend == 'fast':
+        folder = os.environ.get(FAST_DIR_VAR, '')
+        if folder != '' and os.path.isdir(folder) and os.access(folder, os.W_OK):
+            return folder
+        return ''
+    return tempfile.gettempdir()
+
+def selectBackend(estimatedBytes, memoryBudget=None, backend='auto'):
+    """Selects the fastest backend with enough room for the frames.
+    The RAM is used only if the frames fit in the memoryBudget (see getMemoryBudget).
+    If backend is set (not 'auto'), it is used if it's available,
+    otherwise the next ones are tried.
+    Returns (backend name, root folder)."""
+    if memoryBudget is None:
+        memoryBudget = getMemoryBudget()
+    backends = BACKENDS
+    if backend in BACKENDS:
+        backends = BACKENDS[BACKENDS.index(backend):]
+
+    for b in backends:
+        folder = getBackendFolder(b)
+        if folder == '':
+            continue
+        if b == 'temp':
+            return b, folder
+        free = getFreeSpace(folder)
+        if b == 'ram':
+            # tmpfs may be smaller than the budget
+            if estimatedBytes > min(memoryBudget, free):
+                continue
+        elif free - estimatedBytes < MIN_FREE_SPACE:
+            continue
+        return b, folder
+    return 'temp', tempfile.gettempdir()
+
+def getUserName():
+    """The name of the current user, to separate the staging pools"""
+    try:
+        return getpass.getuser()
+    except Exception: # pylint: disable=broad-except
+        return 'user'
+
+def isProcessAlive(pid):
+    """Checks if a process is running. Always True on Windows, where it can't be checked safely."""
+    if sys.platform == 'win32':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+def lockFolder(folder):
+    """Atomically locks a folder for this process. Returns False if it's already locked.
+    Locks of dead processes, or older than STALE_LOCK_TIME, are ignored."""
+    lockFile = os.path.join(folder, LOCK_FILE)
+    for _ in range(2):
+        try:
+            fd = os.open(lockFile, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not isLockStale(lockFile):
+                return False
+            try:
+                os.remove(lockFile)
+            except OSError:
+                return False
+            continue
+        except OSError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+def isLockStale(lockFile):
+    """Checks if the process which locked a folder is gone"""
+    try:
+        if time.time() - os.path.getmtime(lockFile) > STALE_LOCK_TIME:
+            return True
+        with open(lockFile, 'r') as f:
+            pid = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return False
+    return pid > 0 and not isProcessAlive(pid)
+
+def unlockFolder(folder):
+    """Removes the lock, and marks the folder as used now"""
+    try:
+        os.remove(os.path.join(folder, LOCK_FILE))
+    except OSError:
+        pass
+    try:
+        os.utime(folder, None)
+    except OSError:
+        pass
+
+def evictLRU(rootDir, maxSize, lock=True, keep=()):
+    """Removes the least recently used sub-folders of rootDir
+    until their total size is below maxSize (in bytes).
+    If lock is True, only the folders which can be locked are removed.
+    The folders in keep are never removed. Returns the number of bytes freed."""
+    try:
+        names = os.listdir(rootDir)
+    except OSError:
+        return 0
+    folders = []
+    for name in names:
+        folder = os.path.join(rootDir, name)
+        if not os.path.isdir(folder):
+            continue
+        try:
+            mtime = os.path.getmtime(folder)
+        except OSError:
+            continue
+        folders.append( (mtime, folder, getFolderSize(folder)) )
+    total = sum( f[2] for f in folders )
+
+    freed = 0
+    # Oldest first
+    for _, folder, size in sorted(folders):
+        if total <= maxSize:
+            break
+        if os.path.normpath(folder) in [ os.path.normpath(k) for k in keep ]:
+            continue
+        if lock and not lockFolder(folder):
+            continue
+        shutil.rmtree(folder, ignore_errors=True)
+        total = total - size
+        freed = freed + size
+    return freed
+
+def evictInBackground(rootDir, maxSize, lock=True, keep=()):
+    """Runs evictLRU in a thread. Returns the thread."""
+    thread = threading.Thread(target=evictLRU, args=(rootDir, maxSize, lock, keep))
+    thread.daemon = True
+    thread.start()
+    return thread
+
+def getFolderSize(folder):
+    """The size in bytes of all the files in a folder"""
+    size = 0
+    for root, _, files in os.walk(folder):
+        for f in files:
+            try:
+                size = size + os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return size
+
+class StagingPool():
+    """Persistent, per-user folders (slots) for the temporary frames.
+    The slots are reused from one blast to the next: the frames are overwritten
+    instead of being removed, and the free slots are evicted in the background,
+    least recently used first, when the pool exceeds maxSize bytes."""
+
+    def __init__(self, folder, maxSize=POOL_MAX_SIZE):
+        self.folder = folder
+        self.maxSize = maxSize
+
+    def acquire(self):
+        """Locks a free slot, the most recently used if possible, or creates a new one.
+        Returns the slot folder."""
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder, exist_ok=True)
+        slots = []
+        for name in os.listdir(self.folder):
+            folder = os.path.join(self.folder, name)
+            if name.startswith('slot') and os.path.isdir(folder):
+                slots.append( (os.path.getmtime(folder), folder) )
+        # The most recent one is probably still in the OS file cache
+        for _, folder in sorted(slots, reverse=True):
+            if lockFolder(folder):
+                return folder
+        i = len(slots)
+        while True:
+            folder = os.path.join(self.folder, 'slot' + str(i).zfill(3))
+            try:
+                os.makedirs(folder)
+            except OSError:
+                i = i + 1
+                continue
+            if lockFolder(folder):
+                return folder
+            i = i + 1
+
+    def release(self, slot):
+        """Frees the slot, and evicts the old slots in the background"""
+        unlockFolder(slot)
+        self.cleanup()
+
+    def cleanup(self, wait=False):
+        """Evicts the least recently used slots above the size cap, in a thread"""
+        thread = evictInBackground(self.folder, self.maxSize)
+        if wait:
+            thread.join()
+        return thread
+
+def isRAMFolder(folder):
+    """Checks if the folder is in RAM"""
+    return os.path.normpath(folder).startswith(os.path.normpath(RAM_DIR) + os.sep)
+
+def getPool(rootFolder):
+    """The staging pool of the current user in the root folder of a backend.
+    Frames are never kept in RAM after a blast."""
+    folder = os.path.join(rootFolder, 'dublast_' + getUserName())
+    return StagingPool(folder, 0 if isRAMFolder(folder) else POOL_MAX_SIZE)
+
+def releaseSlot(slot):
+    """Frees a slot acquired from a StagingPool, and cleans its pool up in the background"""
+    pool = os.path.dirname(os.path.normpath(slot))
+    StagingPool(pool, 0 if isRAMFolder(pool) else POOL_MAX_SIZE).release(slot)
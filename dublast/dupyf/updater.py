@@ -5,10 +5,15 @@ from urllib.parse import quote
 from urllib.request import urlopen
 from json import loads
 import platform
+import socket
 import ssl
 
-def checkUpdate(url, toolName, version, host, hostVersion, preRelease = False, language = "en"):
-    """Checks if an update is available"""
+# Maximum time to wait for the server, in seconds
+TIMEOUT = 5
+
+def checkUpdate(url, toolName, version, host, hostVersion, preRelease = False, language = "en", timeout = TIMEOUT):
+    """Checks if an update is available.
+    Returns the info from the server, or None if it can't be reached."""
 
     # Check os
     os  = platform.system()
@@ -33,11 +38,17 @@ def checkUpdate(url, toolName, version, host, hostVersion, preRelease = False, l
     if preRelease:
         args["preRelease"] = ""
 
-    response = request(url, args, False)
-    return loads(response.read())
+    response = request(url, args, False, timeout)
+    if response == "":
+        return None
+    try:
+        return loads(response.read())
+    except (socket.timeout, OSError, ValueError):
+        return None
 
-def request(url, args=None, secured=True):
-    """Builds a GET request with the args"""
+def request(url, args=None, secured=True, timeout = TIMEOUT):
+    """Builds a GET request with the args.
+    Returns an empty string if the server can't be reached in time."""
 
     response = ""
 
@@ -54,11 +65,21 @@ def request(url, args=None, secured=True):
             if val != "":
                 url = url + '=' + quote(val, safe='')
     try:
-        response = urlopen(url)
-    except URLError:
-        if not secured:
+        response = urlopen(url, timeout=timeout)
+    except socket.timeout:
+        # Don't try again, we're offline or throttled
+        pass
+    except URLError as e:
+        # Retry without verification only if the certificate is the issue
+        if not secured and isinstance(e.reason, (ssl.SSLError, ssl.CertificateError)):
             sslContext = ssl._create_unverified_context()
-            response = urlopen(url, context=sslContext)
+            try:
+                response = urlopen(url, context=sslContext, timeout=timeout)
+            except OSError:
+                pass
+    except OSError:
+        # Connection reset, refused...
+        pass
 
     return response
 
@@ -0,0 +1,302 @@
+"""
+Playblasts a list of scenes in parallel, in a pool of mayapy worker processes.
+
+Usage:
+    python dublast/farm.py [farm options] [dublast.batch options] scene1.mb scene2.mb...
+
+Each worker opens one scene, playblasts it with the dublast.batch options,
+and writes a JSON result (timings, output path, frame count).
+Crashed workers are retried. With --fake, the workers use a stand-in for
+maya.cmds, so the scheduler can be load-tested without Maya.
+"""
+
+#====================== BEGIN GPL LICENSE BLOCK ======================
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either VERSION 3
+#  of the License, or (at your option) any later VERSION.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#======================= END GPL LICENSE BLOCK ========================
+
+# Note: this file must not import the dublast package at the top,
+# the scheduler and the fake workers run without Maya.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import traceback
+import subprocess
+from collections import deque
+
+# How often the scheduler checks the workers, in seconds
+POLL_INTERVAL = 0.1
+
+class FakeCmds():
+    """A stand-in for maya.cmds, with just what the farm workers use.
+    Opening a scene and rendering frames only take some time,
+    and the worker may crash, to load-test the scheduler."""
+
+    def __init__(self, frameCount=100, frameTime=0.01, openTime=0.5, crashRate=0.0):
+        self.frameCount = frameCount
+        self.frameTime = frameTime
+        self.openTime = openTime
+        self.crashRate = crashRate
+
+    def file(self, *args, **kwargs): # pylint: disable=unused-argument
+        """Opens a scene"""
+        time.sleep(self.openTime)
+
+    def playbackOptions(self, **kwargs):
+        """Returns the playback range"""
+        if kwargs.get('minTime'):
+            return 1.0
+        if kwargs.get('maxTime'):
+            return float(self.frameCount)
+        return None
+
+    def playblast(self, filename='', startTime=1, endTime=1, **kwargs): # pylint: disable=unused-argument
+        """Renders the frames"""
+        for _ in range(int(startTime), int(endTime) + 1):
+            if random.random() < self.crashRate / self.frameCount:
+                # Like Maya, don't clean anything up
+                os._exit(3) # pylint: disable=protected-access
+            time.sleep(self.frameTime)
+        return filename
+
+    def blast(self, scene, outputDir=''):
+        """Stands in for dublast.batch.blastCurrentScene"""
+        startFrame = int(self.playbackOptions(minTime=True))
+        endFrame = int(self.playbackOptions(maxTime=True))
+        if outputDir == '':
+            outputDir = os.path.dirname(os.path.abspath(scene))
+        filePath = outputDir + '/' + os.path.splitext(os.path.basename(scene))[0] + '.mp4'
+        self.playblast(filename=filePath, startTime=startFrame, endTime=endFrame)
+        return {
+            'playblast': filePath,
+            'thumbnail': '',
+            'frameCount': endFrame - startFrame + 1,
+        }
+
+def runWorker(scene, resultFile, cmds, blastCurrentScene):
+    """Opens the scene, runs blastCurrentScene() and writes the JSON result.
+    Returns the exit code of the worker"""
+    result = {
+        'scene': scene,
+        'success': False,
+        'playblast': '',
+        'frameCount': 0,
+        'openTime': 0.0,
+        'blastTime': 0.0,
+        'totalTime': 0.0,
+        'error': '',
+    }
+    startTime = time.time()
+    try:
+        t = time.time()
+        cmds.file(scene, open=True, force=True, prompt=False)
+        result['openTime'] = time.time() - t
+
+        t = time.time()
+        blastResult = blastCurrentScene()
+        result['blastTime'] = time.time() - t
+
+        result['playblast'] = blastResult['playblast']
+        result['frameCount'] = blastResult['frameCount']
+        result['success'] = True
+    except Exception: # pylint: disable=broad-except
+        result['error'] = traceback.format_exc()
+    result['totalTime'] = time.time() - startTime
+
+    with open(resultFile, 'w') as f:
+        json.dump(result, f, indent=4)
+
+    return 0 if result['success'] else 1
+
+def workerMain(options, batchArgs):
+    """The worker process entry point"""
+    if options.fake:
+        cmds = FakeCmds(options.fake_frames, options.fake_frame_time, options.fake_open_time, options.fake_crash_rate)
+        return runWorker(options.scene, options.result, cmds, lambda: cmds.blast(options.scene))
+
+    # The folder containing the dublast package
+    sys.path.insert(0, os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) ) )
+    import maya.standalone # pylint: disable=import-error,import-outside-toplevel
+    maya.standalone.initialize(name='python')
+    try:
+        from maya import cmds # pylint: disable=import-error,import-outside-toplevel
+        from dublast import batch # pylint: disable=import-outside-toplevel
+        batchOptions = batch.getArgParser().parse_args(batchArgs + [options.scene])
+        return runWorker(options.scene, options.result, cmds, lambda: batch.blastCurrentScene(options.scene, batchOptions))
+    finally:
+        maya.standalone.uninitialize()
+
+class FarmJob():
+    """A scene to playblast, and its worker process"""
+
+    def __init__(self, scene, resultFile):
+        self.scene = scene
+        self.resultFile = resultFile
+        self.attempts = 0
+        self.process = None
+        self.result = None
+        self.crashed = False
+
+    def start(self, workerArgs):
+        """Launches the worker process"""
+        self.attempts = self.attempts + 1
+        if os.path.isfile(self.resultFile):
+            os.remove(self.resultFile)
+        self.process = subprocess.Popen(
+            workerArgs + ['--result', self.resultFile, self.scene],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+            )
+
+    def finish(self):
+        """Reads the result of the worker once it has exited.
+        Returns True if the scene was playblasted; crashed is set if the worker didn't write its result."""
+        result = None
+        if os.path.isfile(self.resultFile):
+            try:
+                with open(self.resultFile, 'r') as f:
+                    result = json.load(f)
+            except ValueError:
+                result = None
+        self.crashed = result is None
+        if result is None:
+            result = {
+                'scene': self.scene,
+                'success': False,
+                'error': "The worker crashed (exit code " + str(self.process.returncode) + ")",
+            }
+        result['attempts'] = self.attempts
+        result['returnCode'] = self.process.returncode
+        self.result = result
+        self.process = None
+        return result['success']
+
+def runFarm(scenes, workerArgs, maxWorkers=2, retries=1, resultsDir=''):
+    """Runs the workers for all the scenes, at most maxWorkers at once.
+    Crashed workers are retried up to retries times; the scenes which failed cleanly
+    (a broken scene, a missing camera...) would fail again, they're not retried.
+    Returns the summary, also written to resultsDir/farm.json"""
+    if resultsDir == '':
+        resultsDir = tempfile.mkdtemp(prefix='dublast_farm_')
+    if not os.path.isdir(resultsDir):
+        os.makedirs(resultsDir)
+
+    startTime = time.time()
+    pending = deque()
+    for i, scene in enumerate(scenes):
+        resultFile = resultsDir + '/' + str(i).zfill(4) + '_' + os.path.splitext(os.path.basename(scene))[0] + '.json'
+        pending.append( FarmJob(scene, resultFile) )
+    running = []
+    finished = []
+
+    while pending or running:
+        while pending and len(running) < maxWorkers:
+            job = pending.popleft()
+            job.start(workerArgs)
+            running.append(job)
+
+        for job in list(running):
+            if job.process.poll() is None:
+                continue
+            running.remove(job)
+            if job.finish():
+                print("Done: " + job.scene + " (" + str(job.result['frameCount']) + " frames, %.2f s)" % job.result['totalTime'])
+                finished.append(job)
+            elif job.crashed and job.attempts <= retries:
+                print("Retrying: " + job.scene)
+                pending.append(job)
+            else:
+                print("Failed: " + job.scene)
+                finished.append(job)
+
+        time.sleep(POLL_INTERVAL)
+
+    summary = {
+        'totalTime': time.time() - startTime,
+        'maxWorkers': maxWorkers,
+        'succeeded': len([ job for job in finished if job.result['success'] ]),
+        'failed': len([ job for job in finished if not job.result['success'] ]),
+        'jobs': [ job.result for job in finished ],
+    }
+    with open(resultsDir + '/farm.json', 'w') as f:
+        json.dump(summary, f, indent=4)
+
+    print("%i scenes playblasted, %i failed, in %.2f s. Results in %s" % (
+        summary['succeeded'], summary['failed'], summary['totalTime'], resultsDir) )
+    return summary
+
+def getArgParser():
+    """The command line arguments of the scheduler and of the workers.
+    The other arguments are passed to dublast.batch in the workers."""
+    parser = argparse.ArgumentParser(prog='dublast.farm', description="Playblasts Maya scenes in parallel mayapy processes.")
+    parser.add_argument('-j', '--workers', type=int, default=max(1, (os.cpu_count() or 1) // 8), help="How many scenes to playblast at once")
+    parser.add_argument('-r', '--retries', type=int, default=1, help="How many times to retry a crashed worker")
+    parser.add_argument('--mayapy', default='mayapy', help="The mayapy executable")
+    parser.add_argument('--results-dir', default='', help="Where to write the JSON results")
+    parser.add_argument('--fake', action='store_true', help="Use a stand-in for maya.cmds, to test the scheduler without Maya")
+    parser.add_argument('--fake-frames', type=int, default=100, help="Fake mode: the number of frames per scene")
+    parser.add_argument('--fake-frame-time', type=float, default=0.01, help="Fake mode: the time to render a frame")
+    parser.add_argument('--fake-open-time', type=float, default=0.5, help="Fake mode: the time to open a scene")
+    parser.add_argument('--fake-crash-rate', type=float, default=0.0, help="Fake mode: the probability a worker crashes")
+    # Internal, used to launch the workers
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--result', default='', help=argparse.SUPPRESS)
+    return parser
+
+def main(argv=None):
+    """Runs the farm or a worker from the command line"""
+    parser = getArgParser()
+    options, otherArgs = parser.parse_known_args(argv)
+
+    if options.worker:
+        # The scene is the last argument
+        options.scene = otherArgs.pop()
+        return workerMain(options, otherArgs)
+
+    # Split the scenes from the batch options
+    scenes = [ arg for arg in otherArgs if os.path.splitext(arg)[1].lower() in ('.ma', '.mb') ]
+    batchArgs = [ arg for arg in otherArgs if arg not in scenes ]
+    scenes = [ os.path.abspath(scene) for scene in scenes ]
+    if not scenes:
+        parser.error("No scene to playblast.")
+    # All the workers would write the same file
+    if len(scenes) > 1 and any( arg in ('-op', '--output-path') or arg.startswith('--output-path=') for arg in batchArgs ):
+        parser.error("--output-path can be used with a single scene only, use --output-dir.")
+
+    workerArgs = [
+        sys.executable if options.fake else options.mayapy,
+        os.path.abspath(__file__),
+        '--worker'
+    ]
+    if options.fake:
+        workerArgs = workerArgs + [
+            '--fake',
+            '--fake-frames', str(options.fake_frames),
+            '--fake-frame-time', str(options.fake_frame_time),
+            '--fake-open-time', str(options.fake_open_time),
+            '--fake-crash-rate', str(options.fake_crash_rate),
+        ]
+    workerArgs = workerArgs + batchArgs
+
+    summary = runFarm(scenes, workerArgs, options.workers, options.retries, options.results_dir)
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
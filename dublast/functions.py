@@ -20,56 +20,423 @@ General functions
 #======================= END GPL LICENSE BLOCK ========================
 
 import os
+import json
+import math
+import bisect
+import ctypes
 import tempfile
+import shutil
 import platform
 import subprocess
-import shutil
+import threading
+import time
 
+import maya.utils # pylint: disable=import-error
 from maya import cmds # pylint: disable=import-error
 from maya import mel # pylint: disable=import-error
+import maya.api.OpenMaya as om # pylint: disable=import-error
+import maya.api.OpenMayaUI as omui # pylint: disable=import-error
 
 from dublast import dumaf
+from dublast.dupyf import ffmpeg, staging, burnin
+from dublast.dupyf.framecache import FrameCache
+from dublast.dupyf.debug import FrameTimings, StageProfiler
+
+# Number of frames captured before sending them to ffmpeg in the pipeline mode
+PIPELINE_CHUNK_SIZE = 48
+
+# The encodings running in the background, by output file path
+TRANSCODE_JOBS = {}
+
+# The maximum size of all the frame caches, in bytes, before evicting the least recently used
+FRAME_CACHE_MAX_SIZE = 20 * 1024 * 1024 * 1024
+
+# The size of the quick preview of the two-pass playblasts, relative to the render resolution
+PREVIEW_SIZE = 0.25
+# Appended to the file name of the quick preview: it's a separate file,
+# so the full resolution playblast can be saved while the preview is still opened in the player
+PREVIEW_SUFFIX = '_preview'
+# Appended to the file name of the full resolution playblast while it's being rendered:
+# it replaces the previous playblast only when it's complete
+REFINE_SUFFIX = '_refining'
+
+# The full resolution passes running in mayapy, by output file path
+REFINE_JOBS = {}
+
+# Environment variable: a JSON lines file where the blast reports are appended
+HISTORY_FILE_VAR = 'DUBLAST_HISTORY'
+
+# The camera attributes sampled before the capture, for the HUD and the burn-ins
+CAMERA_ATTRIBUTES = ('focalLength', 'focusDistance', 'fStop')
 
 def check_update():
-    """Checks if an update is available"""
+    """Checks if an update is available, in the background: never waits for the network"""
     from dublast import TOOL_NAME, VERSION, IS_PRERELEASE
     dumaf.utils.checkUpdate( TOOL_NAME, VERSION, discreet=True, preRelease=IS_PRERELEASE )
 
+def createProfiler(**info):
+    """Creates the StageProfiler of a blast, with the info about this machine and Maya.
+    The report is appended to the history file set in the DUBLAST_HISTORY environment variable."""
+    info.update({
+        'mayaVersion': cmds.about(version=True),
+        'os': platform.platform(),
+        'host': platform.node(),
+        'cpuCount': os.cpu_count(),
+    })
+    return StageProfiler(info=info, historyFile=os.environ.get(HISTORY_FILE_VAR, ''))
+
+def getStagingDir(estimatedBytes=0, backend='auto'):
+    """Gets a folder for the temporary frames from the staging pool, in RAM or on a fast drive
+    if there's room for estimatedBytes, see staging.selectBackend.
+    The folder is reused by the next blasts, it must be freed with staging.releaseSlot.
+    Returns (backend name, folder)"""
+    backend, folder = staging.selectBackend(estimatedBytes, backend=backend)
+    if backend == 'temp':
+        folder = getTempRoot()
+    return backend, staging.getPool(folder).acquire()
+
+def getTempRoot():
+    """The temp folder. For some reason, sometimes the user folder is incorrect in TEMP on windows"""
+    if platform.system() == 'Windows':
+        return os.getenv('USERPROFILE') + '/AppData/Local/Temp'
+    return tempfile.gettempdir()
+
 def getTempDir():
     """Creates and returns a tempdir. For some reason, sometimes the user folder is incorrect in TEMP on windows"""
     tempDir = tempfile.mkdtemp()
     if platform.system() == 'Windows':
-        userDir = os.getenv('USERPROFILE')
-        tempDir = userDir + '/AppData/Local/Temp/' + os.path.basename(tempDir)
+        tempDir = getTempRoot() + '/' + os.path.basename(tempDir)
     return tempDir
 
-def createPlayblast(filePath, size):
-    """Creates a playblast"""
-    # Warning, That's for win only ! Needs work on MAC/Linux
-    # TODO MAC: open playblast at the end
-    # TODO MAC/LINUX: video (audio) playblast format must not be avi
-    # TODO MAC/LINUX: call to ffmpeg without .exe
-    if platform.system() != 'Windows':
-        return
+def getFrameRange(frameRange=None):
+    """Returns the (start, end) frames to playblast, the playback range by default"""
+    if frameRange is None:
+        frameRange = (
+            cmds.playbackOptions(q=True,minTime=True),
+            cmds.playbackOptions(q=True,maxTime=True)
+            )
+    return (int(frameRange[0]), int(frameRange[1]))
 
-    # Get bin dir
-    pluginFolder = os.path.dirname( cmds.pluginInfo('DuBlast', query=True, path=True) )
-    ffmpegFile = pluginFolder + '/ffmpeg.exe'
-    ffplayFile = pluginFolder + '/ffplay.exe'
+def getTimeSliderRange():
+    """Returns the (start, end) range highlighted in the time slider, or None if there's none"""
+    if cmds.about(batch=True):
+        return None
+    timeSlider = mel.eval('$tmpVar=$gPlayBackSlider')
+    if not cmds.timeControl(timeSlider, q=True, rangeVisible=True):
+        return None
+    startFrame, endFrame = cmds.timeControl(timeSlider, q=True, rangeArray=True)
+    # The end is excluded
+    return (startFrame, endFrame - 1)
 
-    # Get a temp dir for rendering the playblast
-    tempDir = getTempDir()
-    # The tempDir may not exist
-    if not os.path.isdir(tempDir):
-        os.makedirs(tempDir)
-    imageFile = tempDir + '/' + 'dublast'
-
-    # Create jpg frame sequence
-    w = cmds.getAttr("defaultResolution.width") * size
-    h = cmds.getAttr("defaultResolution.height") * size
-    w = w - w % 4
-    h = h - h % 4
-    imageFile = cmds.playblast( filename=imageFile,
+def getStrideFrames(frameRange, stride=1):
+    """Lists the frames to capture, every stride frames"""
+    startFrame, endFrame = getFrameRange(frameRange)
+    return list(range(startFrame, endFrame + 1, max(1, stride)))
+
+def getSceneSounds():
+    """Lists the (unmuted) audio nodes of the scene, as dicts to be used by ffmpeg.mixAudio,
+    with their times converted to seconds."""
+    framerate = getFramerate()
+    sounds = []
+    for node in dumaf.rendering.get_cached_audio_nodes():
+        if cmds.attributeQuery('mute', node=node, exists=True) and cmds.getAttr(node + '.mute'):
+            continue
+        soundFile = cmds.getAttr(node + '.filename')
+        if not soundFile or not os.path.isfile(soundFile):
+            continue
+        # Time attributes are in frames
+        sounds.append({
+            'file': soundFile,
+            'offset': cmds.getAttr(node + '.offset') / framerate,
+            'sourceStart': cmds.getAttr(node + '.sourceStart') / framerate,
+            'sourceEnd': cmds.getAttr(node + '.sourceEnd') / framerate,
+        })
+    return sounds
+
+def getSoundFile(ffmpegFile, tempDir, frameRange=None):
+    """Mixes the sounds used by the timeline to a wav file in tempDir,
+    directly from the audio nodes, without evaluating the scene.
+    Returns an empty string if there's no sound to render."""
+    sounds = getSceneSounds()
+    # If there are sounds in the scene
+    if not sounds:
+        return ''
+    if not cmds.about(batch=True):
+        timeCtrl = mel.eval('$tmpVar=$gPlayBackSlider')
+        # And sounds are used by the timeline
+        if not cmds.timeControl(timeCtrl, displaySound=True, query=True):
+            return ''
+    startFrame, endFrame = getFrameRange(frameRange)
+    framerate = getFramerate()
+    soundFile = tempDir + '/' + 'blast.wav'
+    return ffmpeg.mixAudio(ffmpegFile, sounds, startFrame / framerate, (endFrame + 1) / framerate, soundFile)
+
+def getFramerate():
+    """Returns the current framerate"""
+    return dumaf.rendering.get_cached_framerate()
+
+def getPlayblastSize(size):
+    """Returns the width and height of the playblast, rounded to a multiple of 4"""
+    w, h = dumaf.rendering.get_cached_resolution()
+    w = w * size
+    h = h * size
+    w = int(w - w % 4)
+    h = int(h - h % 4)
+    return (w, h)
+
+def captureViewport(view, image):
+    """Grabs the current color buffer of the view as raw RGBA bytes.
+    Returns (bytes, width, height); note the rows are stored bottom-up."""
+    view.refresh(False, True)
+    view.readColorBuffer(image, True)
+    w, h = image.getSize()
+    return (ctypes.string_at(image.pixels(), w * h * 4), w, h)
+
+def captureFrame(view, image, frame, timings=None):
+    """Evaluates the scene at the given frame and captures the viewport.
+    If timings (a FrameTimings) is set, the evaluation and draw times are recorded in it.
+    Returns (bytes, width, height), see captureViewport."""
+    t = time.time()
+    cmds.currentTime(frame, update=True)
+    evaluationTime = time.time() - t
+    t = time.time()
+    result = captureViewport(view, image)
+    if timings is not None:
+        timings.add(frame, evaluationTime, time.time() - t)
+    return result
+
+def streamPlayblast(ffmpegFile, filePath, size, frameRange, soundFile='', timings=None, preset=ffmpeg.DEFAULT_PRESET, stride=1, burnIn=None):
+    """Captures the frames one by one from the active viewport
+    and pipes the raw buffers to ffmpeg, without writing any image to disk.
+    Encoding runs in the ffmpeg process while Maya captures the next frames.
+    With a stride, only every stride frames are captured, and held by ffmpeg.
+    burnIn is a dict of burnin.BurnIn options, to draw the burn-ins on the raw buffers.
+    Returns the function to call to wait for the encoding to finish."""
+    w, h = getPlayblastSize(size)
+    framerate = getFramerate()
+    startFrame, endFrame = getFrameRange(frameRange)
+    prevTime = cmds.currentTime(q=True)
+
+    view = omui.M3dView.active3dView()
+    image = om.MImage()
+
+    # The buffer size is the size of the viewport, not the one of the playblast;
+    # we need a first frame to know it.
+    frame, viewW, viewH = captureFrame(view, image, startFrame, timings)
+
+    ffmpegProcess = ffmpeg.encodeRawStream(ffmpegFile, (viewW, viewH), framerate, (w, h), filePath, soundFile, preset=preset, stride=stride)
+    burner = None
+    if burnIn is not None:
+        burner = burnin.BurnIn(viewW, viewH, **burnIn)
+        frame = burner.apply(frame, startFrame)
+
+    try:
+        ffmpegProcess.stdin.write(frame)
+        for f in getStrideFrames((startFrame, endFrame), stride)[1:]:
+            frame, frameW, frameH = captureFrame(view, image, f, timings)
+            if frameW != viewW or frameH != viewH:
+                raise RuntimeError("The viewport has been resized during the playblast.")
+            if burner is not None:
+                frame = burner.apply(frame, f)
+            ffmpegProcess.stdin.write(frame)
+    except: # pylint: disable=bare-except
+        ffmpegProcess.kill()
+        ffmpegProcess.communicate()
+        raise
+    finally:
+        cmds.currentTime(prevTime, update=True)
+
+    # ffmpeg may still be encoding the last frames
+    def finishEncoding():
+        return ffmpeg.waitProcess(ffmpegProcess)
+
+    return finishEncoding
+
+def enableFastEvaluation():
+    """Switches to the parallel evaluation manager, and enables cached playback if available.
+    Returns the previous settings, to be given to restoreEvaluation"""
+    previous = {}
+    try:
+        previous['mode'] = cmds.evaluationManager(query=True, mode=True)[0]
+        if previous['mode'] != 'parallel':
+            cmds.evaluationManager(mode='parallel')
+    except (RuntimeError, TypeError, AttributeError):
+        # No evaluation manager in this version of Maya
+        previous.pop('mode', None)
+    try:
+        cacheEnabled = cmds.evaluator(name='cache', query=True, enable=True)
+        if isinstance(cacheEnabled, list):
+            cacheEnabled = cacheEnabled[0]
+        previous['cache'] = bool(cacheEnabled)
+        if not previous['cache']:
+            cmds.evaluator(name='cache', enable=True)
+    except (RuntimeError, TypeError, AttributeError):
+        # No cached playback in this version of Maya
+        previous.pop('cache', None)
+    return previous
+
+def restoreEvaluation(previous):
+    """Restores the evaluation settings returned by enableFastEvaluation"""
+    if 'cache' in previous and not previous['cache']:
+        cmds.evaluator(name='cache', enable=False)
+    if 'mode' in previous and previous['mode'] != 'parallel':
+        cmds.evaluationManager(mode=previous['mode'])
+
+def profileEvaluation(frameRange=None):
+    """Steps through the frames to measure the time spent evaluating the scene
+    and drawing the viewport, without capturing anything.
+    Returns the FrameTimings"""
+    startFrame, endFrame = getFrameRange(frameRange)
+    prevTime = cmds.currentTime(q=True)
+    timings = FrameTimings()
+    try:
+        for f in range(startFrame, endFrame + 1):
+            t = time.time()
+            cmds.currentTime(f, update=True)
+            evaluationTime = time.time() - t
+            t = time.time()
+            cmds.refresh(force=True)
+            timings.add(f, evaluationTime, time.time() - t)
+    finally:
+        cmds.currentTime(prevTime, update=True)
+    timings.report('DuBlast')
+    return timings
+
+def getCameraDagPath(camera):
+    """Returns the MDagPath of the camera shape"""
+    selectionList = om.MSelectionList()
+    selectionList.add(camera)
+    dagPath = selectionList.getDagPath(0)
+    if dagPath.apiType() != om.MFn.kCamera:
+        dagPath.extendToShape()
+    return dagPath
+
+def multiCameraPlayblast(ffmpegFile, filePaths, size, frameRange, cameras, contactSheet=False, soundFile='', timings=None, preset=ffmpeg.DEFAULT_PRESET, stride=1, burnIn=None):
+    """Captures several cameras in a single pass: each frame is evaluated once,
+    then the viewport looks through each camera in turn to capture it.
+    The frames are piped to one ffmpeg per camera (filePaths, in the same order as the cameras),
+    or, if contactSheet is True, tiled in a grid and piped to a single ffmpeg (filePaths[0]).
+    With a stride, only every stride frames are captured.
+    burnIn is a dict of burnin.BurnIn options; the camera name and focal length are set for each camera.
+    Returns the function to call to wait for the encoding to finish."""
+    w, h = getPlayblastSize(size)
+    framerate = getFramerate()
+    startFrame, endFrame = getFrameRange(frameRange)
+    prevTime = cmds.currentTime(q=True)
+
+    view = omui.M3dView.active3dView()
+    image = om.MImage()
+    prevCamera = view.getCamera()
+    dagPaths = [ getCameraDagPath(camera) for camera in cameras ]
+    strideFrames = getStrideFrames((startFrame, endFrame), stride)
+    metadatas = [ CameraMetadata(camera, strideFrames) for camera in cameras ]
+
+    columns = int(math.ceil(math.sqrt(len(cameras))))
+    rows = int(math.ceil(len(cameras) / float(columns)))
+
+    processes = []
+    burners = []
+    viewSize = None
+    try:
+        for f in strideFrames:
+            # The (expensive) scene evaluation, once for all cameras
+            t = time.time()
+            cmds.currentTime(f, update=True)
+            evaluationTime = time.time() - t
+
+            t = time.time()
+            frames = []
+            for camera, dagPath, metadata in zip(cameras, dagPaths, metadatas):
+                view.setCamera(dagPath)
+                updateCameraHUD(camera, metadata.focalLengthLabel(f))
+                frame, frameW, frameH = captureViewport(view, image)
+                if viewSize is None:
+                    viewSize = (frameW, frameH)
+                elif viewSize != (frameW, frameH):
+                    raise RuntimeError("The viewport has been resized during the playblast.")
+                frames.append(frame)
+            if timings is not None:
+                timings.add(f, evaluationTime, time.time() - t)
+
+            if burnIn is not None:
+                if not burners:
+                    for camera, metadata in zip(cameras, metadatas):
+                        options = dict(burnIn)
+                        options.update( getCameraTexts(camera, metadata) )
+                        burners.append( burnin.BurnIn(viewSize[0], viewSize[1], **options) )
+                frames = [ burner.apply(frame, f) for burner, frame in zip(burners, frames) ]
+
+            # We need a first frame to know the buffer size
+            if not processes:
+                if contactSheet:
+                    processes.append( ffmpeg.encodeRawStream(ffmpegFile,
+                        (viewSize[0] * columns, viewSize[1] * rows),
+                        framerate,
+                        (w * columns, h * rows),
+                        filePaths[0],
+                        soundFile,
+                        preset=preset,
+                        stride=stride) )
+                else:
+                    for filePath in filePaths:
+                        processes.append( ffmpeg.encodeRawStream(ffmpegFile, viewSize, framerate, (w, h), filePath, soundFile, preset=preset, stride=stride) )
+
+            if contactSheet:
+                processes[0].stdin.write( ffmpeg.tileFrames(frames, viewSize[0], viewSize[1], columns, rows) )
+            else:
+                for process, frame in zip(processes, frames):
+                    process.stdin.write(frame)
+    except: # pylint: disable=bare-except
+        for process in processes:
+            process.kill()
+            process.communicate()
+        raise
+    finally:
+        view.setCamera(prevCamera)
+        updateCameraHUD(cameras[0], metadatas[0].focalLengthLabel(startFrame))
+        cmds.currentTime(prevTime, update=True)
+
+    def finishEncoding():
+        return [ ffmpeg.waitProcess(process) for process in processes ]
+
+    return finishEncoding
+
+def burnInSequence(ffmpegFile, imageFile, startImage, frames, frameSize, framerate, filePath, soundFile='', burnIn=None, preset=ffmpeg.DEFAULT_PRESET, stride=1):
+    """Decodes the jpg sequence to raw frames, draws the burn-ins on them and encodes them.
+    frames are the frame numbers written in the burn-ins, one per image from startImage.
+    burnIn is a dict of burnin.BurnIn options.
+    This doesn't use Maya, it can run in a background thread."""
+    w, h = frameSize
+    burner = burnin.BurnIn(w, h, bottomUp=False, **burnIn)
+    decoder = ffmpeg.decodeSequence(ffmpegFile, imageFile, startImage, len(frames))
+    encoder = ffmpeg.encodeRawStream(ffmpegFile, frameSize, framerate, frameSize, filePath, soundFile, bottomUp=False, preset=preset, stride=stride)
+    frameBytes = w * h * 4
+    try:
+        for f in frames:
+            frame = decoder.stdout.read(frameBytes)
+            if len(frame) < frameBytes:
+                raise RuntimeError("The frame " + str(f) + " can't be read from " + imageFile)
+            encoder.stdin.write(burner.apply(frame, f))
+    except: # pylint: disable=bare-except
+        for process in (decoder, encoder):
+            process.kill()
+            process.communicate()
+        raise
+    decoder.communicate()
+    return ffmpeg.waitProcess(encoder)
+
+def blastSequence(imageFile, size, startFrame=None, endFrame=None, frames=None):
+    """Creates a jpg frame sequence. Returns the file name with #### for the frame number.
+    If frames is a list of frame numbers, only these are rendered."""
+    w, h = getPlayblastSize(size)
+    kwargs = {}
+    if frames is not None:
+        kwargs['frame'] = frames
+    if startFrame is not None:
+        kwargs['startTime'] = startFrame
+    if endFrame is not None:
+        kwargs['endTime'] = endFrame
+    return cmds.playblast( filename=imageFile,
         format='image',
         clearCache=True,
         framePadding= 5,
@@ -77,70 +444,785 @@ def createPlayblast(filePath, size):
         showOrnaments=True,
         percent=100,
         compression="jpg",
-        quality=50, 
+        quality=50,
         width = w,
-        height = h )
+        height = h,
+        **kwargs )
 
-    # if there's sound, create a sound file
-    soundFile = ''
-    sounds = cmds.ls(type='audio')
-    # If there are sounds in the scene
-    if sounds:
-        timeCtrl = mel.eval('$tmpVar=$gPlayBackSlider')
-        # And sounds are used by the timeline
-        if cmds.timeControl(timeCtrl, displaySound=True, query=True):
-            soundFile = tempDir + '/' + 'blast.avi'
-            soundFile = cmds.playblast(filename=soundFile, format='avi', clearCache=True, useTraxSounds=True, framePadding= 5, viewer=False, showOrnaments=False, percent=10,compression="none", quality=10)
-
-    # Get framerate
-    framerate = mel.eval('float $fps = `currentTimeUnitToFPS`') # It's not in cmds!!
-
-    # Transcode using ffmpeg
-    ffmpegArgs = [
-        ffmpegFile,
-        '-loglevel', 'error', # limit output to errors
-        '-y', # overwrite
-        '-start_number', str(cmds.playbackOptions(q=True,minTime=True)),
-        '-framerate', str(framerate),
-        '-i', imageFile.replace('####', "%5d"), # Image file
-    ]
-    if soundFile != '':
-        ffmpegArgs = ffmpegArgs + [
-            '-i', soundFile,
-            '-map', '0:0', # map video to video
-            '-map', '1:1', # map audio to audio
-            '-b:a', '131072', # "Bad" quality
-        ]
-    ffmpegArgs = ffmpegArgs + [
-        '-f', 'mp4', # Codec
-        '-c:v', 'h264', # Codec
-        '-level', '3.0', # Compatibility
-        '-crf', '25', # "Bad" quality
-        '-preset', 'ultrafast', # We're in a hurry to playblast!
-        '-tune', 'fastdecode', # It needs to be easy to play
-        '-profile:v', 'baseline', # Compatibility
-        '-x264opts', 'b_pyramid=0', # Needed to decode in Adobe Apps
-        '-pix_fmt', 'yuv420p', # Because ffmpeg does 422 by default, which causes compatibility issues
-        '-intra', # Intra frame for frame by frame playback
-        filePath # Output file
-    ]
+def blastStrided(imageFile, size, frames):
+    """Creates a jpg sequence of the given frames, numbered from 1 without gaps,
+    so that ffmpeg can read it. Returns the file name with #### for the image number."""
+    blastSequence(imageFile, size, frames=frames)
+    heldFile = imageFile + '_held'
+    for i, frame in enumerate(frames):
+        os.replace(
+            imageFile + '.' + str(frame).zfill(5) + '.jpg',
+            heldFile + '.' + str(i + 1).zfill(5) + '.jpg'
+            )
+    return heldFile + '.####.jpg'
+
+def getCurveSignatures():
+    """Returns the keys (time, value, in and out angles)
+    of all the time-based animation curves of the scene, by curve"""
+    curves = {}
+    for curve in cmds.ls(type=('animCurveTA', 'animCurveTL', 'animCurveTT', 'animCurveTU')):
+        times = cmds.keyframe(curve, query=True, timeChange=True) or []
+        values = cmds.keyframe(curve, query=True, valueChange=True) or []
+        inAngles = cmds.keyTangent(curve, query=True, inAngle=True) or []
+        outAngles = cmds.keyTangent(curve, query=True, outAngle=True) or []
+        curves[curve] = list(zip(times, values, inAngles, outAngles))
+    return curves
+
+def cachedPlayblast(ffmpegFile, tempDir, filePath, size, frameRange, cacheKey, frames=(), preset=ffmpeg.DEFAULT_PRESET, burnIn=None):
+    """Renders only the frames which are not in the frame cache,
+    or which are affected by animation changes since the previous playblast,
+    or which are listed in frames. The video is then encoded from the cache.
+    burnIn is a dict of burnin.BurnIn options; the burn-ins are drawn when encoding,
+    the cached frames don't have them.
+    Returns the function to call to wait for the encoding to finish."""
+    startFrame, endFrame = getFrameRange(frameRange)
+    framerate = getFramerate()
+
+    cache = FrameCache( cmds.file(q=True, sn=True) + '|' + cacheKey )
+    curves = getCurveSignatures()
+    dirtyFrames = cache.dirtyFrames(startFrame, endFrame, curves, frames)
+    if dirtyFrames:
+        blastSequence(cache.imageFile, size, frames=dirtyFrames)
+    cache.update(dirtyFrames, curves)
+    # Evict the old caches in the background
+    staging.evictInBackground(os.path.dirname(cache.folder), FRAME_CACHE_MAX_SIZE, lock=False, keep=(cache.folder,))
+    print("Rendered " + str(len(dirtyFrames)) + " frames, " +
+        str(endFrame - startFrame + 1 - len(dirtyFrames)) + " from the cache.")
+
+    soundFile = getSoundFile(ffmpegFile, tempDir, frameRange)
+
+    if burnIn is not None:
+        frameSize = getPlayblastSize(size)
+        def finishBurnIn():
+            return burnInSequence(ffmpegFile, cache.imageFile + '.####.jpg', startFrame, range(startFrame, endFrame + 1), frameSize, framerate, filePath, soundFile, burnIn, preset)
+        return finishBurnIn
+
+    def finishEncoding():
+        return ffmpeg.encodeSegmented(ffmpegFile, cache.imageFile + '.####.jpg', startFrame, endFrame, framerate, filePath, soundFile, segmentDir=tempDir, preset=preset)
+
+    return finishEncoding
+
+def pipelinePlayblast(ffmpegFile, tempDir, filePath, size, frameRange, chunkSize=PIPELINE_CHUNK_SIZE, preset=ffmpeg.DEFAULT_PRESET):
+    """Captures the frames by chunks, and starts encoding each chunk in the background
+    while the next one is being captured. The encoded chunks are joined at the end.
+    Maya keeps the main thread busy while playblasting, so each chunk gets its own
+    ffmpeg process instead of a single process fed by a watcher thread;
+    at most one per ffmpeg.SEGMENT_THREADS cores run at once.
+    Returns the function to call to wait for the encoding to finish."""
+    startFrame, endFrame = getFrameRange(frameRange)
+    framerate = getFramerate()
+
+    # Don't start more encoders than the CPU can run
+    maxEncoders = max(1, (os.cpu_count() or 1) // ffmpeg.SEGMENT_THREADS)
+
+    segmentFiles = []
+    processes = []
+    try:
+        for chunkStart in range(startFrame, endFrame + 1, chunkSize):
+            chunkEnd = min(chunkStart + chunkSize - 1, endFrame)
+            imageFile = blastSequence(tempDir + '/' + 'dublast', size, chunkStart, chunkEnd)
+            segmentFile = tempDir + '/' + 'segment' + str(len(segmentFiles)).zfill(5) + ffmpeg.getExtension(preset)
+            # Wait for the oldest chunk before starting a new encoder
+            if len(processes) >= maxEncoders:
+                ffmpeg.waitProcess(processes.pop(0))
+            processes.append( ffmpeg.encodeSequence(ffmpegFile, imageFile, chunkStart, framerate, segmentFile,
+                frameCount=chunkEnd - chunkStart + 1, threads=ffmpeg.SEGMENT_THREADS, preset=preset) )
+            segmentFiles.append(segmentFile)
+    except: # pylint: disable=bare-except
+        for process in processes:
+            process.kill()
+            process.communicate()
+        raise
+
+    # The sound is mixed while the last chunks are being encoded
+    soundFile = getSoundFile(ffmpegFile, tempDir, frameRange)
+
+    def finishEncoding():
+        for process in processes:
+            ffmpeg.waitProcess(process)
+        return ffmpeg.concatSegments(ffmpegFile, segmentFiles, filePath, soundFile, preset)
+
+    return finishEncoding
+
+class TranscodeJob():
+    """An encoding running in the background after the capture.
+    When it's done, the playblast is shown and the temp files are removed,
+    from Maya's main thread."""
+
+    def __init__(self, filePath, tempDir, ffplayFile, show=True, profiler=None):
+        self.filePath = filePath
+        self.tempDir = tempDir
+        self.ffplayFile = ffplayFile
+        self.show = show
+        self.profiler = profiler if profiler is not None else StageProfiler()
+        self.output = None
+        # The exception raised by the encoding, if it failed
+        self.error = None
+        self._thread = None
+
+    def start(self, finishEncoding):
+        """Runs finishEncoding in a thread"""
+        # Another job may be writing the same file
+        previousJob = TRANSCODE_JOBS.get(self.filePath)
+        if previousJob is not None:
+            previousJob.wait()
+        TRANSCODE_JOBS[self.filePath] = self
+
+        def run():
+            try:
+                with self.profiler.stage('encode', self.filePath):
+                    self.output = finishEncoding()
+            except Exception as e: # pylint: disable=broad-except
+                self.error = e
+            finally:
+                # Always free the staging slot and report
+                maya.utils.executeDeferred(self.finish)
 
-    ffmpegProcess = subprocess.Popen(ffmpegArgs,shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE) # Launch!
+        self._thread = threading.Thread(target=run)
+        self._thread.daemon = True
+        self._thread.start()
 
-    output = ffmpegProcess.communicate()
+    def isRunning(self):
+        """Checks if the encoding is still running"""
+        return self._thread is not None and self._thread.is_alive()
 
-    # Remove temp files
-    shutil.rmtree(tempDir)
-    subprocess.Popen([ffplayFile, '-seek_interval', '0.1', filePath])
-    return
+    def wait(self):
+        """Blocks until the encoding is finished"""
+        if self._thread is not None:
+            self._thread.join()
 
-    # TEST
-    # Open playblast
-    if platform.system() == "Windows":
-        os.startfile(filePath)
-    elif platform.system() == "Linux":
-        subprocess.call(["xdg-open", filePath])
+    def finish(self):
+        """Called on the main thread when the encoding is done"""
+        if TRANSCODE_JOBS.get(self.filePath) is self:
+            del TRANSCODE_JOBS[self.filePath]
+        finishPlayblast(self.filePath, self.tempDir, self.ffplayFile, self.show, self.profiler, self.error)
+        self.profiler.save()
+
+def getTranscodeJobs():
+    """Returns the list of encodings running in the background"""
+    return [ job for job in TRANSCODE_JOBS.values() if job.isRunning() ]
+
+def waitTranscodeJobs():
+    """Blocks until all background encodings are finished"""
+    for job in list(TRANSCODE_JOBS.values()):
+        job.wait()
+
+def finishPlayblast(filePath, tempDir, ffplayFile, show=True, profiler=None, error=None):
+    """Frees the staging folder and shows the playblast.
+    error is the exception raised by the encoding, if any."""
+    if profiler is None:
+        profiler = StageProfiler()
+    # The temp files are kept for the next blast, and cleaned up in the background
+    if tempDir != '':
+        with profiler.stage('cleanup'):
+            staging.releaseSlot(tempDir)
+    if error is not None:
+        cmds.warning("The playblast could not be encoded: " + filePath + "\n" + str(error))
+        return
+    if not os.path.isfile(filePath):
+        cmds.warning("The playblast could not be encoded: " + filePath)
+        return
+    print("Playblast saved: " + filePath)
+    if show:
+        with profiler.stage('show'):
+            openPlayblast(filePath, ffplayFile)
+
+def openPlayblast(filePath, ffplayFile=''):
+    """Opens the playblast in ffplay, or in the default player if ffplay is not available"""
+    if ffplayFile != '':
+        subprocess.Popen([ffplayFile, '-seek_interval', '0.1', filePath])
+    elif platform.system() == "Windows":
+        os.startfile(filePath) # pylint: disable=no-member
+    elif platform.system() == "Darwin":
+        subprocess.Popen(["open", filePath])
+    else:
+        subprocess.Popen(["xdg-open", filePath])
+
+def getPluginFolder():
+    """The folder containing the plugin and the binaries"""
+    return os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) )
+
+def getBinaries():
+    """Finds ffmpeg and ffplay: in the plugin folder, then with $DUBLAST_FFMPEG, then in the PATH.
+    Not from the plugin info: the plugin may not be loaded in mayapy.
+    Returns the (ffmpeg, ffplay) paths; ffplay is an empty string if it's not found."""
+    pluginFolder = getPluginFolder()
+    ffmpegFile = ffmpeg.findBinary('ffmpeg', pluginFolder)
+    if ffmpegFile == '':
+        raise RuntimeError("ffmpeg can't be found. Put it in " + pluginFolder +
+            ", set the " + ffmpeg.FFMPEG_VAR + " environment variable or add it to the PATH.")
+    # Probe it once per session
+    ffmpeg.getCapabilities(ffmpegFile)
+    return ffmpegFile, ffmpeg.findBinary('ffplay', pluginFolder)
+
+def resolvePreset(preset):
+    """Returns the name of the encoding preset to use.
+    'auto' selects the fastest preset on this machine, see ffmpeg.selectFastestPreset;
+    unknown presets, and the ones this ffmpeg can't encode with, fall back to the default one."""
+    ffmpegFile, _ = getBinaries()
+    if preset == 'auto':
+        return ffmpeg.selectFastestPreset(ffmpegFile)
+    if not ffmpeg.canUsePreset(ffmpegFile, preset):
+        cmds.warning("The " + preset + " preset can't be used with this ffmpeg, using " + ffmpeg.DEFAULT_PRESET)
+        return ffmpeg.DEFAULT_PRESET
+    return preset
+
+def createMultiCameraPlayblast(outputPath, size, cameras, contactSheet=False, frameRange=None, show=True, timings=None, profiler=None, preset=ffmpeg.DEFAULT_PRESET, stride=1, burnIn=None):
+    """Creates the playblasts of several cameras, capturing them in a single pass.
+    outputPath is the file path without extension; the camera names are appended to it,
+    unless contactSheet is True: then all cameras are tiled in a single video.
+    Returns the list of the playblast files."""
+    ffmpegFile, ffplayFile = getBinaries()
+
+    if contactSheet:
+        filePaths = [ outputPath + ffmpeg.getExtension(preset) ]
+    else:
+        filePaths = [ outputPath + '_' + dumaf.paths.baseName(camera) + ffmpeg.getExtension(preset) for camera in cameras ]
+
+    if profiler is None:
+        profiler = StageProfiler()
+    # Only the sound is written there
+    profiler.info['staging'], tempDir = getStagingDir()
+
+    frameRange = getFrameRange(frameRange)
+    try:
+        with profiler.stage('sound', tempDir):
+            soundFile = getSoundFile(ffmpegFile, tempDir, frameRange)
+        with profiler.stage('capture'):
+            finishEncoding = multiCameraPlayblast(ffmpegFile, filePaths, size, frameRange, cameras, contactSheet, soundFile, timings, preset, stride, burnIn)
+        with profiler.stage('encode', filePaths[0] if contactSheet else ''):
+            finishEncoding()
+    except: # pylint: disable=bare-except
+        staging.releaseSlot(tempDir)
+        raise
+
+    for i, filePath in enumerate(filePaths):
+        # Show only the first one, release the tempDir once
+        finishPlayblast(filePath, tempDir if i == 0 else '', ffplayFile, show and i == 0, profiler)
+    return filePaths
+
+def createPlayblast(filePath, size, mode='sequence', background=False, cacheKey=None, dirtyFrames=(), frameRange=None, show=True, timings=None, profiler=None, preset=ffmpeg.DEFAULT_PRESET, stagingBackend='auto', stride=1, burnIn=None):
+    """Creates a playblast.
+    mode can be:
+        'sequence': a jpg sequence is rendered, then transcoded.
+        'pipeline': the jpg sequence is transcoded by chunks while it's being rendered.
+        'stream': the frames are piped to ffmpeg as they're captured, without any jpg.
+    If background is True, this returns as soon as the frames are captured,
+    and the encoding finishes in a TranscodeJob, which is returned.
+    If cacheKey is set (a string describing the camera and render options),
+    the frames are kept in a cache and only the changed frames (and the dirtyFrames)
+    are rendered again; the mode is then always 'sequence'.
+    frameRange is a (start, end) tuple, the playback range by default.
+    If show is False, the playblast is not opened in ffplay (or the default player) when it's done.
+    If timings (a FrameTimings) is set, it records the evaluation and draw time
+    of each frame, in the 'stream' mode only.
+    If profiler (a StageProfiler) is set, it records the time spent in each stage.
+    preset is the name of the encoding preset, see ffmpeg.PRESETS.
+    stagingBackend is where to write the temporary frames: 'ram', 'fast', 'temp',
+    or 'auto' to use the fastest one with enough room, see staging.selectBackend.
+    With a stride, only every stride frames are captured, and held in the video;
+    the 'pipeline' mode and the cache are then not used.
+    burnIn is a dict of burnin.BurnIn options to draw the burn-ins on the frames before encoding them,
+    in the 'stream' mode as they're captured, otherwise from the jpg sequence;
+    the 'pipeline' mode is then not used."""
+    ffmpegFile, ffplayFile = getBinaries()
+
+    frameRange = getFrameRange(frameRange)
+    if profiler is None:
+        profiler = StageProfiler()
+
+    if stride > 1 and (cacheKey is not None or mode == 'pipeline'):
+        print("Capturing every " + str(stride) + " frames: the frames are rendered after capture, without cache.")
+        cacheKey = None
+        if mode == 'pipeline':
+            mode = 'sequence'
+    if burnIn is not None and mode == 'pipeline':
+        print("Drawing the burn-ins: the frames are encoded after capture.")
+        mode = 'sequence'
+
+    # Get a temp dir for rendering the playblast
+    estimatedBytes = 0
+    if cacheKey is None and mode != 'stream':
+        w, h = getPlayblastSize(size)
+        estimatedBytes = staging.estimateBytes(w, h, len(getStrideFrames(frameRange, stride)))
+    stagingBackend, tempDir = getStagingDir(estimatedBytes, stagingBackend)
+    profiler.info['staging'] = stagingBackend
+    try:
+        # The tempDir may not exist
+        if not os.path.isdir(tempDir):
+            os.makedirs(tempDir)
+
+        if cacheKey is not None:
+            with profiler.stage('capture', tempDir):
+                finishEncoding = cachedPlayblast(ffmpegFile, tempDir, filePath, size, frameRange, cacheKey, dirtyFrames, preset, burnIn)
+        elif mode == 'stream':
+            # The sound is needed before starting ffmpeg
+            with profiler.stage('sound', tempDir):
+                soundFile = getSoundFile(ffmpegFile, tempDir, frameRange)
+            with profiler.stage('capture'):
+                finishEncoding = streamPlayblast(ffmpegFile, filePath, size, frameRange, soundFile, timings, preset, stride, burnIn)
+        elif mode == 'pipeline':
+            with profiler.stage('capture', tempDir):
+                finishEncoding = pipelinePlayblast(ffmpegFile, tempDir, filePath, size, frameRange, preset=preset)
+        else:
+            startFrame, endFrame = frameRange
+
+            # Create jpg frame sequence
+            frames = getStrideFrames(frameRange, stride)
+            with profiler.stage('capture', tempDir):
+                if stride > 1:
+                    imageFile = blastStrided(tempDir + '/' + 'dublast', size, frames)
+                    # The images are numbered from 1
+                    startFrame, endFrame = 1, len(frames)
+                else:
+                    imageFile = blastSequence(tempDir + '/' + 'dublast', size, startFrame, endFrame)
+
+            # if there's sound, create a sound file
+            with profiler.stage('sound'):
+                soundFile = getSoundFile(ffmpegFile, tempDir, frameRange)
+
+            # Transcode using ffmpeg, in parallel segments for long ranges
+            framerate = getFramerate()
+            frameSize = getPlayblastSize(size)
+            def finishEncoding():
+                if burnIn is not None:
+                    return burnInSequence(ffmpegFile, imageFile, startFrame, frames, frameSize, framerate, filePath, soundFile, burnIn, preset, stride)
+                return ffmpeg.encodeSegmented(ffmpegFile, imageFile, startFrame, endFrame, framerate, filePath, soundFile, preset=preset, stride=stride)
+    except: # pylint: disable=bare-except
+        # Don't keep the slot locked for the session
+        staging.releaseSlot(tempDir)
+        raise
+
+    if background:
+        job = TranscodeJob(filePath, tempDir, ffplayFile, show, profiler)
+        job.start(finishEncoding)
+        print("Encoding the playblast in the background: " + filePath)
+        return job
+
+    try:
+        with profiler.stage('encode', filePath):
+            finishEncoding()
+    except: # pylint: disable=bare-except
+        staging.releaseSlot(tempDir)
+        raise
+    finishPlayblast(filePath, tempDir, ffplayFile, show, profiler)
+    return None
 
 def createThumbnail(filePath):
     """Creates a thumbnail"""
     cmds.refresh(cv=True, fn = filePath)
+
+def getMayapy():
+    """The mayapy executable of the running Maya, or an empty string if it can't be found"""
+    mayaLocation = os.environ.get('MAYA_LOCATION', '')
+    if mayaLocation == '':
+        return ''
+    mayapy = os.path.join(mayaLocation, 'bin', ffmpeg.getBinaryName('mayapy'))
+    if not os.path.isfile(mayapy):
+        return ''
+    return mayapy
+
+def removePreview(previewPath, extension):
+    """Removes the preview (and its report) once the full resolution playblast is saved.
+    The path is without extension. The preview may still be opened in the player (Windows):
+    then it's kept, and the user is told."""
+    for ext in (extension, '.json'):
+        previewFile = previewPath + ext
+        if not os.path.isfile(previewFile):
+            continue
+        try:
+            os.remove(previewFile)
+        except OSError:
+            print("The preview is still opened, it can be removed: " + previewFile)
+
+def replaceRefined(refinePath, outputPath, extension):
+    """Moves the full resolution playblast (and its report) rendered at refinePath to outputPath,
+    replacing the previous one at once. The paths are without extension.
+    If the previous one is still opened in the player (Windows), the new one is kept where it is, and the user is told.
+    Returns the path of the playblast."""
+    filePath = outputPath + extension
+    for ext in (extension, '.json'):
+        refinedFile = refinePath + ext
+        if not os.path.isfile(refinedFile):
+            continue
+        try:
+            os.replace(refinedFile, outputPath + ext)
+        except OSError:
+            cmds.warning("The playblast is still opened, the full resolution one is saved as: " + refinedFile)
+            if ext == extension:
+                filePath = refinedFile
+    return filePath
+
+def exportSceneCopy():
+    """Exports the current scene, with its unsaved changes, to a temp file for mayapy.
+    The current scene file name and modified state are not changed.
+    Returns the path of the copy."""
+    fileType = (cmds.file(q=True, type=True) or ['mayaBinary'])[0]
+    if fileType not in ('mayaAscii', 'mayaBinary'):
+        fileType = 'mayaBinary'
+    sceneCopy = getTempDir() + '/' + 'dublast' + ('.ma' if fileType == 'mayaAscii' else '.mb')
+    outputDir = os.path.dirname(sceneCopy)
+    if not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+    return cmds.file(sceneCopy, exportAll=True, type=fileType, preserveReferences=True, force=True)
+
+class RefineJob():
+    """The full resolution pass of a two-pass playblast, running in a mayapy process
+    on a copy of the scene. When it's done, it removes the preview and the copy, from Maya's main thread."""
+
+    def __init__(self, process, previewPath, outputPath, extension, sceneCopy='', refinePath=''):
+        self.process = process
+        self.previewPath = previewPath
+        self.outputPath = outputPath
+        self.refinePath = refinePath
+        self.extension = extension
+        self.sceneCopy = sceneCopy
+        self.output = None
+        self._thread = None
+
+    def start(self):
+        """Waits for the process in a thread"""
+        previousJob = REFINE_JOBS.get(self.outputPath)
+        if previousJob is not None:
+            previousJob.process.kill()
+        REFINE_JOBS[self.outputPath] = self
+
+        def run():
+            self.output = self.process.communicate()
+            maya.utils.executeDeferred(self.finish)
+
+        self._thread = threading.Thread(target=run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def isRunning(self):
+        """Checks if the full resolution pass is still running"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def finish(self):
+        """Called on the main thread when the process is done"""
+        if self.sceneCopy != '':
+            shutil.rmtree(os.path.dirname(self.sceneCopy), ignore_errors=True)
+        if REFINE_JOBS.get(self.outputPath) is not self:
+            # Replaced by a newer blast
+            return
+        del REFINE_JOBS[self.outputPath]
+        if self.process.returncode != 0:
+            cmds.warning("The full resolution playblast failed:\n" + self.output[1].decode('utf-8', 'replace'))
+            if self.refinePath != '':
+                for ext in (self.extension, '.json'):
+                    ffmpeg.removeOutput(self.refinePath + ext)
+            return
+        filePath = self.outputPath + self.extension
+        if self.refinePath != '':
+            filePath = replaceRefined(self.refinePath, self.outputPath, self.extension)
+        removePreview(self.previewPath, self.extension)
+        print("Full resolution playblast saved: " + filePath)
+
+def refinePlayblast(outputPath, extension, camera, size, comment, hud, frameRange, preset, stride, burnIn=False, letterbox=0.0, safeFrames=False):
+    """Creates the full resolution playblast, after the preview (see PREVIEW_SUFFIX) has been shown.
+    It's rendered next to the playblast (see REFINE_SUFFIX), and replaces it when it's complete.
+    It runs in a mayapy process on a copy of the scene (with its unsaved changes), and the RefineJob is returned;
+    if mayapy can't be found, it's created in this session, and None is returned."""
+    previewPath = outputPath + PREVIEW_SUFFIX
+    refinePath = outputPath + REFINE_SUFFIX
+    mayapy = getMayapy()
+    if mayapy == '':
+        blast(camera=camera, size=size, comment=comment, hud=hud, outputPath=refinePath, frameRange=frameRange, preset=preset, stride=stride,
+            burnIn=burnIn, letterbox=letterbox, safeFrames=safeFrames)
+        replaceRefined(refinePath, outputPath, extension)
+        removePreview(previewPath, extension)
+        return None
+
+    # The current state of the scene, without saving it
+    sceneCopy = exportSceneCopy()
+
+    startFrame, endFrame = getFrameRange(frameRange)
+    args = [
+        mayapy, '-m', 'dublast.batch',
+        '--output-path', refinePath,
+        '--camera', camera,
+        '--size', str(size),
+        '--comment', comment,
+        '--start-time', str(startFrame),
+        '--end-time', str(endFrame),
+        '--preset', preset,
+        '--stride', str(stride),
+    ]
+    if not hud:
+        args.append('--no-hud')
+    if burnIn:
+        args = args + ['--burn-in', '--letterbox', str(letterbox)]
+        if safeFrames:
+            args.append('--safe-frames')
+    args.append(sceneCopy)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = getPluginFolder() + os.pathsep + env.get('PYTHONPATH', '')
+    process = subprocess.Popen(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    job = RefineJob(process, previewPath, outputPath, extension, sceneCopy, refinePath)
+    job.start()
+    print("Rendering the full resolution playblast in the background: " + outputPath + extension)
+    return job
+
+def removeHUD():
+    """Removes all current HUD"""
+    currentHuds = cmds.headsUpDisplay(listHeadsUpDisplays=True)
+    if currentHuds:
+        for hud in currentHuds:
+            cmds.headsUpDisplay(hud, remove=True)
+
+def getFocalLengthLabel(cam):
+    """The focal length shown in the HUD"""
+    if cmds.keyframe(cam, at='focalLength', query=True, keyframeCount=True):
+        return 'Animated'
+    return str(round(cmds.getAttr(cam + '.focalLength'))) + ' mm'
+
+class CameraMetadata():
+    """The CAMERA_ATTRIBUTES of a camera at all the frames, sampled with one query per attribute
+    before the capture, so that the HUD and the burn-ins don't query Maya at each frame."""
+
+    def __init__(self, camera, frames):
+        self.camera = camera
+        self.frames = sorted(frames)
+        self.values = {}
+        self.animated = {}
+        shape = getCameraDagPath(camera).fullPathName()
+        for attribute in CAMERA_ATTRIBUTES:
+            self.values[attribute], self.animated[attribute] = dumaf.animation.sample_attribute(shape + '.' + attribute, self.frames)
+
+    def value(self, attribute, frame):
+        """The value of the attribute at the frame, or at the previous sampled frame"""
+        i = bisect.bisect_right(self.frames, frame) - 1
+        return self.values[attribute][max(0, i)]
+
+    def focalLengthLabel(self, frame):
+        """The focal length shown in the HUD at this frame"""
+        return str(round(self.value('focalLength', frame))) + ' mm'
+
+    def frameTexts(self):
+        """The burn-in texts which change during the shot, by frame (see burnin.BurnIn)"""
+        if not self.animated['focalLength']:
+            return {}
+        return { f: {'focalLength': self.focalLengthLabel(f)} for f in self.frames }
+
+def updateCameraHUD(cam, focalLength=''):
+    """Shows the camera name and focal length in our HUD, if it's there"""
+    if not cmds.headsUpDisplay('DuCam', exists=True):
+        return
+    if focalLength == '':
+        focalLength = getFocalLengthLabel(cam)
+    cmds.headsUpDisplay('DuCam', edit=True, label='Camera: ' + dumaf.paths.baseName(cam))
+    cmds.headsUpDisplay('DuFocalLength', edit=True, label='Focal Length: ' + focalLength)
+
+def getCameraTexts(cam, metadata=None):
+    """The burnin.BurnIn options for the camera name and focal length,
+    with the focal length at each frame if it's animated"""
+    if metadata is None:
+        return {
+            'camera': dumaf.paths.baseName(cam),
+            'focalLength': getFocalLengthLabel(cam),
+        }
+    return {
+        'camera': dumaf.paths.baseName(cam),
+        'focalLength': metadata.focalLengthLabel(metadata.frames[0]),
+        'frameTexts': metadata.frameTexts(),
+    }
+
+def getBurnInOptions(cam, comment='', hud=True, letterbox=0.0, safeFrames=False, metadata=None):
+    """The burnin.BurnIn options to draw the same texts as our HUD"""
+    options = {
+        'comment': comment,
+        'framerate': getFramerate(),
+        'letterbox': letterbox,
+        'safeFrames': safeFrames,
+        'hud': hud,
+    }
+    options.update( getCameraTexts(cam, metadata) )
+    return options
+
+def setupHUD(cam, comment='', metadata=None):
+    """Replaces the current HUD by ours.
+    With the CameraMetadata of the camera, an animated focal length is shown at each frame."""
+    removeHUD()
+
+    camName = dumaf.paths.baseName(cam)
+    focalLength = getFocalLengthLabel(cam)
+
+    if comment != '':
+        cmds.headsUpDisplay('DuComment',section=5, block=0, blockSize='small', ba='left', label='Comment : ' + comment, labelFontSize='small')
+    cmds.headsUpDisplay('DuCurrentFrame',section=0, block=0, blockSize='large', label='Frame ',pre='currentFrame', labelFontSize='large',dfs='large')
+    cmds.headsUpDisplay('DuCam',section=7, block=0, blockSize='large', label='Camera: ' + camName, labelFontSize='large')
+    if metadata is not None and metadata.animated['focalLength']:
+        # Read from the samples, not from the scene
+        cmds.headsUpDisplay('DuFocalLength',section=9, block=0, blockSize='large', label='Focal Length:', labelFontSize='large',dfs='large',
+            command=lambda: metadata.focalLengthLabel(cmds.currentTime(q=True)), attachToRefresh=True)
+    else:
+        cmds.headsUpDisplay('DuFocalLength',section=9, block=0, blockSize='large', label='Focal Length: ' + focalLength,labelFontSize='large')
+
+def getCacheKey(**renderOptions):
+    """The key of the frame cache for these options: frames rendered with other options are not reused"""
+    return json.dumps(renderOptions, sort_keys=True)
+
+def getOutputPath(comment=''):
+    """The default path of the playblast, without extension:
+    next to the current scene, named after it and the comment.
+    Returns an empty string if the scene is not saved."""
+    currentFilePath = cmds.file( q=True, sn=True )
+    if currentFilePath == '':
+        return ''
+    pbFilePath = os.path.dirname(currentFilePath)
+    pbFileName = os.path.basename(currentFilePath)
+    pbFileName = ".".join( pbFileName.split(".")[0:-1])
+    if comment != "":
+        pbFileName = pbFileName + "_" + comment
+    return pbFilePath + '/' + pbFileName
+
+def blast(camera='', size=0.5, comment='', hud=True, thumbnail=False, playblast=True, outputPath='', frameRange=None, mode='sequence', background=False, cacheKey=None, show=False, extraCameras=(), contactSheet=False, fastEvaluation=False, profiler=None, preset=ffmpeg.DEFAULT_PRESET, stagingBackend='auto', stride=1, twoPass=False, burnIn=False, letterbox=0.0, safeFrames=False, dirtyFrames=()):
+    """Creates the playblast and/or the thumbnail of the current scene, without any UI.
+    camera is the camera to look through, the current one by default.
+    outputPath is the file path without extension, by default next to the scene.
+    If there are extraCameras, all cameras are captured in a single pass,
+    in one video per camera or in a single contactSheet video; the frames are then always streamed.
+    If fastEvaluation is True, the parallel evaluation manager and cached playback
+    are enabled during the capture.
+    The time spent in each stage is recorded in profiler (a StageProfiler, created if None),
+    and written in a JSON report next to the playblast.
+    preset is the name of the encoding preset (see ffmpeg.PRESETS), or 'auto' to use the fastest one.
+    stagingBackend is where to write the temporary frames, see createPlayblast.
+    With a stride, only every stride frames are captured (animation on twos, fours...),
+    and each one is held in the video for stride frames.
+    If twoPass is True, a small preview is created (and shown) first, next to the playblast (see PREVIEW_SUFFIX),
+    then the full size playblast is rendered in a mayapy process, and the preview is removed.
+    If burnIn is True (and NumPy is available), the HUD is drawn on the captured frames
+    instead of the viewport, with a letterbox (the aspect ratio to mask, 0 for none) and the safeFrames.
+    With a cacheKey (the rendering options, see getCacheKey), only the changed frames are rendered,
+    and the dirtyFrames, rendered again even if they're cached; the camera and the resolution are added to the key.
+    Returns a dict with the 'playblast' and 'thumbnail' file paths (empty if not created),
+    the list of 'playblasts' (one per camera), the 'frameCount' of the playblast,
+    the evaluation and draw 'timings' summary (streamed frames only),
+    the 'report' file path, and the RefineJob of the full size pass in 'refine' (if any)."""
+    if outputPath == '':
+        outputPath = getOutputPath(comment)
+    if outputPath == '':
+        raise RuntimeError("The scene is not saved, an output path is needed for the playblast.")
+    outputPath = os.path.splitext(outputPath)[0]
+    outputDir = os.path.dirname(outputPath)
+    if outputDir != '' and not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+
+    prevCam = cmds.lookThru( q=True )
+    if camera == '':
+        camera = prevCam
+    if cacheKey is not None:
+        # The cached frames depend on the camera actually used, and on the resolution
+        cacheKey = getCacheKey(options=cacheKey, camera=camera, resolution=dumaf.rendering.get_cached_resolution())
+
+    if twoPass and playblast and not extraCameras and size > PREVIEW_SIZE:
+        preset = resolvePreset(preset)
+        result = blast(camera=camera, size=PREVIEW_SIZE, comment=comment, hud=hud,
+            outputPath=outputPath + PREVIEW_SUFFIX, frameRange=frameRange, mode=mode, show=show,
+            cacheKey=cacheKey + '|preview' if cacheKey is not None else None,
+            fastEvaluation=fastEvaluation, profiler=profiler, preset=preset, stagingBackend=stagingBackend, stride=stride,
+            burnIn=burnIn, letterbox=letterbox, safeFrames=safeFrames, dirtyFrames=dirtyFrames)
+        if thumbnail:
+            result['thumbnail'] = blast(camera=camera, comment=comment, hud=hud, thumbnail=True, playblast=False, outputPath=outputPath)['thumbnail']
+        result['refine'] = refinePlayblast(outputPath, ffmpeg.getExtension(preset), camera, size, comment, hud, frameRange, preset, stride,
+            burnIn, letterbox, safeFrames)
+        return result
+
+    cmds.lookThru( camera )
+
+    startFrame, endFrame = getFrameRange(frameRange)
+    if profiler is None:
+        profiler = createProfiler()
+    if playblast:
+        with profiler.stage('preset'):
+            preset = resolvePreset(preset)
+
+    metadata = None
+    if hud and playblast and not extraCameras:
+        # The multi-camera captures sample their cameras
+        with profiler.stage('metadata'):
+            metadata = CameraMetadata(camera, getStrideFrames((startFrame, endFrame), stride))
+
+    burnInOptions = None
+    if burnIn and playblast:
+        if burnin.isAvailable():
+            burnInOptions = getBurnInOptions(camera, comment, hud, letterbox, safeFrames, metadata)
+        else:
+            cmds.warning("NumPy can't be imported: the HUD is drawn in the viewport instead of being burnt in.")
+    if burnInOptions is not None and cacheKey is not None:
+        # The cached frames don't have the HUD
+        cacheKey = cacheKey + '|burnin'
+    profiler.info.update({
+        'camera': camera,
+        'size': size,
+        'mode': mode,
+        'preset': preset,
+        'stride': stride,
+        'burnIn': burnInOptions is not None,
+        'background': background,
+        'cameraCount': len(extraCameras) + 1,
+        'frameCount': endFrame - startFrame + 1,
+    })
+    profiler.reportFile = outputPath + '.json'
+
+    with profiler.stage('hud'):
+        if hud and burnInOptions is None:
+            setupHUD(camera, comment, metadata)
+        else:
+            removeHUD()
+
+    result = {
+        'playblast': '',
+        'thumbnail': '',
+        'playblasts': [],
+        'frameCount': 0,
+        'timings': {},
+        'report': '',
+        'refine': None,
+    }
+    job = None
+    timings = FrameTimings()
+    previousEvaluation = {}
+    if fastEvaluation:
+        previousEvaluation = enableFastEvaluation()
+    try:
+        if thumbnail:
+            result['thumbnail'] = outputPath + '.png'
+            with profiler.stage('thumbnail', result['thumbnail']):
+                createThumbnail(result['thumbnail'])
+            print("Thumbnail saved: " + result['thumbnail'])
+
+        if playblast and extraCameras:
+            cmds.refresh()
+            cameras = [ camera ] + [ cam for cam in extraCameras if cam != camera ]
+            result['playblasts'] = createMultiCameraPlayblast(outputPath, size, cameras, contactSheet, (startFrame, endFrame), show, timings, profiler, preset, stride, burnInOptions)
+            result['playblast'] = result['playblasts'][0] if result['playblasts'] else ''
+            result['frameCount'] = endFrame - startFrame + 1
+        elif playblast:
+            result['playblast'] = outputPath + ffmpeg.getExtension(preset)
+            result['playblasts'] = [ result['playblast'] ]
+            cmds.refresh()
+            job = createPlayblast(result['playblast'], size, mode, background, cacheKey, dirtyFrames, frameRange=(startFrame, endFrame), show=show, timings=timings, profiler=profiler, preset=preset, stagingBackend=stagingBackend, stride=stride, burnIn=burnInOptions)
+            result['frameCount'] = endFrame - startFrame + 1
+    finally:
+        restoreEvaluation(previousEvaluation)
+        cmds.lookThru( prevCam )
+        removeHUD()
+
+    timings.report('DuBlast')
+    result['timings'] = timings.summary()
+    profiler.info['timings'] = result['timings']
+    if playblast or thumbnail:
+        result['report'] = profiler.reportFile
+        # Background jobs save the report when the encoding is finished
+        if job is None:
+            profiler.save()
+    return result
@@ -30,7 +30,9 @@ from PySide2.QtWidgets import ( # pylint: disable=no-name-in-module,import-error
     QComboBox,
     QLineEdit,
     QPushButton,
-    QSlider
+    QSlider,
+    QListWidget,
+    QListWidgetItem
 )
 
 from PySide2.QtCore import ( # pylint: disable=no-name-in-module,import-error
@@ -42,6 +44,8 @@ import maya.mel as mel  # pylint: disable=import-error
 import maya.cmds as cmds # pylint: disable=import-error
 
 import dublast.dumaf as maf
+from dublast.dupyf import ffmpeg
+from dublast.functions import getTimeSliderRange, getFrameRange
 
 class PreviewDialog( QDialog ):
     """The dialog for preview options"""
@@ -72,6 +76,16 @@ class PreviewDialog( QDialog ):
         self.cameraBox = QComboBox()
         topLayout.addRow("Camera:", self.cameraBox)
 
+        self._extraCamerasList = QListWidget()
+        self._extraCamerasList.setMaximumHeight(80)
+        self._extraCamerasList.setToolTip("Other cameras captured at the same time,\n"
+            "the scene being evaluated only once per frame.")
+        topLayout.addRow("Other cameras:", self._extraCamerasList)
+        self._contactSheetBox = QCheckBox("Contact sheet")
+        self._contactSheetBox.setToolTip("Tiles all the cameras in a single video,\n"
+            "instead of a video per camera.")
+        topLayout.addRow("", self._contactSheetBox)
+
         sizeWidget = QWidget()
         sizeLayout = QHBoxLayout()
         sizeLayout.setContentsMargins(0,1,0,0)
@@ -91,6 +105,39 @@ class PreviewDialog( QDialog ):
         sizeWidget.setLayout(sizeLayout)
         topLayout.addRow("Size:", sizeWidget)
 
+        rangeWidget = QWidget()
+        rangeLayout = QHBoxLayout()
+        rangeLayout.setContentsMargins(0,1,0,0)
+        rangeLayout.setSpacing(3)
+        self._rangeBox = QComboBox()
+        self._rangeBox.addItem("Playback range", 'playback')
+        self._rangeBox.addItem("Time slider selection", 'selection')
+        self._rangeBox.addItem("Custom", 'custom')
+        self._rangeBox.setToolTip("Time slider selection: the range highlighted in the time slider,\n"
+            "or the playback range if there's none.")
+        rangeLayout.addWidget(self._rangeBox)
+        self._startEdit = QSpinBox()
+        self._startEdit.setRange(-1000000, 1000000)
+        self._startEdit.setValue( int(cmds.playbackOptions(q=True,minTime=True)) )
+        self._startEdit.setEnabled(False)
+        rangeLayout.addWidget(self._startEdit)
+        self._endEdit = QSpinBox()
+        self._endEdit.setRange(-1000000, 1000000)
+        self._endEdit.setValue( int(cmds.playbackOptions(q=True,maxTime=True)) )
+        self._endEdit.setEnabled(False)
+        rangeLayout.addWidget(self._endEdit)
+        rangeWidget.setLayout(rangeLayout)
+        topLayout.addRow("Frames:", rangeWidget)
+
+        self._strideBox = QComboBox()
+        self._strideBox.addItem("Every frame", 1)
+        self._strideBox.addItem("On twos", 2)
+        self._strideBox.addItem("On threes", 3)
+        self._strideBox.addItem("On fours", 4)
+        self._strideBox.setToolTip("Captures only every N frames, each one is held for N frames in the video.\n"
+            "Faster previews while blocking.")
+        topLayout.addRow("Capture:", self._strideBox)
+
         renderOptionsWidget = QWidget()
         renderOptionsLayout = QVBoxLayout()
         renderOptionsLayout.setContentsMargins(0,1,0,0)
@@ -134,6 +181,18 @@ class PreviewDialog( QDialog ):
         self.commentEdit.setMaxLength(20)
         topLayout.addRow("Comment:", self.commentEdit)
 
+        self._burnInBox = QCheckBox("Draw the HUD on the frames")
+        self._burnInBox.setToolTip("Draws the HUD (and the masks) on the captured frames instead of the viewport,\n"
+            "with the same layout at any size. Needs NumPy.")
+        topLayout.addRow("Burn-in:", self._burnInBox)
+        self._letterboxBox = QComboBox()
+        self._letterboxBox.addItem("No letterbox", 0.0)
+        self._letterboxBox.addItem("1.85:1", 1.85)
+        self._letterboxBox.addItem("2.39:1", 2.39)
+        topLayout.addRow("", self._letterboxBox)
+        self._safeFramesBox = QCheckBox("Action and title safe frames")
+        topLayout.addRow("", self._safeFramesBox)
+
         self._playblastBox = QCheckBox("Playblast")
         self._playblastBox.setChecked(True)
         topLayout.addRow("Type:", self._playblastBox)
@@ -141,6 +200,44 @@ class PreviewDialog( QDialog ):
         self._thumbnailBox.setChecked(True)
         topLayout.addRow("", self._thumbnailBox)
 
+        self._encodingBox = QComboBox()
+        self._encodingBox.addItem("After capture", 'sequence')
+        self._encodingBox.addItem("While capturing", 'pipeline')
+        self._encodingBox.addItem("Stream (no temp frames)", 'stream')
+        self._encodingBox.setToolTip("When ffmpeg encodes the frames:\n"
+            "While capturing: chunks of frames are encoded in the background during the capture.\n"
+            "Stream: the frames are piped to ffmpeg, without temporary image files.")
+        topLayout.addRow("Encoding:", self._encodingBox)
+        self._presetBox = QComboBox()
+        for name, preset in ffmpeg.PRESETS.items():
+            self._presetBox.addItem(preset['label'], name)
+            self._presetBox.setItemData(self._presetBox.count() - 1, preset['description'], Qt.ToolTipRole)
+        self._presetBox.addItem("Fastest on this computer", 'auto')
+        self._presetBox.setItemData(self._presetBox.count() - 1,
+            "Benchmarks the formats the first time, and uses the fastest one with a good enough quality.", Qt.ToolTipRole)
+        topLayout.addRow("Format:", self._presetBox)
+        self._backgroundBox = QCheckBox("Encode in the background")
+        self._backgroundBox.setToolTip("Gives control back to Maya as soon as the frames are captured.")
+        topLayout.addRow("", self._backgroundBox)
+        self._twoPassBox = QCheckBox("Quick preview first")
+        self._twoPassBox.setToolTip("Shows a small preview in a few seconds, then renders the full size playblast\n"
+            "in the background, from a copy of the scene. The preview is removed when it's ready.")
+        topLayout.addRow("", self._twoPassBox)
+        self._cacheBox = QCheckBox("Re-render only changed frames")
+        self._cacheBox.setToolTip("Keeps the frames in a cache, and renders again only the frames\n"
+            "affected by animation changes since the previous playblast.")
+        topLayout.addRow("", self._cacheBox)
+        self._rerenderBox = QCheckBox("Render all frames again")
+        self._rerenderBox.setToolTip("Replaces all the cached frames, for changes which are not detected,\n"
+            "like lights, shaders or constraints.")
+        self._rerenderBox.setEnabled(False)
+        self._cacheBox.toggled.connect(self._rerenderBox.setEnabled)
+        topLayout.addRow("", self._rerenderBox)
+        self._fastEvaluationBox = QCheckBox("Parallel evaluation and cached playback")
+        self._fastEvaluationBox.setToolTip("Uses the parallel evaluation manager and the cached playback\n"
+            "while capturing, so unchanged frames are not evaluated again.")
+        topLayout.addRow("", self._fastEvaluationBox)
+
         mainLayout.addLayout(topLayout)
 
         buttonsLayout = QHBoxLayout()
@@ -169,6 +266,12 @@ class PreviewDialog( QDialog ):
         self.aoBox.clicked.connect( self._updateRenderer )
         self.sizeSlider.valueChanged.connect( self.sizeEdit.setValue )
         self.sizeEdit.valueChanged.connect( self.sizeSlider.setValue )
+        self._rangeBox.currentIndexChanged.connect( self._updateRange )
+
+    def _updateRange(self):
+        custom = self._rangeBox.currentData() == 'custom'
+        self._startEdit.setEnabled(custom)
+        self._endEdit.setEnabled(custom)
 
     def _updateRenderer(self):
         cam = self.cameraBox.currentData()
@@ -246,6 +349,17 @@ class PreviewDialog( QDialog ):
 
     def _loadCameras(self):
         maf.ui.update_cam_combobox(self.cameraBox)
+        self._extraCamerasList.clear()
+        for i in range(self.cameraBox.count()):
+            camera = self.cameraBox.itemData(i)
+            # Separators don't have data
+            if not camera:
+                continue
+            item = QListWidgetItem(self.cameraBox.itemText(i))
+            item.setData(Qt.UserRole, camera)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Unchecked)
+            self._extraCamerasList.addItem(item)
 
     def comment(self):
         """Returns the comment added by the user"""
@@ -255,6 +369,20 @@ class PreviewDialog( QDialog ):
         """Returns the selected camera"""
         return self.cameraBox.currentData()
 
+    def extraCameras(self):
+        """Returns the other cameras to capture at the same time"""
+        cameras = []
+        for i in range(self._extraCamerasList.count()):
+            item = self._extraCamerasList.item(i)
+            camera = item.data(Qt.UserRole)
+            if item.checkState() == Qt.Checked and camera != self.camera():
+                cameras.append(camera)
+        return cameras
+
+    def contactSheet(self):
+        """Do we have to tile all the cameras in a single video?"""
+        return self._contactSheetBox.isChecked()
+
     def getSize(self):
         """Returns the size %"""
         return self.sizeEdit.value() / 100.0
@@ -263,6 +391,18 @@ class PreviewDialog( QDialog ):
         """Returns True if the HUD has to be shown"""
         return self.showHudBox.isChecked()
 
+    def burnIn(self):
+        """Returns True if the HUD has to be drawn on the frames"""
+        return self._burnInBox.isChecked()
+
+    def letterbox(self):
+        """Returns the aspect ratio of the letterbox, 0 for none"""
+        return self._letterboxBox.currentData()
+
+    def safeFrames(self):
+        """Returns True if the safe frames have to be drawn"""
+        return self._safeFramesBox.isChecked()
+
     def thumbnail(self):
         """Do we have to create a thumbnail?"""
         return self._thumbnailBox.isChecked()
@@ -271,6 +411,67 @@ class PreviewDialog( QDialog ):
         """Do we have to create a playblast?"""
         return self._playblastBox.isChecked()
 
+    def encodingMode(self):
+        """Returns the encoding mode: 'sequence', 'pipeline' or 'stream'"""
+        return self._encodingBox.currentData()
+
+    def frameRange(self):
+        """Returns the (start, end) frames to playblast, or None for the playback range"""
+        rangeType = self._rangeBox.currentData()
+        if rangeType == 'selection':
+            return getTimeSliderRange()
+        if rangeType == 'custom':
+            return (self._startEdit.value(), self._endEdit.value())
+        return None
+
+    def stride(self):
+        """Returns the number of frames each capture is held for"""
+        return self._strideBox.currentData()
+
+    def preset(self):
+        """Returns the name of the encoding preset, or 'auto'"""
+        return self._presetBox.currentData()
+
+    def useCache(self):
+        """Do we have to re-render only the changed frames?"""
+        return self._cacheBox.isChecked()
+
+    def dirtyFrames(self):
+        """Returns the frames to render again even if they're cached"""
+        if not self.useCache() or not self._rerenderBox.isChecked():
+            return []
+        startFrame, endFrame = getFrameRange(self.frameRange())
+        return list(range(startFrame, endFrame + 1))
+
+    def renderOptions(self):
+        """Returns the options which change the rendered frames, as a dict"""
+        return {
+            'camera': self.camera(),
+            'size': self.getSize(),
+            'displayAppearance': self.displayAppearenceBox.currentData(),
+            'displayLights': self.useLightsBox.currentData(),
+            'displayTextures': self.displayTexturesBox.isChecked(),
+            'shadows': self.displayShadowsBox.isChecked(),
+            'ambientOcclusion': self.aoBox.isChecked(),
+            'antiAliasing': self.aaBox.isChecked(),
+            'onlyPolygons': self.onlyPolyBox.isChecked(),
+            'motionTrails': self.motionTrailBox.isChecked(),
+            'hud': self.showHUD(),
+            'comment': self.comment(),
+        }
+
+    def background(self):
+        """Do we have to encode in the background?"""
+        return self._backgroundBox.isChecked()
+
+    def twoPass(self):
+        """Do we have to show a small preview first?"""
+        return self._twoPassBox.isChecked()
+
+    def fastEvaluation(self):
+        """Do we have to use the parallel evaluation and cached playback?"""
+        return self._fastEvaluationBox.isChecked()
+
     Slot()
     def hideRenderer(self):
         """Hides the Maya viewport used to capture the preview"""
@@ -0,0 +1,75 @@
+"""Imports the dublast and dumaf modules without Maya, for their pure Python parts.
+maya.cmds is the farm.FakeCmds stand-in; the other Maya modules return stubs for anything."""
+
+import os
+import sys
+import types
+import importlib
+
+DUBLAST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dublast')
+sys.path.insert(0, DUBLAST_DIR)
+
+import farm # pylint: disable=wrong-import-position
+
+class Stub():
+    """Any attribute, call or item of a stub is another stub"""
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Stub()
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+    def __getitem__(self, key):
+        return Stub()
+
+class StubModule(types.ModuleType):
+    """A module whose attributes are stubs"""
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Stub()
+
+def installFakeMaya():
+    """Registers the fake Maya modules, unless Maya is available"""
+    try:
+        import maya.cmds # pylint: disable=import-error,unused-import,import-outside-toplevel
+        return
+    except ImportError:
+        pass
+    maya = types.ModuleType('maya')
+    maya.cmds = farm.FakeCmds()
+    maya.mel = StubModule('maya.mel')
+    maya.utils = StubModule('maya.utils')
+    maya.api = types.ModuleType('maya.api')
+    maya.api.OpenMaya = StubModule('maya.api.OpenMaya')
+    maya.api.OpenMayaUI = StubModule('maya.api.OpenMayaUI')
+    sys.modules['maya'] = maya
+    sys.modules['maya.cmds'] = maya.cmds
+    sys.modules['maya.mel'] = maya.mel
+    sys.modules['maya.utils'] = maya.utils
+    sys.modules['maya.api'] = maya.api
+    sys.modules['maya.api.OpenMaya'] = maya.api.OpenMaya
+    sys.modules['maya.api.OpenMayaUI'] = maya.api.OpenMayaUI
+
+def installPackage(name, folder):
+    """Registers a package without running its __init__"""
+    if name in sys.modules:
+        return
+    package = types.ModuleType(name)
+    package.__path__ = [folder]
+    sys.modules[name] = package
+    parent, _, child = name.rpartition('.')
+    if parent != '':
+        setattr(sys.modules[parent], child, package)
+
+def importDublastModule(name):
+    """Imports a module of the dublast package, like 'functions' or 'dumaf.nodes',
+    without the __init__ of dublast and dumaf which need the Maya UI"""
+    installFakeMaya()
+    installPackage('dublast', DUBLAST_DIR)
+    installPackage('dublast.dumaf', os.path.join(DUBLAST_DIR, 'dumaf'))
+    return importlib.import_module('dublast.' + name)
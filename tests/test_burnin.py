@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dublast'))
+
+from dupyf import burnin # pylint: disable=wrong-import-position
+
+@unittest.skipUnless(burnin.isAvailable(), "NumPy is not available")
+class TestBurnIn(unittest.TestCase):
+
+    def getImage(self, width, height):
+        import numpy
+        return numpy.zeros((height, width, 4), dtype=numpy.uint8)
+
+    def testTimecode(self):
+        self.assertEqual(burnin.getTimecode(0, 24), "00:00:00:00")
+        self.assertEqual(burnin.getTimecode(24 * 61 + 5, 24), "00:01:01:05")
+
+    def testDraw(self):
+        image = self.getImage(320, 180)
+        burnin.BurnIn(320, 180, comment="Comment").draw(image, 12)
+        self.assertEqual(image.max(), 255)
+
+    def testTextWiderThanFrame(self):
+        image = self.getImage(64, 36)
+        b = burnin.BurnIn(64, 36, comment="A comment which is much wider than the frame")
+        b.draw(image, 1)
+        self.assertEqual(image.max(), 255)
+
+    def testTinyFrame(self):
+        image = self.getImage(8, 4)
+        burnin.BurnIn(8, 4, comment="Comment").draw(image, 1)
+
+    def testLetterbox(self):
+        image = self.getImage(320, 180) + 100
+        burnin.BurnIn(320, 180, letterbox=2.39, hud=False).draw(image, 1)
+        self.assertEqual(image[0].max(), 0)
+        self.assertEqual(image[-1].max(), 0)
+        self.assertEqual(image[90].min(), 100)
+
+    def testSafeFrames(self):
+        frame = bytes(200 * 100 * 4)
+        for bottomUp in (True, False):
+            b = burnin.BurnIn(200, 100, bottomUp=bottomUp, safeFrames=True, hud=False)
+            self.assertGreater(max(b.apply(frame, 1)), 0, bottomUp)
+
+    def testApplyBottomUp(self):
+        # The same drawing, flipped
+        frame = bytes(200 * 100 * 4)
+        options = {'comment': "Comment", 'letterbox': 2.39, 'safeFrames': True}
+        import numpy
+        topDown = numpy.frombuffer(burnin.BurnIn(200, 100, bottomUp=False, **options).apply(frame, 1), dtype=numpy.uint8)
+        bottomUp = numpy.frombuffer(burnin.BurnIn(200, 100, bottomUp=True, **options).apply(frame, 1), dtype=numpy.uint8)
+        self.assertTrue((topDown.reshape(100, 200, 4)[::-1] == bottomUp.reshape(100, 200, 4)).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from fakemaya import farm
+
+# A worker which fails cleanly on broken scenes, and crashes on the others
+WORKER = """
+import sys, json
+resultFile, scene = sys.argv[2], sys.argv[3]
+if 'crash' in scene:
+    sys.exit(3)
+with open(resultFile, 'w') as f:
+    json.dump({'scene': scene, 'success': False, 'error': "Broken scene"}, f)
+sys.exit(1)
+"""
+
+class TestRunFarm(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+
+    def testRetryCrashesOnly(self):
+        summary = farm.runFarm(['broken.ma', 'crash.ma'], [sys.executable, '-c', WORKER], maxWorkers=2, retries=2, resultsDir=self.folder)
+        self.assertEqual(summary['failed'], 2)
+        attempts = { os.path.basename(job['scene']): job['attempts'] for job in summary['jobs'] }
+        self.assertEqual(attempts, {'broken.ma': 1, 'crash.ma': 3})
+
+if __name__ == '__main__':
+    unittest.main()
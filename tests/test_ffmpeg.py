@@ -0,0 +1,160 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dublast'))
+
+from dupyf import ffmpeg # pylint: disable=wrong-import-position
+
+FFMPEG_FILE = ffmpeg.findBinary('ffmpeg')
+
+class TestSegments(unittest.TestCase):
+
+    def testSplitRange(self):
+        self.assertEqual(ffmpeg.splitRange(1, 10, 3), [(1, 4), (5, 7), (8, 10)])
+        self.assertEqual(ffmpeg.splitRange(1, 100, 1), [(1, 100)])
+
+    def testSplitRangeCoversAllFrames(self):
+        for numSegments in range(1, 12):
+            ranges = ffmpeg.splitRange(5, 40, numSegments)
+            self.assertEqual(ranges[0][0], 5)
+            self.assertEqual(ranges[-1][1], 40)
+            for previous, current in zip(ranges, ranges[1:]):
+                self.assertEqual(previous[1] + 1, current[0])
+
+    def testSplitRangeMoreSegmentsThanFrames(self):
+        self.assertEqual(ffmpeg.splitRange(1, 3, 10), [(1, 1), (2, 2), (3, 3)])
+
+    def testSegmentCount(self):
+        self.assertEqual(ffmpeg.getSegmentCount(ffmpeg.SEGMENT_MIN_FRAMES - 1, 64), 1)
+        self.assertEqual(ffmpeg.getSegmentCount(100000, ffmpeg.SEGMENT_THREADS * 3), 3)
+        self.assertEqual(ffmpeg.getSegmentCount(100000, 1), 1)
+
+    def testErrorMessage(self):
+        message = ffmpeg.getErrorMessage(1, b'\n'.join([ b'line' + str(i).encode() for i in range(20) ]), maxLines=2)
+        self.assertIn('exit code 1', message)
+        self.assertIn('line19', message)
+        self.assertNotIn('line17', message)
+
+class TestTileFrames(unittest.TestCase):
+
+    def testGrid(self):
+        # 1x1 tiles, one byte per pixel
+        frames = [b'a', b'b', b'c']
+        self.assertEqual(ffmpeg.tileFrames(frames, 1, 1, 2, 2, bottomUp=False, pixelSize=1), b'abc\x00')
+        # The last row of tiles first
+        self.assertEqual(ffmpeg.tileFrames(frames, 1, 1, 2, 2, bottomUp=True, pixelSize=1), b'c\x00ab')
+
+    def testLines(self):
+        # 1x2 tiles: the lines of the tiles are interleaved
+        frames = [b'ab', b'cd']
+        self.assertEqual(ffmpeg.tileFrames(frames, 1, 2, 2, 1, bottomUp=False, pixelSize=1), b'acbd')
+
+class TestAudioClip(unittest.TestCase):
+
+    def getSound(self, offset, sourceStart, sourceEnd):
+        return {
+            'file': 'sound.wav',
+            'offset': offset,
+            'sourceStart': sourceStart,
+            'sourceEnd': sourceEnd,
+        }
+
+    def testInside(self):
+        self.assertEqual(ffmpeg.getAudioClip(self.getSound(2.0, 0.0, 3.0), 0.0, 10.0), (0.0, 3.0, 2.0))
+
+    def testTrimmed(self):
+        # Starts before the range and ends after it
+        self.assertEqual(ffmpeg.getAudioClip(self.getSound(0.0, 1.0, 11.0), 2.0, 5.0), (3.0, 6.0, 0.0))
+
+    def testOutside(self):
+        self.assertIsNone(ffmpeg.getAudioClip(self.getSound(10.0, 0.0, 3.0), 0.0, 10.0))
+        self.assertIsNone(ffmpeg.getAudioClip(self.getSound(0.0, 0.0, 2.0), 2.0, 10.0))
+
+    @unittest.skipIf(FFMPEG_FILE == '', "ffmpeg can't be found")
+    def testUnreadableSound(self):
+        tempDir = tempfile.mkdtemp()
+        try:
+            sound = self.getSound(0.0, 0.0, 1.0)
+            sound['file'] = tempDir + '/' + 'missing.wav'
+            # No sound, but no error
+            self.assertEqual(ffmpeg.mixAudio(FFMPEG_FILE, [sound], 0.0, 1.0, tempDir + '/' + 'mix.wav'), '')
+        finally:
+            shutil.rmtree(tempDir)
+
+class TestPresets(unittest.TestCase):
+
+    def testPresets(self):
+        for name, preset in ffmpeg.PRESETS.items():
+            self.assertEqual(ffmpeg.getPreset(name), preset)
+            self.assertTrue(preset['extension'].startswith('.'))
+            # Removed in ffmpeg 5
+            self.assertNotIn('-intra', preset['videoArgs'])
+        self.assertEqual(ffmpeg.getPreset('unknown'), ffmpeg.PRESETS[ffmpeg.DEFAULT_PRESET])
+
+class TestArguments(unittest.TestCase):
+
+    def testOutputOptionsAfterInputs(self):
+        args = ffmpeg.getSequenceArgs('ffmpeg', 'blast.####.jpg', 1, 24, 'out.mp4', 'blast.wav', frameCount=10, threads=2, stride=2)
+        lastInput = len(args) - 1 - args[::-1].index('-i')
+        self.assertEqual(args[lastInput + 1], 'blast.wav')
+        for option in ('-vf', '-frames:v', '-threads', '-map'):
+            self.assertGreater(args.index(option), lastInput, option)
+        self.assertEqual(args[-1], 'out.mp4')
+
+    def testSequenceWithoutSound(self):
+        args = ffmpeg.getSequenceArgs('ffmpeg', 'blast.####.jpg', 1, 24, 'out.mp4')
+        self.assertEqual(args.count('-i'), 1)
+        self.assertIn('blast.%5d.jpg', args)
+        self.assertNotIn('-vf', args)
+
+@unittest.skipIf(FFMPEG_FILE == '', "ffmpeg can't be found")
+class TestEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.imageFile = self.tempDir + '/' + 'test.####.jpg'
+        ffmpeg.waitProcess(ffmpeg.subprocess.Popen([
+            FFMPEG_FILE,
+            '-loglevel', 'error',
+            '-f', 'lavfi',
+            '-i', 'testsrc2=size=64x64:rate=24',
+            '-frames:v', '30',
+            '-start_number', '1',
+            self.imageFile.replace('####', '%5d')
+            ], stdout=ffmpeg.subprocess.PIPE, stderr=ffmpeg.subprocess.PIPE))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def testPresets(self):
+        for name in ffmpeg.getAvailablePresets(ffmpeg.getCapabilities(FFMPEG_FILE)['encoders']):
+            self.assertTrue(ffmpeg.testPreset(FFMPEG_FILE, name), name)
+
+    def testBenchmark(self):
+        results = ffmpeg.benchmarkPresets(FFMPEG_FILE, names=['intra-mjpeg'], size='64x64', frameCount=4)
+        self.assertGreater(results['intra-mjpeg']['ssim'], 0.5)
+
+    def testSequence(self):
+        filePath = self.tempDir + '/' + 'test.mp4'
+        ffmpeg.waitProcess(ffmpeg.encodeSequence(FFMPEG_FILE, self.imageFile, 1, 24, filePath, frameCount=30))
+        self.assertTrue(os.path.isfile(filePath))
+
+    def testSegmented(self):
+        filePath = self.tempDir + '/' + 'test.mp4'
+        ffmpeg.encodeSegmented(FFMPEG_FILE, self.imageFile, 1, 30, 24, filePath, numSegments=3)
+        self.assertTrue(os.path.isfile(filePath))
+
+    def testFailure(self):
+        filePath = self.tempDir + '/' + 'test.mp4'
+        with open(filePath, 'w') as f:
+            f.write('previous')
+        with self.assertRaises(RuntimeError):
+            ffmpeg.waitProcess(ffmpeg.encodeSequence(FFMPEG_FILE, self.tempDir + '/missing.####.jpg', 1, 24, filePath))
+        # The previous output doesn't look like the result
+        self.assertFalse(os.path.isfile(filePath))
+
+if __name__ == '__main__':
+    unittest.main()
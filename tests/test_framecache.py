@@ -0,0 +1,94 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dublast'))
+
+from dupyf.framecache import FrameCache, changedRange # pylint: disable=wrong-import-position
+
+class TestChangedRange(unittest.TestCase):
+
+    def testSame(self):
+        keys = [(1, 0.0), (10, 1.0)]
+        self.assertIsNone(changedRange(keys, list(keys), 1, 100))
+
+    def testBetweenNeighbours(self):
+        oldKeys = [(1, 0.0), (10, 1.0), (20, 0.0), (30, 1.0)]
+        newKeys = [(1, 0.0), (10, 1.0), (20, 5.0), (30, 1.0)]
+        self.assertEqual(changedRange(oldKeys, newKeys, 1, 100), (10, 30))
+
+    def testExtrapolated(self):
+        # After the last key, the change goes to the end of the range
+        oldKeys = [(1, 0.0), (10, 1.0)]
+        newKeys = [(1, 0.0), (10, 2.0)]
+        self.assertEqual(changedRange(oldKeys, newKeys, 1, 100), (1, 100))
+
+    def testAddedKey(self):
+        oldKeys = [(1, 0.0), (20, 1.0)]
+        newKeys = [(1, 0.0), (10, 3.0), (20, 1.0)]
+        self.assertEqual(changedRange(oldKeys, newKeys, 1, 100), (1, 20))
+
+    def testClampedToRange(self):
+        oldKeys = [(1, 0.0)]
+        newKeys = [(1, 1.0)]
+        self.assertEqual(changedRange(oldKeys, newKeys, 5, 50), (5, 50))
+
+class TestFrameCache(unittest.TestCase):
+
+    def setUp(self):
+        self.rootDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.rootDir)
+
+    def render(self, cache, frames):
+        if not os.path.isdir(cache.folder):
+            os.makedirs(cache.folder)
+        for frame in frames:
+            with open(cache.framePath(frame), 'wb') as f:
+                f.write(b'frame' + str(frame).encode())
+
+    def testDirtyFrames(self):
+        curves = {'curve': [(1, 0.0), (5, 1.0), (10, 0.0)]}
+        cache = FrameCache('scene|camera', self.rootDir)
+        self.assertEqual(cache.dirtyFrames(1, 10, curves), list(range(1, 11)))
+        self.render(cache, range(1, 11))
+        cache.update(range(1, 11), curves)
+
+        # Reloaded from the manifest
+        cache = FrameCache('scene|camera', self.rootDir)
+        self.assertEqual(cache.dirtyFrames(1, 10, curves), [])
+        # Forced frames
+        self.assertEqual(cache.dirtyFrames(1, 10, curves, [3, 12]), [3])
+        # Changed key
+        changed = {'curve': [(1, 0.0), (5, 1.0), (10, 2.0)]}
+        self.assertEqual(cache.dirtyFrames(1, 10, changed), list(range(5, 11)))
+
+    def testChangeOutsideOfTheRange(self):
+        curves = {'curve': [(1, 0.0), (15, 1.0), (20, 0.0)]}
+        cache = FrameCache('scene|camera', self.rootDir)
+        self.render(cache, range(1, 21))
+        cache.update(range(1, 21), curves)
+
+        # The key at 15 changes, but only the first frames are blasted
+        changed = {'curve': [(1, 0.0), (15, 2.0), (20, 0.0)]}
+        dirty = cache.dirtyFrames(1, 10, changed)
+        self.assertEqual(dirty, list(range(1, 11)))
+        self.render(cache, dirty)
+        cache.update(dirty, changed)
+
+        # The other affected frames are not reused
+        cache = FrameCache('scene|camera', self.rootDir)
+        self.assertEqual(cache.dirtyFrames(1, 20, changed), list(range(11, 21)))
+
+    def testMissingFrame(self):
+        cache = FrameCache('scene|camera', self.rootDir)
+        self.render(cache, range(1, 6))
+        cache.update(range(1, 6), {})
+        os.remove(cache.framePath(2))
+        self.assertEqual(cache.dirtyFrames(1, 5, {}), [2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from fakemaya import importDublastModule
+
+nodes = importDublastModule('dumaf.nodes')
+
+class TestNodeList(unittest.TestCase):
+
+    UUID = '5B2C1E58-4A4D-1F2B-84D2-0F9A6C3B7E11'
+
+    def testPack(self):
+        data = nodes.NodeList.pack(self.UUID)
+        self.assertEqual(len(data), nodes.NodeList.UUID_SIZE)
+        self.assertEqual(nodes.NodeList.unpack(data), self.UUID)
+
+    def testUnpackUpperCase(self):
+        # Maya UUIDs are upper case
+        data = nodes.NodeList.pack(self.UUID.lower())
+        self.assertEqual(nodes.NodeList.unpack(data), self.UUID)
+
+    def testList(self):
+        uuids = [ self.UUID[:-1] + str(i) for i in range(5) ]
+        nodeList = nodes.NodeList(uuids)
+        self.assertEqual(len(nodeList), 5)
+        self.assertEqual(nodeList.uuid(2), uuids[2])
+        self.assertEqual(nodeList.uuid(-1), uuids[-1])
+        self.assertEqual(nodeList.uuids(), uuids)
+        self.assertEqual(nodeList[1:3].uuids(), uuids[1:3])
+        with self.assertRaises(IndexError):
+            nodeList.uuid(5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import types
+import shutil
+import tempfile
+import subprocess
+import unittest
+from unittest import mock
+
+from fakemaya import farm, importDublastModule
+
+functions = importDublastModule('functions')
+rendering = importDublastModule('dumaf.rendering')
+
+FFMPEG_FILE = functions.ffmpeg.findBinary('ffmpeg')
+
+class PlayblastCmds(farm.FakeCmds):
+    """Renders test frames with ffmpeg, where cmds.playblast renders the viewport to a jpg sequence"""
+
+    def __init__(self, scene, width=320, height=180, frameCount=12):
+        super().__init__(frameCount, frameTime=0, openTime=0)
+        self.scene = scene
+        self.width = width
+        self.height = height
+        self.renderedFrames = []
+        self.warnings = []
+
+    def file(self, *args, **kwargs):
+        if kwargs.get('q'):
+            return self.scene
+        return super().file(*args, **kwargs)
+
+    def getAttr(self, attribute):
+        return {
+            'defaultResolution.width': self.width,
+            'defaultResolution.height': self.height,
+        }[attribute]
+
+    def ls(self, **kwargs): # pylint: disable=unused-argument
+        # No sound nor animation
+        return []
+
+    def about(self, **kwargs):
+        return kwargs.get('batch', False)
+
+    def warning(self, message):
+        self.warnings.append(message)
+
+    def playblast(self, filename='', startTime=1, endTime=1, frame=None, width=0, height=0, **kwargs): # pylint: disable=arguments-differ
+        if frame is None:
+            frame = range(int(startTime), int(endTime) + 1)
+        # Like Maya, create the folder
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        for f in frame:
+            subprocess.run([
+                FFMPEG_FILE, '-y', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', 'testsrc2=size=%ix%i' % (width, height),
+                '-frames:v', '1',
+                filename + '.' + str(f).zfill(5) + '.jpg'
+                ], check=True)
+            self.renderedFrames.append(f)
+        return filename + '.####.jpg'
+
+@unittest.skipIf(FFMPEG_FILE == '', "ffmpeg is not available")
+class TestCreatePlayblast(unittest.TestCase):
+    """The whole sequence mode, from the (fake) playblast to the real ffmpeg encoding"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cmds = PlayblastCmds(self.folder + '/shot.ma')
+        for patch in (
+            # The staging slots and the frame cache are in the temp folder
+            mock.patch.object(tempfile, 'tempdir', self.folder),
+            mock.patch.object(functions, 'cmds', self.cmds),
+            mock.patch.object(rendering, 'cmds', self.cmds),
+            mock.patch.object(rendering, 'mel', types.SimpleNamespace(eval=lambda command: 24.0)),
+            ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        rendering.clear_scene_cache()
+        self.addCleanup(rendering.clear_scene_cache)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def blast(self, **kwargs):
+        filePath = self.folder + '/shot.mp4'
+        functions.createPlayblast(filePath, 0.5, frameRange=(1, 12), show=False, stagingBackend='temp', **kwargs)
+        self.assertEqual(self.cmds.warnings, [])
+        self.assertTrue(os.path.isfile(filePath))
+        self.assertGreater(os.path.getsize(filePath), 0)
+        return filePath
+
+    def testSequence(self):
+        self.blast()
+        self.assertEqual(self.cmds.renderedFrames, list(range(1, 13)))
+
+    def testStride(self):
+        self.blast(stride=4)
+        self.assertEqual(self.cmds.renderedFrames, [1, 5, 9])
+
+    @unittest.skipUnless(functions.burnin.isAvailable(), "NumPy is not available")
+    def testBurnIn(self):
+        self.blast(burnIn={'comment': "Comment"})
+
+    def testCache(self):
+        self.blast(cacheKey='{}')
+        self.assertEqual(len(self.cmds.renderedFrames), 12)
+        # Nothing has changed
+        self.blast(cacheKey='{}')
+        self.assertEqual(len(self.cmds.renderedFrames), 12)
+        self.blast(cacheKey='{}', dirtyFrames=(3,))
+        self.assertEqual(self.cmds.renderedFrames[12:], [3])
+
+    def testStagingSlotReleased(self):
+        with mock.patch.object(self.cmds, 'playblast', side_effect=RuntimeError("Crash")):
+            with self.assertRaises(RuntimeError):
+                self.blast()
+        self.blast()
+        # The failed blast didn't keep its slot locked, the next one reused it
+        slots = []
+        for folder, subFolders, _ in os.walk(self.folder):
+            slots.extend( os.path.join(folder, name) for name in subFolders if name.startswith('slot') )
+        self.assertEqual(len(slots), 1)
+
+class TestReplaceRefined(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+
+    def write(self, filePath, content):
+        with open(filePath, 'w') as f:
+            f.write(content)
+
+    def read(self, filePath):
+        with open(filePath, 'r') as f:
+            return f.read()
+
+    def testReplace(self):
+        outputPath = self.folder + '/shot'
+        refinePath = outputPath + functions.REFINE_SUFFIX
+        self.write(outputPath + '.mp4', "previous")
+        self.write(refinePath + '.mp4', "refined")
+        self.write(refinePath + '.json', "{}")
+        self.assertEqual(functions.replaceRefined(refinePath, outputPath, '.mp4'), outputPath + '.mp4')
+        self.assertEqual(self.read(outputPath + '.mp4'), "refined")
+        self.assertEqual(self.read(outputPath + '.json'), "{}")
+        self.assertEqual(sorted(os.listdir(self.folder)), ['shot.json', 'shot.mp4'])
+
+if __name__ == '__main__':
+    unittest.main()